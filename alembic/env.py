@@ -31,7 +31,7 @@ target_metadata = Base.metadata
 # ... etc.
 
 def get_database_url():
-    return (
+    return os.getenv("DATABASE_URL") or (
         f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@"
         f"{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}/"
         f"{os.getenv('POSTGRES_DB')}"
@@ -0,0 +1,37 @@
+"""Add page_texts cache
+
+Revision ID: 3c1f9a2d8e47
+Revises: 7bf730be217f
+Create Date: 2026-10-17 10:12:40.512316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a2d8e47'
+down_revision = '7bf730be217f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('page_texts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pdf_hash', sa.String(length=64), nullable=False),
+    sa.Column('page_number', sa.Integer(), nullable=False),
+    sa.Column('column', sa.String(), nullable=False),
+    sa.Column('engine', sa.String(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('pdf_hash', 'page_number', 'column', name='uq_page_texts_page_column')
+    )
+    op.create_index(op.f('ix_page_texts_id'), 'page_texts', ['id'], unique=False)
+    op.create_index(op.f('ix_page_texts_pdf_hash'), 'page_texts', ['pdf_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_page_texts_pdf_hash'), table_name='page_texts')
+    op.drop_index(op.f('ix_page_texts_id'), table_name='page_texts')
+    op.drop_table('page_texts')
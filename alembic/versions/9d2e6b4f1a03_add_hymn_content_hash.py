@@ -0,0 +1,25 @@
+"""Add hymns.content_hash
+
+Revision ID: 9d2e6b4f1a03
+Revises: 3c1f9a2d8e47
+Create Date: 2026-10-17 11:02:15.204871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e6b4f1a03'
+down_revision = '3c1f9a2d8e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing hymns keep a NULL hash and are rewritten once on their next import
+    op.add_column('hymns', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('hymns', 'content_hash')
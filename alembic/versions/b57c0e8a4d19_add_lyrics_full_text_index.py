@@ -0,0 +1,51 @@
+"""Add accent-insensitive full-text index on content_lines
+
+Revision ID: b57c0e8a4d19
+Revises: 9d2e6b4f1a03
+Create Date: 2026-10-17 11:48:03.771920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b57c0e8a4d19'
+down_revision = '9d2e6b4f1a03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Spanish stemming applied to unaccented words, so "corazon" matches "corazón". Guarded like
+    # database.create_search_config, which may already have created the configuration at startup: without
+    # the unaccent extension (it may need a superuser) the configuration stays a plain copy of the Spanish one.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'spanish_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION spanish_unaccent (COPY = spanish);
+                BEGIN
+                    CREATE EXTENSION IF NOT EXISTS unaccent;
+                    ALTER TEXT SEARCH CONFIGURATION spanish_unaccent
+                        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+                EXCEPTION WHEN OTHERS THEN
+                    RAISE WARNING 'Could not enable the unaccent extension, lyric search will be accent-sensitive: %', SQLERRM;
+                END;
+            END IF;
+        END
+        $$
+    """)
+    # Expression index: PostgreSQL keeps it current on every insert into content_lines.
+    # services/search_service.py must query the exact same expression.
+    # Raw SQL because op.create_index has no if_not_exists in the pinned Alembic.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_content_lines_line_text_tsv ON content_lines "
+        "USING gin (to_tsvector('spanish_unaccent'::regconfig, line_text))"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_content_lines_line_text_tsv")
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS spanish_unaccent")
+    # The unaccent extension is left installed: it may predate this migration or be used elsewhere.
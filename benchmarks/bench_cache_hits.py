@@ -0,0 +1,114 @@
+"""
+Benchmark for cached hymn reads through the API.
+
+Seeds a synthetic hymnal, warms the cache (an in-memory FakeRedis behind the
+local tier) and times cache hits of `GET /hymns/?include_content=true` and
+`GET /hymns/{id}` on two routes: the previous one, which decodes the cached
+value, rebuilds the schemas and lets `response_model` validate and re-serialize
+them, and the current one, which sends the stored response bytes as they are.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_cache_hits --hymns 300
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import get_db
+from models import schemas, tables
+from routers import hymns
+from services import hymn_service
+from services.cache import Cache
+from benchmarks.fakes import FakeRedis
+from benchmarks.synthetic import generate_hymns
+
+def _build_app(session_factory) -> FastAPI:
+    app = FastAPI()
+    app.include_router(hymns.router)
+
+    # The routes as they were before cached bodies were sent as bytes: the cached value is decoded into
+    # schemas, which `response_model` validates and serializes again
+    @app.get("/legacy/hymns/", response_model=schemas.HymnPage)
+    def legacy_read_hymns(limit: int, include_content: bool = False, db: Session = Depends(get_db)):
+        return schemas.HymnPage.parse_raw(hymn_service.get_hymns_json(db, limit=limit, include_content=include_content))
+
+    @app.get("/legacy/hymns/{hymn_id}", response_model=schemas.Hymn)
+    def legacy_read_hymn(hymn_id: int, db: Session = Depends(get_db)):
+        return schemas.Hymn.parse_raw(hymn_service.get_hymn_json(db, hymn_id))
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_db
+    return app
+
+def _time(client: TestClient, url: str, params: dict, requests: int) -> dict:
+    client.get(url, params=params)  # warm the cache
+    wall, cpu = [], []
+    for _ in range(requests):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        response = client.get(url, params=params)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        response.raise_for_status()
+    return {"p50_ms": statistics.median(wall), "cpu_ms": statistics.mean(cpu), "bytes": len(response.content)}
+
+def run(hymn_count: int, requests: int) -> dict:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    hymn_service.cache = Cache(client=FakeRedis())
+    db = session_factory()
+    try:
+        hymn_service.create_or_update_hymns_from_parsed_data(db, generate_hymns(hymn_count))
+        hymn_id = db.query(tables.Hymn.id).filter_by(hymn_number=1).scalar()
+    finally:
+        db.close()
+
+    client = TestClient(_build_app(session_factory))
+    listing = {"limit": hymn_count, "include_content": True}
+    results = {
+        "listing": {
+            "legacy": _time(client, "/legacy/hymns/", listing, requests),
+            "bytes": _time(client, "/hymns/", listing, requests),
+        },
+        "detail": {
+            "legacy": _time(client, f"/legacy/hymns/{hymn_id}", {}, requests * 10),
+            "bytes": _time(client, f"/hymns/{hymn_id}", {}, requests * 10),
+        },
+    }
+    engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hymns", type=int, default=500, help=f"Number of synthetic hymns to seed (at most {hymn_service.MAX_PAGE_SIZE}, one listing page).")
+    parser.add_argument("--requests", type=int, default=50, help="Number of timed listing requests (10x as many detail requests).")
+    args = parser.parse_args()
+    if not 1 <= args.hymns <= hymn_service.MAX_PAGE_SIZE:
+        parser.error(f"--hymns must be between 1 and {hymn_service.MAX_PAGE_SIZE}, the size of one listing page")
+
+    results = run(args.hymns, args.requests)
+    print(f"{'endpoint':>8} {'path':>7} {'p50 ms':>8} {'cpu ms':>8} {'body bytes':>11}")
+    for endpoint, paths in results.items():
+        for path, result in paths.items():
+            print(f"{endpoint:>8} {path:>7} {result['p50_ms']:>8.2f} {result['cpu_ms']:>8.2f} {result['bytes']:>11,}")
+        print(f"{endpoint:>8} speedup {paths['legacy']['p50_ms'] / paths['bytes']['p50_ms']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark for hymnal DOCX generation.
+
+Seeds a synthetic hymnal in SQLite and times, for books of 50, 300 and 600
+hymns, three ways of producing the same document:
+  - builder: every hymn added with python-docx `add_paragraph` calls, as
+    documents were built before fragments were cached;
+  - cold:    fragments rendered for every hymn, then assembled;
+  - warm:    every fragment read from the cache (an in-memory FakeRedis behind
+    the local tier) and assembled.
+The document cache is not involved, so each run builds the whole document.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_docx --sizes 50 300 600
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from docx import Document
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import schemas, tables
+from services import generator_service, hymn_service
+from services.cache import Cache
+from benchmarks.fakes import FakeRedis
+from benchmarks.synthetic import generate_hymns
+
+def build_with_python_docx(db, selection: schemas.HymnSelection, output_path: str):
+    """The previous builder: loads the hymns in batches and adds every paragraph with python-docx."""
+    document = Document()
+    document.add_heading('Himnario Generado', level=1)
+    versions = generator_service._hymn_versions(db, selection)
+    hymns = {hymn.id: hymn for hymn in generator_service.iter_hymns_with_content(db, [hymn_id for hymn_id, _, _ in versions])}
+    for hymn_id, _, _ in versions:
+        generator_service.add_hymn(document, hymns[hymn_id])
+    document.save(output_path)
+
+def _time(build, db, selection, output_path: str, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        build(db, selection, output_path)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def run(sizes: list[int], repeats: int) -> dict:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    hymn_service.create_or_update_hymns_from_parsed_data(db, generate_hymns(max(sizes)))
+    output_path = os.path.join(tempfile.mkdtemp(), "himnario.docx")
+
+    results = {}
+    try:
+        for size in sizes:
+            selection = schemas.HymnSelection(hymn_number_from=1, hymn_number_to=size)
+
+            def cold(db, selection, output_path):
+                generator_service.cache = Cache(client=FakeRedis())
+                generator_service.build_hymnary_docx(db, selection, output_path)
+
+            results[size] = {"builder": _time(build_with_python_docx, db, selection, output_path, repeats),
+                             "cold": _time(cold, db, selection, output_path, repeats)}
+            generator_service.build_hymnary_docx(db, selection, output_path)  # fill the fragment cache
+            results[size]["warm"] = _time(generator_service.build_hymnary_docx, db, selection, output_path, repeats)
+            results[size]["bytes"] = os.path.getsize(output_path)
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 300, 600], help="Book sizes, in hymns.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per size and method (the median is reported).")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeats)
+    print(f"{'hymns':>6} {'builder ms':>11} {'cold ms':>9} {'warm ms':>9} {'speedup':>8} {'docx bytes':>11}")
+    for size, result in results.items():
+        print(f"{size:>6} {result['builder']:>11.1f} {result['cold']:>9.1f} {result['warm']:>9.1f} "
+              f"{result['builder'] / result['warm']:>7.1f}x {result['bytes']:>11,}")
+
+if __name__ == "__main__":
+    main()
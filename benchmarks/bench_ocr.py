@@ -0,0 +1,79 @@
+"""
+Benchmark for the two-column OCR path of the extraction service.
+
+Builds a synthetic multi-page, two-column PDF, rasterizes it once and then
+measures the wall-clock time of `extraction_service.ocr_pages` for an
+increasing number of worker processes.
+
+Usage (from the backend directory, requires Tesseract and Poppler):
+    python -m benchmarks.bench_ocr --pages 16
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from pdf2image import convert_from_path
+from services import extraction_service
+
+PAGE_SIZE = (1275, 1650)  # Letter page at 150 DPI
+
+def build_synthetic_pdf(path: str, pages: int):
+    """Writes a PDF whose pages carry two columns of hymn-like text."""
+    images = []
+    for page in range(pages):
+        image = Image.new("RGB", PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(image)
+        for column, x in enumerate((60, PAGE_SIZE[0] // 2 + 30)):
+            hymn_number = page * 2 + column + 1
+            y = 60
+            draw.text((x, y), f"{hymn_number}. CANTO DE ALABANZA", fill="black")
+            for stanza in range(1, 4):
+                y += 50
+                draw.text((x, y), str(stanza), fill="black")
+                for line in range(4):
+                    y += 28
+                    draw.text((x, y), f"linea {line + 1} de la estrofa {stanza}", fill="black")
+        images.append(image)
+    images[0].save(path, "PDF", save_all=True, append_images=images[1:], resolution=150)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=8, help="Number of pages in the synthetic PDF.")
+    parser.add_argument("--dpi", type=int, default=300, help="Rasterization DPI.")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest pool size to measure.")
+    args = parser.parse_args()
+
+    if not shutil.which(extraction_service.TESSERACT_CMD):
+        sys.exit("Tesseract is not available; set TESSERACT_CMD to run this benchmark.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "synthetic.pdf")
+        build_synthetic_pdf(pdf_path, args.pages)
+        images = convert_from_path(pdf_path, poppler_path=extraction_service.POPPLER_PATH, dpi=args.dpi)
+
+    worker_counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n < args.max_workers], args.max_workers})
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        executor = extraction_service.create_ocr_executor(workers)
+        start = time.perf_counter()
+        try:
+            extraction_service.ocr_pages(images, executor)
+        finally:
+            if executor:
+                executor.shutdown()
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
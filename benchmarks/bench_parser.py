@@ -0,0 +1,70 @@
+"""
+Throughput benchmark for the hymn parser.
+
+Generates an OCR-like hymnal text (`synthetic.generate_hymnal_text`) and times
+`hymn_parser.parse_hymns_from_text` on the whole text and `hymn_parser.iter_hymns`
+streaming over it in page-sized chunks, reporting hymns and megabytes per second.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_parser --hymns 10000
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from services import hymn_parser
+from benchmarks.synthetic import generate_hymnal_text
+
+LINES_PER_PAGE = 60
+
+def _pages(text: str) -> list[str]:
+    lines = text.split("\n")
+    return ["\n".join(lines[i:i + LINES_PER_PAGE]) for i in range(0, len(lines), LINES_PER_PAGE)]
+
+def _time(parse, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        hymns = parse()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), hymns
+
+def run(hymn_count: int, repeats: int) -> dict:
+    # Hymns with a layout of their own are left out, so every generated hymn parses the same way
+    text = generate_hymnal_text(hymn_count, skip_numbers=hymn_parser.HYMN_LAYOUTS)
+    pages = _pages(text)
+    megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        whole_seconds, whole = _time(lambda: hymn_parser.parse_hymns_from_text(text), repeats)
+    streamed_seconds, streamed = _time(lambda: sum(1 for _ in hymn_parser.iter_hymns(hymn_parser.iter_page_lines(pages))), repeats)
+    assert len(whole) == streamed == hymn_count
+    return {
+        "megabytes": megabytes,
+        "lines": text.count("\n") + 1,
+        "whole": {"seconds": whole_seconds, "hymns_per_s": hymn_count / whole_seconds, "mb_per_s": megabytes / whole_seconds},
+        "streamed": {"seconds": streamed_seconds, "hymns_per_s": hymn_count / streamed_seconds, "mb_per_s": megabytes / streamed_seconds},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hymns", type=int, default=10000, help="Number of hymns in the generated corpus.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per method (the median is reported).")
+    args = parser.parse_args()
+
+    results = run(args.hymns, args.repeats)
+    print(f"{args.hymns} hymns, {results['lines']:,} lines, {results['megabytes']:.1f} MB")
+    for method in ("whole", "streamed"):
+        result = results[method]
+        print(f"{method:>8}: {result['seconds'] * 1000:8.1f} ms  {result['hymns_per_s']:10,.0f} hymns/s  {result['mb_per_s']:6.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Latency benchmark for the `/hymns/suggest` typeahead index.
+
+Builds `SuggestIndex` from a synthetic hymnal and times `suggest` for what a
+worship leader types keystroke by keystroke: growing prefixes of titles and
+first lines with a dropped letter, and hymn numbers.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_suggest --hymns 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from services.suggest_index import SuggestIndex
+from benchmarks.synthetic import generate_hymns
+from benchmarks.bench_search import percentile
+
+def _keystrokes(rng: random.Random, hymns: list[dict], count: int) -> list[str]:
+    queries = []
+    while len(queries) < count:
+        hymn = rng.choice(hymns)
+        if rng.random() < 0.2:
+            text = str(hymn["numero"])
+        else:
+            text = rng.choice([hymn["titulo"], hymn["contenido"][0]["texto"][0]])
+            typo = rng.randrange(len(text))
+            text = text[:typo] + text[typo + 1:]
+        queries.extend(text[:end] for end in range(1, len(text) + 1))
+    return queries[:count]
+
+def run(hymn_count: int, queries: int, seed: int = 0) -> dict:
+    hymns = generate_hymns(hymn_count)
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.load(
+        (hymn["numero"], hymn["numero"], hymn["titulo"], hymn["contenido"][0]["texto"][0], None)
+        for hymn in hymns
+    )
+    build_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for text in _keystrokes(random.Random(seed), hymns, queries):
+        start = time.perf_counter()
+        index.suggest(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "build_ms": build_ms,
+        "queries": queries,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hymns", type=int, default=1000, help="Number of synthetic hymns to index.")
+    parser.add_argument("--queries", type=int, default=5000, help="Number of keystrokes to time.")
+    args = parser.parse_args()
+
+    results = run(args.hymns, args.queries)
+    print(f"index of {args.hymns} hymns built in {results['build_ms']:.1f} ms")
+    print(f"{results['queries']} keystrokes: p50 {results['p50_ms']:.3f} ms, "
+          f"p95 {results['p95_ms']:.3f} ms, p99 {results['p99_ms']:.3f} ms")
+
+if __name__ == "__main__":
+    main()
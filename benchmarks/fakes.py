@@ -0,0 +1,181 @@
+"""
+In-memory stand-ins for external services, for tests and benchmarks that must run without them.
+"""
+import threading
+import time
+import redis
+
+def _encode(value) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+class FakeRedisServer:
+    """Keys and pub/sub subscribers shared by every `FakeRedis` client connected to it, like one Redis server."""
+
+    def __init__(self):
+        self.data: dict[str, tuple[object, float | None]] = {}
+        self.subscribers: dict[str, list] = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+        # Set to make every command fail as if the server were unreachable
+        self.down = False
+
+class _FakePubSubThread:
+    def is_alive(self):
+        return True
+
+    def stop(self):
+        pass
+
+class FakePubSub:
+    """Delivers published messages synchronously to the handlers registered with `subscribe`."""
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+
+    def subscribe(self, **handlers):
+        for channel, handler in handlers.items():
+            self.server.subscribers.setdefault(channel, []).append(handler)
+
+    def run_in_thread(self, sleep_time=0, daemon=False, exception_handler=None):
+        return _FakePubSubThread()
+
+class FakeRedis:
+    """The subset of the `redis.Redis` API used by `services.cache`; values come back as bytes like with `decode_responses=False`."""
+
+    def __init__(self, server: FakeRedisServer = None, latency: float = 0.0):
+        self.server = server or FakeRedisServer()
+        # Simulated network round trip per command, in seconds
+        self.latency = latency
+
+    def _command(self):
+        if self.server.down:
+            raise redis.exceptions.ConnectionError("Fake Redis server is down")
+        self.server.commands += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _live(self, key):
+        value = self.server.data.get(key)
+        if value is None:
+            return None
+        if value[1] is not None and value[1] < time.monotonic():
+            del self.server.data[key]
+            return None
+        return value[0]
+
+    def ping(self):
+        self._command()
+        return True
+
+    def get(self, key):
+        self._command()
+        with self.server.lock:
+            return self._live(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        self._command()
+        with self.server.lock:
+            if nx and self._live(key) is not None:
+                return None
+            ttl = ex if ex else px / 1000 if px else None
+            self.server.data[key] = (_encode(value), time.monotonic() + ttl if ttl else None)
+        return True
+
+    def mget(self, keys):
+        self._command()
+        with self.server.lock:
+            return [self._live(key) for key in keys]
+
+    def incr(self, key):
+        self._command()
+        with self.server.lock:
+            value, expires_at = self.server.data.get(key, (b"0", None))
+            value = int(value) + 1
+            self.server.data[key] = (str(value).encode(), expires_at)
+            return value
+
+    def pttl(self, key):
+        self._command()
+        with self.server.lock:
+            if self._live(key) is None:
+                return -2
+            expires_at = self.server.data[key][1]
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, *keys):
+        self._command()
+        with self.server.lock:
+            return sum(self.server.data.pop(key, None) is not None for key in keys)
+
+    def flushdb(self):
+        self._command()
+        with self.server.lock:
+            self.server.data.clear()
+        return True
+
+    def publish(self, channel, message):
+        self._command()
+        handlers = list(self.server.subscribers.get(channel, ()))
+        for handler in handlers:
+            handler({"type": "message", "channel": channel, "data": _encode(message)})
+        return len(handlers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self.server)
+
+    def register_script(self, script):
+        return FakeScript(self, script)
+
+class FakeScript:
+    """Runs the compare-and-delete lock release script of `services.cache`, atomically; other scripts are not supported."""
+
+    def __init__(self, client: FakeRedis, script: str):
+        if 'redis.call("get", KEYS[1]) == ARGV[1]' not in script:
+            raise NotImplementedError("FakeRedis only runs the lock release script")
+        self.client = client
+
+    def __call__(self, keys=(), args=(), client=None):
+        client = client or self.client
+        client._command()
+        with client.server.lock:
+            if client._live(keys[0]) != _encode(args[0]):
+                return 0
+            del client.server.data[keys[0]]
+            return 1
+
+class FakePipeline:
+    """Queues commands and runs them on `execute`, as one round trip."""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        client = FakeRedis(self.client.server)  # Only the pipeline itself pays the round trip
+        self.client._command()
+        results = [getattr(client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.client.server.commands -= len(self.calls)
+        self.calls = []
+        return results
+
+class FakeAsyncRedis:
+    """`redis.asyncio.Redis` counterpart of `FakeRedis`, backed by the same `FakeRedisServer`."""
+
+    def __init__(self, server: FakeRedisServer = None):
+        self.sync = FakeRedis(server)
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def command(*args, **kwargs):
+            return method(*args, **kwargs)
+        return command
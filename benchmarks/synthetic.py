@@ -0,0 +1,71 @@
+"""
+Deterministic synthetic hymnal data shared by the benchmarks.
+"""
+import random
+from typing import Iterable
+
+WORDS = (
+    "señor gloria alabanza cristo gracia amor santo cielo fiel luz paz vida "
+    "cruz salvador dios padre espíritu gozo esperanza canto rey eterno poder "
+    "corazón alma tierra mar fuego camino verdad misericordia perdón reino"
+).split()
+
+def _line(rng: random.Random, words: int = 6) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def generate_hymns(count: int, stanzas: int = 4, lines_per_stanza: int = 4, seed: int = 0) -> list[dict]:
+    """
+    Returns `count` hymns in the format produced by `hymn_parser.parse_hymns_from_text`,
+    each with `stanzas` numbered stanzas and one chorus.
+    """
+    rng = random.Random(seed)
+    hymns = []
+    for number in range(1, count + 1):
+        contenido = []
+        for stanza in range(1, stanzas + 1):
+            contenido.append({
+                "tipo": "estrofa",
+                "estrofa_num": stanza,
+                "texto": [_line(rng) for _ in range(lines_per_stanza)],
+            })
+            if stanza == 1:
+                contenido.append({"tipo": "coro", "texto": [_line(rng) for _ in range(lines_per_stanza)]})
+        hymns.append({"numero": number, "titulo": f"{_line(rng, 3)} {number}", "contenido": contenido})
+    return hymns
+
+def count_rows(hymns: list[dict]) -> int:
+    """Number of rows (hymns, content blocks and lines) an import of `hymns` writes."""
+    return sum(
+        1 + len(hymn["contenido"]) + sum(len(block["texto"]) for block in hymn["contenido"])
+        for hymn in hymns
+    )
+
+def generate_hymnal_text(count: int, stanzas: int = 4, lines_per_stanza: int = 4, seed: int = 0,
+                         skip_numbers: Iterable[int] = ()) -> str:
+    """
+    Returns OCR-like text of a hymnal with `count` hymns, for `hymn_parser`: an upper-case
+    "N. TITLE" line per hymn, followed by stanzas in the book's two layouts, alternating:
+    separated by blank lines, or under a bare stanza number line (with stray blank lines).
+    Every hymn has one chorus after its first stanza, under a "CORO" line.
+    Numbers in `skip_numbers` (hymns with a layout of their own) are left out.
+    """
+    rng = random.Random(seed)
+    skip = set(skip_numbers)
+    lines = ["HIMNARIO", ""]
+    number = 0
+    for _ in range(count):
+        number += 1
+        while number in skip:
+            number += 1
+        lines.append(f"{number}. {_line(rng, 3).upper()}")
+        numbered = number % 2 == 0
+        for stanza in range(1, stanzas + 1):
+            if numbered:
+                lines.append(str(stanza))
+            lines.extend(_line(rng) for _ in range(lines_per_stanza))
+            lines.append("")
+            if stanza == 1:
+                lines.append("CORO")
+                lines.extend(_line(rng) for _ in range(lines_per_stanza))
+                lines.append("")
+    return "\n".join(lines)
@@ -22,4 +22,20 @@ class HymnNotFoundError(DatabaseError):
 class CategoryNotFoundError(DatabaseError):
     """Raised when a specific category is not found."""
     def __init__(self, category_id: int):
-        super().__init__(detail=f"Category with id {category_id} not found.")
\ No newline at end of file
+        super().__init__(detail=f"Category with id {category_id} not found.")
+
+
+class JobNotFoundError(HimnarioGeneratorException):
+    """Raised when an extraction job id is unknown."""
+    def __init__(self, job_id: str):
+        super().__init__(detail=f"Extraction job with id {job_id} not found.")
+
+class JobCancelledError(HimnarioGeneratorException):
+    """Raised inside a running extraction job when its worker is shutting down."""
+    def __init__(self, job_id: str):
+        super().__init__(detail=f"Extraction job {job_id} was stopped by a worker shutdown.")
+
+class UploadTooLargeError(PdfProcessingError):
+    """Raised when an uploaded PDF exceeds the configured maximum size."""
+    def __init__(self, max_bytes: int):
+        super().__init__(detail=f"The uploaded file exceeds the maximum allowed size of {max_bytes // (1024 * 1024)} MB.")
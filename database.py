@@ -1,13 +1,14 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
-from models.tables import Base
+from models.tables import Base, ContentLine, SEARCH_CONFIG
 
 load_dotenv()
 
-# Construct the database URL from environment variables
-DATABASE_URL = (
+# Construct the database URL from environment variables; DATABASE_URL overrides the POSTGRES_* parts
+DATABASE_URL = os.getenv("DATABASE_URL") or (
     f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@"
     f"{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}/"
     f"{os.getenv('POSTGRES_DB')}"
@@ -28,6 +29,28 @@ def get_db():
     finally:
         db.close()
 
+def create_search_config(connection):
+    """
+    Creates the text search configuration of the lyric search on PostgreSQL if it does not exist yet, as the
+    Alembic migration does. Without the unaccent extension (it may need a superuser) the configuration is a
+    plain copy of the Spanish one: search keeps working, only accent-sensitive.
+    Workers starting together serialize on a transaction-level advisory lock, so only the first one creates it.
+    """
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": SEARCH_CONFIG})
+    exists = connection.execute(text("SELECT 1 FROM pg_ts_config WHERE cfgname = :name"), {"name": SEARCH_CONFIG}).first()
+    if exists:
+        return
+    connection.execute(text(f"CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = spanish)"))
+    try:
+        with connection.begin_nested():
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+            connection.execute(text(
+                f"ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} "
+                "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem"
+            ))
+    except Exception as e:
+        print(f"Could not enable the unaccent extension, lyric search will be accent-sensitive: {e}")
+
 def create_tables():
     """
     Create all tables in the database that are defined in the Base metadata.
@@ -35,8 +58,24 @@ def create_tables():
     """
     try:
         print("Creating database tables...")
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as connection:
+                create_search_config(connection)
         Base.metadata.create_all(bind=engine)
+        if engine.dialect.name == "postgresql":
+            # Tables created before the search index existed do not get it from create_all
+            for index in ContentLine.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
         print("Database tables created successfully.")
     except Exception as e:
         print(f"Error creating database tables: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def dialect_insert(db: Session, table):
+    """
+    Returns an INSERT construct for the session's dialect, so callers can use
+    `on_conflict_do_nothing` / `on_conflict_do_update` on PostgreSQL and SQLite alike.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
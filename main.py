@@ -1,13 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from routers import hymns, categories, generator, extraction, admin
-from database import create_tables
-from core.exceptions import HimnarioGeneratorException, PdfProcessingError, DatabaseError, HymnNotFoundError
+from database import create_tables, SessionLocal
+from core.exceptions import HimnarioGeneratorException, PdfProcessingError, DatabaseError, HymnNotFoundError, JobNotFoundError, UploadTooLargeError
+from services import extraction_service, generator_service, hymn_service, job_service, warmup_service
+
+# Usar el nuevo manejador de eventos lifespan
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_tables()
+    job_service.recover_jobs()
+    db = SessionLocal()
+    try:
+        hymn_service.rebuild_suggest_index(db)
+    finally:
+        db.close()
+    warmup_service.start_warmup()
+    yield
+    warmup_service.stop_warmup()
+    job_service.shutdown()
+    generator_service.shutdown()
 
 app = FastAPI(
     title="Himnario Generator API",
     description="API for extracting, managing, and generating hymnaries from PDF files.",
     version="1.0.0",
+    lifespan=lifespan
 )
 
 # Exception Handlers
@@ -25,6 +45,13 @@ async def pdf_processing_error_handler(request: Request, exc: PdfProcessingError
         content={"message": "Error processing PDF", "detail": exc.detail},
     )
 
+@app.exception_handler(UploadTooLargeError)
+async def upload_too_large_error_handler(request: Request, exc: UploadTooLargeError):
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"message": "Uploaded file is too large", "detail": exc.detail},
+    )
+
 @app.exception_handler(DatabaseError)
 async def database_error_handler(request: Request, exc: DatabaseError):
     return JSONResponse(
@@ -39,21 +66,45 @@ async def hymn_not_found_error_handler(request: Request, exc: HymnNotFoundError)
         content={"message": "Hymn not found", "detail": exc.detail},
     )
 
+@app.exception_handler(JobNotFoundError)
+async def job_not_found_error_handler(request: Request, exc: JobNotFoundError):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"message": "Extraction job not found", "detail": exc.detail},
+    )
 
-# Usar el nuevo manejador de eventos lifespan
-from contextlib import asynccontextmanager
+class UploadSizeLimitMiddleware:
+    """
+    Enforces MAX_UPLOAD_MB on request bodies: a declared Content-Length over the limit is rejected before the
+    body is read, and a body sent without one (chunked) fails with UploadTooLargeError once it exceeds the limit.
+    """
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    create_tables()
-    yield
+    def __init__(self, app):
+        self.app = app
 
-app = FastAPI(
-    title="Himnario Generator API",
-    description="API for extracting, managing, and generating hymnaries from PDF files.",
-    version="1.0.0",
-    lifespan=lifespan
-)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        max_bytes = extraction_service.MAX_UPLOAD_BYTES
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            response = await upload_too_large_error_handler(Request(scope), UploadTooLargeError(max_bytes=max_bytes))
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise UploadTooLargeError(max_bytes=max_bytes)
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
 
 app.include_router(hymns.router)
 app.include_router(categories.router)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, model_validator
+from datetime import datetime
+from typing import List, Optional, Union
 
 # Schema for creating a new category (input)
 class CategoryCreate(BaseModel):
@@ -32,16 +33,59 @@ class HymnContent(BaseModel):
     class Config:
         from_attributes = True
 
-class Hymn(BaseModel):
+class HymnSummary(BaseModel):
     id: int
     hymn_number: int
     title: str
     category_id: Optional[int]
-    content: List[HymnContent] = []
 
     class Config:
         from_attributes = True
 
-class GenerateDocxRequest(BaseModel):
-    hymn_ids: List[int]
-    file_name: str
\ No newline at end of file
+class Hymn(HymnSummary):
+    content: List[HymnContent] = []
+
+# Schema for a keyset-paginated hymn listing; pass `next_cursor` as `after` to get the next page
+class HymnPage(BaseModel):
+    items: List[Union[HymnSummary, Hymn]]
+    next_cursor: Optional[int]
+
+class HymnSearchResult(HymnSummary):
+    rank: float
+    matches: List[str]  # Matching lines, with the matched words wrapped in <mark> tags
+
+class HymnSuggestion(HymnSummary):
+    first_line: Optional[str]
+
+# Hymns of a generated document: exactly one of an explicit list (order and repeats are kept),
+# a hymn number range (either bound may be left open) or a category
+class HymnSelection(BaseModel):
+    hymn_ids: Optional[List[int]] = None
+    hymn_number_from: Optional[int] = None
+    hymn_number_to: Optional[int] = None
+    category_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_single_selection(self):
+        modes = [self.hymn_ids is not None,
+                 self.hymn_number_from is not None or self.hymn_number_to is not None,
+                 self.category_id is not None]
+        if sum(modes) != 1:
+            raise ValueError("Select hymns by exactly one of hymn_ids, a hymn number range or category_id.")
+        return self
+
+class GenerateDocxRequest(HymnSelection):
+    file_name: str
+
+
+class ExtractionJob(BaseModel):
+    id: str
+    status: str
+    filename: str
+    pages_total: Optional[int]
+    pages_done: int
+    hymns_parsed: int
+    result: Optional[dict]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
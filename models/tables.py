@@ -1,9 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, UniqueConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Text search configuration of the lyric search: Spanish stemming over unaccented words.
+# Created by the Alembic migration b57c0e8a4d19, or by database.create_tables on databases built without it
+SEARCH_CONFIG = "spanish_unaccent"
+
 class Category(Base):
     __tablename__ = 'categories'
     id = Column(Integer, primary_key=True, index=True)
@@ -16,6 +20,7 @@ class Hymn(Base):
     hymn_number = Column(Integer, unique=True, nullable=False, index=True)
     title = Column(String, nullable=False)
     category_id = Column(Integer, ForeignKey('categories.id'))
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the parsed title and content
 
     category = relationship("Category", back_populates="hymns")
     content = relationship("HymnContent", back_populates="hymn", cascade="all, delete-orphan")
@@ -33,9 +38,24 @@ class HymnContent(Base):
 
 class ContentLine(Base):
     __tablename__ = 'content_lines'
+    __table_args__ = (
+        # GIN index of the lyric search; services/search_service.py must query the exact same expression
+        Index('ix_content_lines_line_text_tsv', text(f"to_tsvector('{SEARCH_CONFIG}'::regconfig, line_text)"),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     hymn_content_id = Column(Integer, ForeignKey('hymn_content.id'), nullable=False)
     line_text = Column(Text, nullable=False)
     line_order = Column(Integer, nullable=False)
 
     hymn_content = relationship("HymnContent", back_populates="lines")
+
+class PageText(Base):
+    __tablename__ = 'page_texts'
+    __table_args__ = (UniqueConstraint('pdf_hash', 'page_number', 'column', name='uq_page_texts_page_column'),)
+    id = Column(Integer, primary_key=True, index=True)
+    pdf_hash = Column(String(64), nullable=False, index=True)
+    page_number = Column(Integer, nullable=False)
+    column = Column(String, nullable=False)  # 'full', 'left' or 'right'
+    engine = Column(String, nullable=False)  # 'pdfminer' or 'ocr'
+    text = Column(Text, nullable=False)
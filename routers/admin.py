@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 from database import get_db
 from services.admin_service import reset_database
+from services.cache import cache
+from services import warmup_service
 
 router = APIRouter(
     prefix="/admin",
@@ -11,3 +13,16 @@ router = APIRouter(
 @router.post("/reset-db", status_code=status.HTTP_200_OK, summary="Resetear la base de datos", description="Elimina todos los datos de himnos, contenidos y categorías. Solo para uso administrativo.")
 def reset_db_endpoint(db: Session = Depends(get_db)):
     return reset_database(db)
+
+@router.get("/cache-stats", summary="Estadísticas de la caché", description="Aciertos y tasas de acierto de la caché local en proceso y de Redis para este worker.")
+def cache_stats_endpoint():
+    return cache.stats()
+
+@router.get("/cache-warmup", summary="Estado del precalentamiento de la caché", description="Estado, progreso (entradas escritas / total) y duración del último precalentamiento de la caché en este worker.")
+def cache_warmup_status_endpoint():
+    return warmup_service.get_status()
+
+@router.post("/cache-warmup", status_code=status.HTTP_202_ACCEPTED, summary="Precalentar la caché", description="Precalcula en segundo plano el listado de himnos, cada himno y las categorías, interrumpiendo un precalentamiento en curso.")
+def cache_warmup_endpoint():
+    warmup_service.start_warmup()
+    return warmup_service.get_status()
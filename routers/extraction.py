@@ -1,8 +1,6 @@
-from fastapi import APIRouter, File, UploadFile, Depends
-from sqlalchemy.orm import Session
-from services import extraction_service
-from database import get_db
-from core.exceptions import PdfProcessingError
+from fastapi import APIRouter, Request, status
+from models import schemas
+from services import extraction_service, job_service
 
 router = APIRouter(
     prefix="/extraction",
@@ -10,17 +8,38 @@ router = APIRouter(
 )
 
 @router.post("/hymns-from-pdf",
+            status_code=status.HTTP_202_ACCEPTED,
             summary="Extract hymns from a PDF file",
-            description="Upload a PDF file of a hymnary. The service will process the file, extract the hymns using OCR, parse them, and store them in the database.",
-            response_description="A confirmation message with the number of hymns extracted.")
-async def extract_hymns_from_pdf(pdf_file: UploadFile = File(...), db: Session = Depends(get_db)):
+            description="Upload a PDF file of a hymnary. The file is queued for extraction in the background; use the returned job ID to follow the OCR, parsing and storage progress.",
+            response_description="The ID of the queued extraction job.",
+            # The body is streamed by job_service instead of parsed by FastAPI, so it is described here
+            openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "properties": {job_service.PDF_FIELD: {"type": "string", "format": "binary"}},
+                "required": [job_service.PDF_FIELD],
+            }}}}})
+async def extract_hymns_from_pdf(request: Request):
     """
-    Extracts hymns from an uploaded PDF file.
+    Queues the extraction of hymns from an uploaded PDF file.
 
-    - **pdf_file**: The PDF file to process.
+    - **pdf_file**: The PDF file to process, streamed to disk as it is received.
     """
-    if not pdf_file.filename.endswith(".pdf"):
-        raise PdfProcessingError(detail="Only PDF files are allowed")
-    
-    result = await extraction_service.process_pdf_for_hymns(pdf_file, db)
-    return {"message": "Extraction process completed successfully", "result": result}
\ No newline at end of file
+    extraction_service.verify_dependencies()
+    job = await job_service.submit_extraction_job(request)
+    return {
+        "message": "Extraction job queued",
+        "job_id": job["id"],
+        "status_url": router.url_path_for("read_extraction_job", job_id=job["id"]),
+    }
+
+@router.get("/jobs/{job_id}",
+            response_model=schemas.ExtractionJob,
+            summary="Get the status of an extraction job",
+            description="Returns the progress (pages done, hymns parsed), the result or the error of an extraction job.",
+            response_description="The current state of the extraction job.")
+def read_extraction_job(job_id: str):
+    """
+    Retrieves the state of an extraction job.
+    - **job_id**: The ID returned when the PDF was uploaded.
+    """
+    return job_service.get_job(job_id)
@@ -1,5 +1,7 @@
+import os
 from fastapi import APIRouter, Depends
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from services import generator_service
 from models import schemas
@@ -12,16 +14,21 @@ router = APIRouter(
 )
 
 @router.post("/docx",
-            summary="Generate a DOCX document from a list of hymn numbers",
-            description="Creates a .docx file containing the full content of the specified hymns. The generated file is returned as a response.",
+            summary="Generate a DOCX document from a list of hymns, a number range or a category",
+            description="Creates a .docx file containing the full content of the selected hymns: an explicit list of IDs (in that order, repeats included), a hymn number range (e.g. the whole book) or a category. The generated file is returned as a response.",
             response_class=FileResponse)
 async def generate_hymnary_docx(request: schemas.GenerateDocxRequest, db: Session = Depends(get_db)):
     """
-    Generates a DOCX document from a list of hymn numbers.
+    Generates a DOCX document from a selection of hymns. Use exactly one of:
+
+    - **hymn_ids**: The hymn IDs to include, in order.
+    - **hymn_number_from** / **hymn_number_to**: An inclusive hymn number range; either bound may be omitted.
+    - **category_id**: Every hymn of a category, by number.
 
-    - **hymn_numbers**: A list of hymn numbers to include in the document.
     - **file_name**: The desired name for the output .docx file.
     """
     # The service layer should raise appropriate exceptions
-    file_path = await generator_service.generate_hymnary_docx(db, request.hymn_ids, request.file_name)
-    return FileResponse(path=file_path, media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document', filename=request.file_name)
\ No newline at end of file
+    file_path = await generator_service.generate_hymnary_docx(db, request)
+    # Each request gets its own temporary file, streamed back and deleted once sent
+    return FileResponse(path=file_path, media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+                        filename=os.path.basename(request.file_name), background=BackgroundTask(os.remove, file_path))
\ No newline at end of file
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from models import schemas
-from services import hymn_service
+from services import hymn_service, search_service
 from database import get_db
 
 router = APIRouter(
@@ -11,25 +11,84 @@ router = APIRouter(
 )
 
 @router.get("/", 
+            response_model=schemas.HymnPage,
+            summary="Get a page of hymns",
+            description="Returns hymns ordered by number using keyset pagination. Items only carry id, number, title and category unless `include_content` is set.",
+            response_description="A page of hymns and the cursor for the next page.")
+def read_hymns(after: Optional[int] = Query(None, description="Hymn number of the last item of the previous page."),
+               limit: int = Query(hymn_service.DEFAULT_PAGE_SIZE, ge=1, le=hymn_service.MAX_PAGE_SIZE),
+               include_content: bool = Query(False, description="Include stanzas and choruses of every hymn."),
+               db: Session = Depends(get_db)):
+    """
+    Retrieves a page of hymns.
+    - **after**: Cursor returned as `next_cursor` by the previous page.
+    - **limit**: Maximum number of hymns in the page.
+    - **include_content**: Whether to load the full content of each hymn.
+    """
+    # The cached body is sent as is; response_model only documents it
+    return Response(
+        hymn_service.get_hymns_json(db, after=after, limit=limit, include_content=include_content),
+        media_type="application/json",
+    )
+
+@router.get("/search",
+            response_model=List[schemas.HymnSearchResult],
+            summary="Search hymns by lyrics",
+            description="Full-text, accent-insensitive search over every line of every hymn. Results are ranked per hymn and include the matching lines highlighted with <mark> tags.",
+            response_description="The best matching hymns, most relevant first.")
+def search_hymns(q: str = Query(..., min_length=1, description="Words or a phrase remembered from the lyrics."),
+                 limit: int = Query(search_service.DEFAULT_SEARCH_LIMIT, ge=1, le=search_service.MAX_SEARCH_LIMIT),
+                 db: Session = Depends(get_db)):
+    """
+    Searches hymns by a lyric fragment.
+    - **q**: The text to look for, e.g. "cuan grande es el".
+    - **limit**: Maximum number of hymns to return.
+    """
+    return search_service.search_hymns(db, q, limit)
+
+@router.get("/suggest",
+            response_model=List[schemas.HymnSuggestion],
+            summary="Suggest hymns while typing",
+            description="Typeahead over hymn numbers, titles and first lines, served from an in-memory index. Tolerates missing accents and small typos.",
+            response_description="The best matching hymns, closest first.")
+def suggest_hymns(q: str = Query(..., min_length=1, description="What has been typed so far, e.g. \"cuan grande\" or \"12\"."),
+                  limit: int = Query(10, ge=1, le=50),
+                  category_id: Optional[int] = Query(None, description="Only suggest hymns of this category."),
+                  db: Session = Depends(get_db)):
+    """
+    Suggests hymns for a partial title, first line or hymn number.
+    - **q**: The text typed so far.
+    - **limit**: Maximum number of suggestions.
+    - **category_id**: Optional category filter.
+    """
+    return hymn_service.suggest_hymns(db, q, limit=limit, category_id=category_id)
+
+@router.get("/batch",
             response_model=List[schemas.Hymn],
-            summary="Get a list of all hymns",
-            description="Returns a list of all hymns stored in the database, without their content.",
-            response_description="A list of hymns, each with a number and a title.")
-def read_hymns(db: Session = Depends(get_db)):
+            summary="Get several hymns by their IDs",
+            description="Returns the full hymns in the order requested, e.g. every hymn of a service. Cached hymns are read in one round trip and the rest with a single query.",
+            response_description="The full hymn objects, in the order of `ids`.")
+def read_hymns_batch(ids: str = Query(..., pattern=r"^\d+(,\d+)*$", description="Comma-separated hymn IDs, e.g. \"12,7,30\"."),
+                     db: Session = Depends(get_db)):
     """
-    Retrieves a list of all hymns.
+    Retrieves several hymns at once.
+    - **ids**: The database IDs of the hymns, comma-separated. Repeated IDs are repeated in the result.
     """
-    return hymn_service.get_hymns(db)
+    hymn_ids = [int(hymn_id) for hymn_id in ids.split(",")]
+    if len(hymn_ids) > hymn_service.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"At most {hymn_service.MAX_BATCH_SIZE} hymns can be requested at once.")
+    return Response(hymn_service.get_hymns_batch_json(db, hymn_ids), media_type="application/json")
 
 @router.get("/{hymn_id}", 
             response_model=schemas.Hymn,
             summary="Get a specific hymn by its ID",
             description="Returns a single hymn, including its full content (stanzas and choruses).",
             response_description="The full hymn object, including content.")
-def read_hymn(hymn_id: int, db: Session = Depends(get_db)):
+async def read_hymn(hymn_id: int, db: Session = Depends(get_db)):
     """
     Retrieves a specific hymn by its unique ID.
     - **hymn_id**: The database ID of the hymn to retrieve.
     """
     # The service layer now raises HymnNotFoundError, which is handled globally
-    return hymn_service.get_hymn(db, hymn_id)
\ No newline at end of file
+    return Response(await hymn_service.get_hymn_json_async(db, hymn_id), media_type="application/json")
\ No newline at end of file
@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
 from models.tables import ContentLine, HymnContent, Hymn, Category
+from services.cache import cache
+from services.suggest_index import suggest_index
 
 def reset_database(db: Session):
     """
@@ -11,4 +13,6 @@ def reset_database(db: Session):
     db.query(Hymn).delete()
     db.query(Category).delete()
     db.commit()
+    cache.clear()
+    suggest_index.clear()
     return {"message": "Base de datos limpiada exitosamente."}
@@ -1,50 +1,718 @@
 import redis
+import redis.asyncio
 import os
-import json
-from typing import Optional, Any
+import math
+import random
+import time
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional, Any
+
+# Pooled Redis connections with short timeouts, so an unhealthy Redis fails fast instead of hanging requests
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+# Consecutive failures that open the circuit, and seconds between reconnection attempts while it is open
+REDIS_FAILURE_THRESHOLD = int(os.getenv("REDIS_FAILURE_THRESHOLD", 3))
+REDIS_RECONNECT_INTERVAL = float(os.getenv("REDIS_RECONNECT_INTERVAL", 5))
+# Invalidations that could not reach Redis are replayed on reconnect; beyond this many, everything is invalidated instead
+MAX_PENDING_INVALIDATIONS = 1000
+REDIS_CONNECTION_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+# In-process tier in front of Redis; set CACHE_LOCAL_MAX_ENTRIES=0 to disable it
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 1000))
+CACHE_LOCAL_MAX_BYTES = int(os.getenv("CACHE_LOCAL_MAX_MB", 64)) * 1024 * 1024
+# Upper bound on how long a local entry can outlive a lost invalidation message
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 30))
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+# Every key is suffixed with the generation counters ("gen:{name}" in Redis) of the whole cache and of its
+# tags, so invalidating a tag or everything is one INCR; entries of old generations just expire
+CACHE_GENERATION_PREFIX = "gen:"
+GLOBAL_GENERATION = "cache"
+# Stampede protection for get_or_compute: previous values are kept under "stale:{key}", which
+# invalidations do not touch, and one worker at a time rebuilds a key while holding "lock:{key}"
+CACHE_STALE_PREFIX = "stale:"
+CACHE_LOCK_PREFIX = "lock:"
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 24 * 3600))
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", 10))
+# XFetch: larger values refresh earlier before expiry; 0 disables early refresh
+CACHE_XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", 1.0))
+# Change logs let workers catch up with what others changed instead of reloading everything: "changes:{log}"
+# counts the entries, each kept under "changes:{log}:{n}"; readers further behind than the log reaches start over
+CACHE_CHANGE_LOG_PREFIX = "changes:"
+CACHE_CHANGE_LOG_TTL = int(os.getenv("CACHE_CHANGE_LOG_TTL", 3600))
+MAX_CHANGE_LOG_READ = 500
+# Deletes a lock only if it still holds our token, atomically: an expired lock may belong to another worker by now
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+def redis_connection_kwargs() -> dict:
+    return {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", 6379)),
+        "db": 0,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "health_check_interval": 30,
+    }
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive connection failures so callers skip Redis at once.
+    It is closed again by the reconnection thread of `Cache` when Redis answers.
+    """
+
+    def __init__(self, failure_threshold: int):
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self.is_open = False
+        self._lock = threading.Lock()
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self) -> bool:
+        """Counts a failure; returns True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.is_open or self.failures < self.failure_threshold:
+                return False
+            self.is_open = True
+            return True
+
+    def open(self):
+        with self._lock:
+            self.is_open = True
+
+    def close(self):
+        with self._lock:
+            self.failures = 0
+            self.is_open = False
+
+class _LocalEntry:
+    __slots__ = ("raw", "expires_at")
+
+    def __init__(self, raw: bytes, expires_at: float):
+        self.raw = raw
+        self.expires_at = expires_at
+
+class LocalCache:
+    """
+    Thread-safe LRU of serialized values with a TTL and limits in entries and bytes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        # Incremented on every invalidation, so a read racing with one does not store a stale value
+        self.epoch = 0
+        self._entries: OrderedDict[str, _LocalEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[_LocalEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, raw: bytes, epoch: int) -> Optional[_LocalEntry]:
+        if len(raw) > self.max_bytes:
+            return None
+        with self._lock:
+            if epoch != self.epoch:
+                return None
+            self._pop(key)
+            entry = self._entries[key] = _LocalEntry(raw, time.monotonic() + self.ttl)
+            self.bytes += len(raw)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+            return entry
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.bytes -= len(entry.raw)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self.bytes = 0
 
 class Cache:
+    """
+    Two-tier cache: a bounded in-process LRU in front of Redis.
+    Generation bumps are published on a Redis pub/sub channel so every worker stops using its local copies.
+    Redis is reached through a connection pool with short timeouts behind a circuit breaker:
+    while Redis is unhealthy, reads miss, writes are skipped, the local tier is bypassed and a
+    background thread reconnects.
+    """
     _instance = None
 
-    def __new__(cls):
+    def __new__(cls, client: Optional[redis.Redis] = None):
+        # Cache() is the process-wide instance; passing a client builds a separate one (tests, benchmarks)
+        if client is not None:
+            instance = super(Cache, cls).__new__(cls)
+            instance._setup(client)
+            return instance
         if cls._instance is None:
             cls._instance = super(Cache, cls).__new__(cls)
-            cls._instance.client = cls._instance._get_redis_client()
+            cls._instance._setup(redis.Redis(connection_pool=redis.ConnectionPool(**redis_connection_kwargs())))
         return cls._instance
 
-    def _get_redis_client(self):
-        redis_host = os.getenv("REDIS_HOST", "localhost")
-        redis_port = int(os.getenv("REDIS_PORT", 6379))
+    def _setup(self, client: redis.Redis):
+        self.client = client
+        self._release_lock = client.register_script(RELEASE_LOCK_SCRIPT)
+        self.breaker = CircuitBreaker(REDIS_FAILURE_THRESHOLD)
+        self.local = LocalCache(CACHE_LOCAL_MAX_ENTRIES, CACHE_LOCAL_MAX_BYTES, CACHE_LOCAL_TTL) if CACHE_LOCAL_MAX_ENTRIES > 0 else None
+        self.stats_counters = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+        self.stampede_counters = {"recomputes": 0, "early_refreshes": 0, "stale_served": 0}
+        self._inflight: dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._compute_seconds: dict[str, float] = {}
+        self._listener = None
+        self._reconnect_lock = threading.Lock()
+        self._reconnecting = False
+        self._pending_invalidations: list[tuple[str, str]] = []
+        # Generation counters read from Redis, kept until a pub/sub message reports a bump (or CACHE_LOCAL_TTL)
+        self._generations: dict[str, tuple[int, float]] = {}
+        self._generation_epoch = 0
         try:
-            client = redis.Redis(host=redis_host, port=redis_port, db=0, decode_responses=True)
             client.ping()
-            print(f"Connected to Redis at {redis_host}:{redis_port}")
-            return client
-        except redis.exceptions.ConnectionError as e:
+            self._start_listener()
+            print("Connected to Redis")
+        except redis.exceptions.RedisError as e:
             print(f"Could not connect to Redis: {e}")
-            return None
+            self._open_circuit()
 
-    def get(self, key: str) -> Optional[Any]:
-        if not self.client:
-            return None
-        value = self.client.get(key)
-        if value:
-            return json.loads(value)
-        return None
+    @property
+    def available(self) -> bool:
+        return not self.breaker.is_open
 
-    def set(self, key: str, value: Any, ex: Optional[int] = None):
-        if not self.client:
+    def _start_listener(self):
+        if self.local is None or (self._listener is not None and self._listener.is_alive()):
             return
-        self.client.set(key, json.dumps(value), ex=ex)
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: self._on_invalidation})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self._on_listener_error)
 
-    def delete(self, key: str):
-        if not self.client:
-            return
-        self.client.delete(key)
+    def _record_failure(self, error: Exception):
+        if self.breaker.record_failure():
+            print(f"Redis is unavailable, bypassing the cache until it reconnects: {error}")
+            self._open_circuit()
+
+    def _open_circuit(self):
+        self.breaker.open()
+        # Invalidations may be missed while disconnected, so nothing local can be trusted
+        self._invalidate_local("gen", GLOBAL_GENERATION)
+        self._start_reconnect()
+
+    def _start_reconnect(self):
+        with self._reconnect_lock:
+            if self._reconnecting:
+                return
+            self._reconnecting = True
+        threading.Thread(target=self._reconnect, daemon=True).start()
+
+    def _reconnect(self):
+        """
+        Every REDIS_RECONNECT_INTERVAL, replays pending invalidations and closes the circuit once Redis answers.
+        Runs until the circuit is closed and nothing is pending.
+        """
+        try:
+            while True:
+                time.sleep(REDIS_RECONNECT_INTERVAL)
+                was_open = self.breaker.is_open
+                try:
+                    self.client.ping()
+                    self._replay_invalidations()
+                    self._start_listener()
+                except REDIS_CONNECTION_ERRORS:
+                    continue
+                except Exception as e:
+                    # E.g. a ResponseError: keep retrying, or the cache would stay bypassed until a restart
+                    print(f"Reconnecting to Redis failed, retrying: {e}")
+                    continue
+                if was_open:
+                    self._invalidate_local("gen", GLOBAL_GENERATION)
+                    self.breaker.close()
+                    print("Reconnected to Redis")
+                with self._reconnect_lock:
+                    if not self._pending_invalidations and not self.breaker.is_open:
+                        self._reconnecting = False
+                        return
+        except BaseException:
+            with self._reconnect_lock:
+                self._reconnecting = False
+            raise
+
+    def _call(self, operation: Callable[[redis.Redis], Any], default: Any = None) -> Any:
+        """
+        Runs `operation` on the Redis client unless the circuit is open. Redis errors return `default`;
+        connection errors also count towards opening the circuit.
+        """
+        if self.breaker.is_open:
+            return default
+        try:
+            result = operation(self.client)
+        except REDIS_CONNECTION_ERRORS as e:
+            self._record_failure(e)
+            return default
+        except redis.exceptions.RedisError as e:
+            # Redis answered, e.g. with an OOM or LOADING error: skip the cache for this call only
+            print(f"Redis command failed: {e}")
+            return default
+        self.breaker.record_success()
+        return result
+
+    def _on_invalidation(self, message: dict):
+        action, _, target = message["data"].decode().partition(":")
+        self._invalidate_local(action, target)
+
+    def _on_listener_error(self, error: Exception, pubsub, thread):
+        # Invalidations may have been missed while disconnected: drop everything and retry shortly
+        if self.available:
+            print(f"Cache invalidation listener error: {error}")
+            self._record_failure(error)
+        self._invalidate_local("gen", GLOBAL_GENERATION)
+        time.sleep(1)
+
+    def cached_generations(self, names: tuple[str, ...]) -> Optional[list[int]]:
+        """The generations of `names` known locally, or None if any of them has to be read from Redis."""
+        now = time.monotonic()
+        values = []
+        for name in names:
+            cached = self._generations.get(name)
+            if cached is None or cached[1] < now:
+                return None
+            values.append(cached[0])
+        return values
+
+    def remember_generations(self, names: tuple[str, ...], values: list[int], epoch: int):
+        # Only the listener keeps local generations current, so they are not kept without it
+        if self.local is not None and epoch == self._generation_epoch:
+            expires_at = time.monotonic() + CACHE_LOCAL_TTL
+            self._generations.update((name, (value, expires_at)) for name, value in zip(names, values))
+
+    def _fetch_generations(self, client: redis.Redis, names: tuple[str, ...]) -> list[int]:
+        keys = [f"{CACHE_GENERATION_PREFIX}{name}" for name in names]
+        values = client.mget(keys)
+        if None in values:
+            # Counters start from the clock, so one lost to eviction never brings back old entries
+            pipe = client.pipeline(transaction=False)
+            for key, value in zip(keys, values):
+                if value is None:
+                    pipe.set(key, int(time.time() * 1000), nx=True)
+            pipe.execute()
+            values = client.mget(keys)
+        return [int(value) for value in values]
+
+    def versioned_key(self, key: str, tags: tuple[str, ...] = ()) -> Optional[str]:
+        """
+        `key` suffixed with the current generations of the cache and of `tags`, e.g. "hymn_detail_7@1712.3".
+        Returns None if Redis cannot be reached.
+        """
+        keys = self.versioned_keys([(key, tags)])
+        return keys[0] if keys is not None else None
+
+    def versioned_keys(self, keys: list[tuple[str, tuple[str, ...]]]) -> Optional[list[str]]:
+        """`versioned_key` of each `(key, tags)`, reading the generations not known locally in one round trip."""
+        names = tuple(dict.fromkeys(name for _, tags in keys for name in (GLOBAL_GENERATION, *tags)))
+        values = self.cached_generations(names)
+        if values is None:
+            epoch = self._generation_epoch
+            values = self._call(lambda client: self._fetch_generations(client, names))
+            if values is None:
+                return None
+            self.remember_generations(names, values, epoch)
+        generations = dict(zip(names, values))
+        return [self.key_for_generations(key, generations, tags) for key, tags in keys]
+
+    def read_generations(self, names: list[str]) -> Optional[dict[str, int]]:
+        """Current generations of `names`, read from Redis in one round trip; None if Redis cannot be reached."""
+        values = self._call(lambda client: self._fetch_generations(client, (GLOBAL_GENERATION, *names)))
+        return dict(zip((GLOBAL_GENERATION, *names), values)) if values is not None else None
+
+    def log_change(self, log: str, members: Iterable[Any]) -> Optional[int]:
+        """Appends `members` to the change log `log` as its next entry; returns its position, None if Redis failed."""
+        counter = f"{CACHE_CHANGE_LOG_PREFIX}{log}"
+        def append(client):
+            position = client.incr(counter)
+            client.set(f"{counter}:{position}", ",".join(str(member) for member in members), ex=CACHE_CHANGE_LOG_TTL)
+            return position
+        return self._call(append)
+
+    def change_log_position(self, log: str) -> Optional[int]:
+        """Position of the last entry of the change log `log`, 0 if it is empty; None if Redis cannot be reached."""
+        return self._call(lambda client: int(client.get(f"{CACHE_CHANGE_LOG_PREFIX}{log}") or 0))
+
+    def read_changes(self, log: str, since: int) -> Optional[tuple[int, Optional[set[str]]]]:
+        """
+        Position of the last entry of the change log `log` and the members of its entries after `since`.
+        The members are None if the log no longer has all of them (expired, more than MAX_CHANGE_LOG_READ
+        or the counter was lost): the reader has to start over. None if Redis cannot be reached.
+        """
+        counter = f"{CACHE_CHANGE_LOG_PREFIX}{log}"
+        def read(client):
+            position = int(client.get(counter) or 0)
+            if position == since:
+                return position, set()
+            if not since < position <= since + MAX_CHANGE_LOG_READ:
+                return position, None
+            entries = client.mget([f"{counter}:{n}" for n in range(since + 1, position + 1)])
+            if None in entries:
+                return position, None
+            return position, {member for entry in entries for member in entry.decode().split(",") if member}
+        return self._call(read)
+
+    @staticmethod
+    def key_for_generations(key: str, generations: dict[str, int], tags: tuple[str, ...] = ()) -> str:
+        """The versioned key `versioned_key` would return for the given generations."""
+        return f"{key}@{'.'.join(str(generations[name]) for name in (GLOBAL_GENERATION, *tags))}"
+
+    def set_many(self, items: list[tuple[str, bytes]], ex: int) -> bool:
+        """Stores `(versioned key, bytes)` pairs with one pipelined round trip; returns False if Redis failed."""
+        def store(client):
+            pipe = client.pipeline(transaction=False)
+            for key, raw in items:
+                pipe.set(key, raw, ex=ex)
+            pipe.execute()
+            return True
+        return self._call(store, default=False)
+
+    def fill_many(self, items: list[tuple[str, str, bytes]], ex: int) -> bool:
+        """
+        Stores `(key, versioned key, bytes)` entries the way `get_or_compute` does, each with its
+        `stale:` copy, in one pipelined round trip; returns False if Redis failed.
+        """
+        def store(client):
+            pipe = client.pipeline(transaction=False)
+            for key, versioned_key, raw in items:
+                pipe.set(versioned_key, raw, ex=ex).set(self._stale_key(key, versioned_key), raw, ex=CACHE_STALE_TTL)
+            pipe.execute()
+            return True
+        return self._call(store, default=False)
+
+    def acquire_lock(self, name: str, timeout: float) -> Optional[str]:
+        """Takes the Redis lock `lock:{name}` for `timeout` seconds; returns its token, or None if it is held."""
+        token = uuid.uuid4().hex
+        acquired = self._call(lambda client: client.set(f"{CACHE_LOCK_PREFIX}{name}", token, nx=True, px=int(timeout * 1000)))
+        return token if acquired else None
+
+    def release_lock(self, name: str, token: str):
+        """Releases `lock:{name}` unless it expired and another worker took it."""
+        self._call(lambda client: self._release_lock(keys=[f"{CACHE_LOCK_PREFIX}{name}"], args=[token], client=client))
+
+    @staticmethod
+    def _stale_key(key: str, versioned_key: str) -> str:
+        # Only the global generation: the previous value survives tag bumps but not a `clear`
+        return f"{CACHE_STALE_PREFIX}{key}@{versioned_key.rsplit('@', 1)[1].split('.')[0]}"
+
+    def get_raw(self, key: str, tags: tuple[str, ...] = ()) -> Optional[bytes]:
+        """Returns the stored bytes as they are, e.g. a response body kept by `set_raw`."""
+        entry, _ = self._get_entry(self.versioned_key(key, tags))
+        return entry.raw if entry else None
+
+    def get_many(self, versioned_keys: list[str]) -> list[Optional[bytes]]:
+        """Stored bytes of each versioned key (None when missing), from the local tier or else one Redis MGET."""
+        values: list[Optional[bytes]] = [None] * len(versioned_keys)
+        if not self.available:
+            return values
+        missing = []
+        for i, key in enumerate(versioned_keys):
+            entry = self.local.get(key) if self.local is not None else None
+            if entry is not None:
+                self.stats_counters["local_hits"] += 1
+                values[i] = entry.raw
+            else:
+                missing.append(i)
+        if not missing:
+            return values
+        epoch = self.local.epoch if self.local is not None else 0
+        fetched = self._call(lambda client: client.mget([versioned_keys[i] for i in missing]), default=[None] * len(missing))
+        for i, raw in zip(missing, fetched):
+            if not raw:
+                self.stats_counters["misses"] += 1
+                continue
+            self.stats_counters["redis_hits"] += 1
+            values[i] = raw
+            if self.local is not None:
+                self.local.set(versioned_keys[i], raw, epoch)
+        return values
+
+    def _get_entry(self, key: Optional[str], with_ttl: bool = False) -> tuple[Optional[_LocalEntry], Optional[float]]:
+        """Looks up the local tier, then Redis; with `with_ttl`, also returns the seconds Redis has left for the key."""
+        if key is None or not self.available:
+            return None, None
+        if self.local is not None:
+            entry = self.local.get(key)
+            if entry is not None:
+                self.stats_counters["local_hits"] += 1
+                return entry, None
+            epoch = self.local.epoch
+        if with_ttl:
+            raw, pttl = self._call(lambda client: client.pipeline(transaction=False).get(key).pttl(key).execute(), default=(None, -2))
+        else:
+            raw, pttl = self._call(lambda client: client.get(key)), -1
+        if not raw:
+            self.stats_counters["misses"] += 1
+            return None, None
+        self.stats_counters["redis_hits"] += 1
+        ttl = pttl / 1000 if pttl > 0 else None
+        if self.local is not None:
+            entry = self.local.set(key, raw, epoch)
+            if entry is not None:
+                return entry, ttl
+        return _LocalEntry(raw, 0), ttl
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes], ex: int, tags: tuple[str, ...] = ()) -> bytes:
+        """
+        Returns the cached bytes of `key`, calling `compute` to rebuild them with stampede protection:
+        - single flight: concurrent callers in a process share one computation, and across workers
+          only the holder of a Redis lock recomputes;
+        - stale-while-revalidate: while a rebuild is running, other callers get the previous value;
+        - probabilistic early refresh (XFetch): hits shortly before expiry occasionally rebuild the
+          key ahead of time, so it rarely expires under load.
+        The previous value survives tag invalidations (it is what readers get during the rebuild)
+        but not a `clear`.
+        """
+        versioned_key = self.versioned_key(key, tags) if self.available else None
+        if versioned_key is None:
+            return compute()
+        stale_key = self._stale_key(key, versioned_key)
+        entry, ttl = self._get_entry(versioned_key, with_ttl=True)
+        previous = entry.raw if entry else None
+        if previous is not None:
+            if not self._refresh_early(key, ttl):
+                return previous
+            self.stampede_counters["early_refreshes"] += 1
+
+        with self._inflight_lock:
+            future = self._inflight.get(versioned_key)
+            leader = future is None
+            if leader:
+                future = self._inflight[versioned_key] = Future()
+        if not leader:
+            stale = previous or self._call(lambda client: client.get(stale_key))
+            if stale:
+                self.stampede_counters["stale_served"] += 1
+                return stale
+            return future.result()
+
+        try:
+            value = self._compute_with_lock(key, versioned_key, stale_key, compute, ex, previous)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[versioned_key]
+
+    def _refresh_early(self, key: str, ttl: Optional[float]) -> bool:
+        # Refresh with a probability that grows as expiry nears and with how long the value takes to compute
+        if ttl is None or CACHE_XFETCH_BETA <= 0:
+            return False
+        delta = self._compute_seconds.get(key, 0.05)
+        return -delta * CACHE_XFETCH_BETA * math.log(1.0 - random.random()) >= ttl
+
+    def _compute_with_lock(self, key: str, versioned_key: str, stale_key: str, compute: Callable[[], bytes],
+                           ex: int, previous: Optional[bytes]) -> bytes:
+        lock_key = f"{CACHE_LOCK_PREFIX}{versioned_key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        # Without Redis there is nobody to coordinate with, so the lock counts as acquired
+        while not self._call(lambda client: client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000)), default=True):
+            # Another worker is rebuilding: serve the previous value, or wait for the new one
+            stale = previous or self._call(lambda client: client.get(stale_key))
+            if stale:
+                self.stampede_counters["stale_served"] += 1
+                return stale
+            time.sleep(0.05)
+            value = self._call(lambda client: client.get(versioned_key))
+            if value:
+                return value
+            if time.monotonic() > deadline:
+                break  # The lock holder is stuck or gone; compute without the lock
+
+        try:
+            if previous is None:
+                # Another worker may have stored the key just before releasing the lock
+                value = self._call(lambda client: client.get(versioned_key))
+                if value:
+                    return value
+            start = time.perf_counter()
+            value = compute()
+            self._compute_seconds[key] = time.perf_counter() - start
+            self.stampede_counters["recomputes"] += 1
+            self._call(lambda client: client.pipeline(transaction=False)
+                       .set(versioned_key, value, ex=ex).set(stale_key, value, ex=CACHE_STALE_TTL).execute())
+            return value
+        finally:
+            self.release_lock(versioned_key, token)
+
+    def set_raw(self, key: str, raw: bytes, ex: Optional[int] = None, tags: tuple[str, ...] = ()):
+        """Stores already serialized bytes, returned unchanged by `get_raw`."""
+        versioned_key = self.versioned_key(key, tags)
+        if versioned_key is not None:
+            self._call(lambda client: client.set(versioned_key, raw, ex=ex))
+
+    def bump(self, *tags: str):
+        """Invalidates every key stored with any of `tags` with one INCR per tag, in a single round trip."""
+        if tags:
+            self._invalidate("gen", ",".join(tags))
 
     def clear(self):
-        if not self.client:
+        """Invalidates every key by bumping the global generation."""
+        self.bump(GLOBAL_GENERATION)
+
+    def _invalidate_local(self, action: str, target: str):
+        if action == "gen":
+            self._generation_epoch += 1
+            if GLOBAL_GENERATION in target.split(","):
+                self._generations.clear()
+                if self.local is not None:
+                    self.local.clear()
+            for name in target.split(","):
+                self._generations.pop(name, None)
+            # Local entries of older generations can no longer be requested and age out of the LRU
+
+    def _invalidate(self, action: str, target: str):
+        """Applies an invalidation locally, in Redis and, through pub/sub, in the other workers."""
+        self._invalidate_local(action, target)
+        if self._call(lambda client: self._apply_invalidation(client, action, target), default=False):
+            if self._pending_invalidations:
+                self._call(lambda client: self._replay_invalidations())
             return
-        self.client.flushdb()
+        self._remember_invalidation(action, target)
+
+    def _remember_invalidation(self, action: str, target: str):
+        # Redis failed: keep the invalidation and retry it in the background, so it cannot serve stale entries
+        everything = ("gen", GLOBAL_GENERATION)
+        with self._reconnect_lock:
+            if len(self._pending_invalidations) >= MAX_PENDING_INVALIDATIONS:
+                self._pending_invalidations = [everything]
+            elif everything not in self._pending_invalidations:
+                self._pending_invalidations.append((action, target))
+        self._start_reconnect()
+
+    def _apply_invalidation(self, client: redis.Redis, action: str, target: str) -> bool:
+        pipe = client.pipeline(transaction=False)
+        for name in target.split(","):
+            generation_key = f"{CACHE_GENERATION_PREFIX}{name}"
+            pipe.set(generation_key, int(time.time() * 1000), nx=True).incr(generation_key)
+        pipe.execute()
+        client.publish(CACHE_INVALIDATION_CHANNEL, f"{action}:{target}")
+        return True
+
+    def _replay_invalidations(self):
+        with self._reconnect_lock:
+            pending, self._pending_invalidations = self._pending_invalidations, []
+        try:
+            for i, (action, target) in enumerate(pending):
+                self._apply_invalidation(self.client, action, target)
+        except redis.exceptions.RedisError:
+            with self._reconnect_lock:
+                self._pending_invalidations = pending[i:] + self._pending_invalidations
+            raise
+
+    def stats(self) -> dict:
+        """Hit counters and ratios of each tier since the process started."""
+        counters = dict(self.stats_counters)
+        lookups = sum(counters.values())
+        redis_lookups = counters["redis_hits"] + counters["misses"]
+        return {
+            **counters,
+            **self.stampede_counters,
+            "redis_connected": self.available,
+            "local_hit_ratio": counters["local_hits"] / lookups if lookups else 0.0,
+            "redis_hit_ratio": counters["redis_hits"] / redis_lookups if redis_lookups else 0.0,
+            "overall_hit_ratio": (counters["local_hits"] + counters["redis_hits"]) / lookups if lookups else 0.0,
+            "local_entries": len(self.local) if self.local is not None else 0,
+            "local_bytes": self.local.bytes if self.local is not None else 0,
+        }
+
+class AsyncCache:
+    """
+    Non-blocking cache reads and writes for async endpoints.
+    Shares the local tier, counters and circuit breaker of a `Cache`, with its own redis.asyncio
+    connection pool created on first use.
+    """
+
+    def __init__(self, cache: Cache, client: Optional[redis.asyncio.Redis] = None):
+        self.cache = cache
+        self.client = client
+
+    def _get_client(self) -> redis.asyncio.Redis:
+        if self.client is None:
+            self.client = redis.asyncio.Redis(connection_pool=redis.asyncio.ConnectionPool(**redis_connection_kwargs()))
+        return self.client
+
+    async def _call(self, operation: Callable[[redis.asyncio.Redis], Any], default: Any = None) -> Any:
+        if not self.cache.available:
+            return default
+        try:
+            result = await operation(self._get_client())
+        except REDIS_CONNECTION_ERRORS as e:
+            self.cache._record_failure(e)
+            return default
+        except redis.exceptions.RedisError as e:
+            print(f"Redis command failed: {e}")
+            return default
+        self.cache.breaker.record_success()
+        return result
+
+    async def versioned_key(self, key: str, tags: tuple[str, ...] = ()) -> Optional[str]:
+        """`Cache.versioned_key` without blocking; None if a generation counter is not readable yet."""
+        names = (GLOBAL_GENERATION, *tags)
+        values = self.cache.cached_generations(names)
+        if values is None:
+            epoch = self.cache._generation_epoch
+            raw_values = await self._call(lambda client: client.mget([f"{CACHE_GENERATION_PREFIX}{name}" for name in names]))
+            if not raw_values or None in raw_values:
+                return None
+            values = [int(value) for value in raw_values]
+            self.cache.remember_generations(names, values, epoch)
+        return f"{key}@{'.'.join(map(str, values))}"
+
+    async def get_raw(self, key: str, tags: tuple[str, ...] = ()) -> Optional[bytes]:
+        cache = self.cache
+        if not cache.available:
+            return None
+        key = await self.versioned_key(key, tags)
+        if key is None:
+            return None
+        if cache.local is not None:
+            entry = cache.local.get(key)
+            if entry is not None:
+                cache.stats_counters["local_hits"] += 1
+                return entry.raw
+            epoch = cache.local.epoch
+        raw = await self._call(lambda client: client.get(key))
+        if not raw:
+            cache.stats_counters["misses"] += 1
+            return None
+        cache.stats_counters["redis_hits"] += 1
+        if cache.local is not None:
+            cache.local.set(key, raw, epoch)
+        return raw
 
 cache = Cache()
+async_cache = AsyncCache(cache)
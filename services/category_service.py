@@ -1,31 +1,33 @@
+import json
 from sqlalchemy.orm import Session
 from models import schemas, tables
 from services.cache import cache
 from services.hymn_service import invalidate_hymn_cache
+from services.suggest_index import suggest_index
 from core.exceptions import HymnNotFoundError, CategoryNotFoundError, DatabaseError
 
 CATEGORIES_CACHE_KEY = "all_categories"
+CATEGORIES_TAG = "categories"
 
 def invalidate_categories_cache():
     """Invalidates the cache for the list of all categories."""
-    cache.delete(CATEGORIES_CACHE_KEY)
+    cache.bump(CATEGORIES_TAG)
     print("Cache invalidated for all categories.")
 
+def _load_categories(db: Session) -> bytes:
+    print("Fetching categories from database.")
+    categories = db.query(tables.Category).order_by(tables.Category.name).all()
+    return json.dumps([schemas.Category.from_orm(c).dict() for c in categories]).encode()
+
 def get_categories(db: Session) -> list[schemas.Category]:
     """
     Retrieves a list of all categories from cache or database.
+    Concurrent misses run the query only once; the others get the previous list meanwhile.
     """
-    cached_categories_data = cache.get(CATEGORIES_CACHE_KEY)
-    if cached_categories_data:
-        print("Returning categories from cache.")
-        return [schemas.Category.parse_obj(c) for c in cached_categories_data]
-
-    print("Fetching categories from database.")
-    categories = db.query(tables.Category).order_by(tables.Category.name).all()
-    
-    category_schemas = [schemas.Category.from_orm(c) for c in categories]
-    cache.set(CATEGORIES_CACHE_KEY, [c.dict() for c in category_schemas], ex=3600)
-    return category_schemas
+    cached_categories_data = json.loads(cache.get_or_compute(
+        CATEGORIES_CACHE_KEY, lambda: _load_categories(db), ex=3600, tags=(CATEGORIES_TAG,),
+    ))
+    return [schemas.Category.parse_obj(c) for c in cached_categories_data]
 
 def create_category(db: Session, category: schemas.CategoryCreate) -> tables.Category:
     """
@@ -57,7 +59,8 @@ def assign_category_to_hymn(db: Session, hymn_id: int, category_id: int):
 
         hymn.category_id = category_id
         db.commit()
-        invalidate_hymn_cache(hymn_id=hymn_id)  # Invalidate specific hymn cache
+        invalidate_hymn_cache([hymn_id])  # Invalidate specific hymn cache
+        suggest_index.set_category(hymn_id, category_id)
         return {"message": "Category assigned successfully"}
     except Exception as e:
         db.rollback()
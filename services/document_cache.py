@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional
+
+# --- Configuration ---
+DOCX_CACHE_DIR = os.getenv("DOCX_CACHE_DIR", "./docx_cache")
+DOCX_CACHE_MAX_BYTES = int(float(os.getenv("DOCX_CACHE_MAX_MB", 500)) * 1024 * 1024)
+# Bump when the document layout changes, so documents built by older code are not served
+DOCX_LAYOUT_VERSION = 1
+
+def document_key(hymns: list[tuple[int, int, Optional[str]]]) -> Optional[str]:
+    """
+    Content address of a document built from `(id, hymn_number, content_hash)` rows, in the requested order.
+    Returns None if a hymn has no content hash, since its changes could not be detected.
+    """
+    if any(content_hash is None for _, _, content_hash in hymns):
+        return None
+    parts = [f"v{DOCX_LAYOUT_VERSION}"] + [f"{hymn_id}:{number}:{content_hash}" for hymn_id, number, content_hash in hymns]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+def _link_or_copy(source: str, destination: str):
+    # A hard link is instant and keeps the bytes readable even if the cached copy is evicted meanwhile
+    try:
+        if os.path.exists(destination):
+            os.remove(destination)
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+def _touch(path: str):
+    # An explicit time: implicit file timestamps come from a coarse clock and would tie
+    now = time.time()
+    os.utime(path, (now, now))
+
+class DocumentCache:
+    """
+    Generated documents on local disk, named by their content address.
+    Size is capped at `max_bytes`, evicting the least recently used documents (by modification time,
+    which is refreshed on every hit).
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.docx")
+
+    def fetch(self, key: str, destination: str) -> bool:
+        """Places the cached document of `key` at `destination`; returns False on a miss."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                _touch(path)
+                _link_or_copy(path, destination)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def store(self, key: str, source: str):
+        """
+        Keeps a copy of the document at `source` under `key`, then evicts down to the size cap.
+        Best effort: the directory may be shared by several workers, and a failed write only costs a rebuild later.
+        """
+        partial = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, partial = tempfile.mkstemp(suffix=".partial", dir=self.directory)
+            os.close(fd)
+            _link_or_copy(source, partial)
+            with self._lock:
+                os.replace(partial, self._path(key))
+                partial = None
+                _touch(self._path(key))
+                self._evict()
+        except OSError as e:
+            print(f"Could not store document {key} in the document cache: {e}")
+            if partial is not None:
+                try:
+                    os.remove(partial)
+                except OSError:
+                    pass
+
+    def _evict(self):
+        documents = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".docx"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another worker meanwhile
+                documents.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in documents)
+        for _, size, path in sorted(documents):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+document_cache = DocumentCache(DOCX_CACHE_DIR, DOCX_CACHE_MAX_BYTES)
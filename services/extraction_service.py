@@ -1,30 +1,119 @@
 import os
+import re
+import queue
 import hashlib
+import threading
+import multiprocessing
+import contextlib
 import subprocess
-from fastapi import UploadFile, Depends
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Generator, Iterator, Optional
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
-import pytesseract
-from pdfminer.high_level import extract_text
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from pdfminer.pdfpage import PDFPage
 from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 
-from database import get_db
 from services import hymn_service
 from services import hymn_parser # Import the new parser module
-from services.cache import cache
-from core.exceptions import PdfProcessingError, DatabaseError
+from services import page_text_service
+from services.ocr_worker import TESSERACT_CMD, init_ocr_worker, ocr_column
+from services import warmup_service
+from core.exceptions import PdfProcessingError, DatabaseError, UploadTooLargeError
 
 # --- Configuration ---
-TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
 POPPLER_PATH = os.getenv("POPPLER_PATH")
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", os.cpu_count() or 1))
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_MAX_MEMORY_MB = int(os.getenv("OCR_MAX_MEMORY_MB", 512))
+# Pages whose text layer has fewer characters than this are treated as scanned and OCR'd
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", 20))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", 600)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Extracted pages buffered between the extraction thread and the parser; the extraction waits when it is full
+EXTRACTION_QUEUE_PAGES = int(os.getenv("EXTRACTION_QUEUE_PAGES", 16))
+# Parsed hymns saved per database transaction during an extraction
+EXTRACTION_IMPORT_BATCH = int(os.getenv("EXTRACTION_IMPORT_BATCH", 50))
+
+# ---------------------------------------------------------------------------
+# OCR HELPERS
+# ---------------------------------------------------------------------------
+
+# The pool runs these from services.ocr_worker, which workers import without the database or the cache
+_init_ocr_worker = init_ocr_worker
+_ocr_column = ocr_column
+
+def _ocr_context():
+    # Forking a threaded server process from a worker thread can copy locks held by other threads into the
+    # children and deadlock them; forkserver starts workers from a clean process, spawn where it is missing (Windows)
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(start_method)
+
+def split_columns(image: Image.Image) -> tuple[Image.Image, Image.Image]:
+    """Splits a page image into its left and right column crops."""
+    width, height = image.size
+    mid_width = width // 2
+    return image.crop((0, 0, mid_width, height)), image.crop((mid_width, 0, width, height))
+
+def create_ocr_executor(max_workers: int = None) -> Optional[ProcessPoolExecutor]:
+    """
+    Creates the bounded process pool used for OCR, or None when a single worker is configured.
+    """
+    workers = max(1, max_workers or OCR_MAX_WORKERS)
+    if workers == 1:
+        return None
+    print(f"Starting OCR process pool with {workers} workers...")
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker, mp_context=_ocr_context())
+
+def ocr_pages(images: list[Image.Image], executor: Optional[ProcessPoolExecutor] = None) -> list[str]:
+    """
+    OCRs the left and right columns of every page, in parallel when an executor is given.
+    Returns the column texts in page/column order (page 1 left, page 1 right, page 2 left, ...).
+    """
+    columns = []
+    for image in images:
+        columns.extend(split_columns(image))
+
+    # map() yields results in submission order, which keeps the page/column order intact
+    mapper = executor.map if executor else map
+    return list(mapper(_ocr_column, columns))
+
+def page_window_size(pdf_path: str) -> int:
+    """
+    Number of pages that can be rasterized at once without exceeding OCR_MAX_MEMORY_MB.
+    Each page is held as its image, its two column crops and their copies sent to the pool.
+    """
+    info = pdfinfo_from_path(pdf_path, poppler_path=POPPLER_PATH)
+    match = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", info.get("Page size", ""))
+    width_pt, height_pt = (float(match.group(1)), float(match.group(2))) if match else (612.0, 792.0)
+    page_bytes = (width_pt / 72 * OCR_DPI) * (height_pt / 72 * OCR_DPI) * 3
+    return max(1, int(OCR_MAX_MEMORY_MB * 1024 * 1024 // (page_bytes * 3)))
+
+def ocr_window(pdf_path: str, window: list[int], executor: Optional[ProcessPoolExecutor] = None) -> list[tuple[int, str, str]]:
+    """
+    Rasterizes a run of consecutive pages and OCRs both columns of each one.
+    Returns one `(page_number, left_text, right_text)` per page; the images are freed on return.
+    """
+    images = convert_from_path(
+        pdf_path, poppler_path=POPPLER_PATH, dpi=OCR_DPI, first_page=window[0], last_page=window[-1]
+    )
+    column_texts = ocr_pages(images, executor)
+    del images
+    return [
+        (page_number, column_texts[2 * i], column_texts[2 * i + 1])
+        for i, page_number in enumerate(window)
+    ]
 
 # ---------------------------------------------------------------------------
 # PDF EXTRACTION SERVICE LOGIC
 # ---------------------------------------------------------------------------
 
-async def process_pdf_for_hymns(pdf_file: UploadFile, db: Session = Depends(get_db)):
-    # --- Dependency Verification ---
+def verify_dependencies():
+    """
+    Checks that Tesseract and Poppler are available before an extraction is accepted.
+    """
     try:
         subprocess.run([TESSERACT_CMD, "--version"], check=True, capture_output=True)
     except (subprocess.CalledProcessError, FileNotFoundError):
@@ -37,67 +126,263 @@ async def process_pdf_for_hymns(pdf_file: UploadFile, db: Session = Depends(get_
             detail=f"Poppler path is not a valid directory. Check POPPLER_PATH env variable."
         )
 
-    temp_pdf_path = f"./temp_{pdf_file.filename}"
+def _file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+async def spool_upload(chunks: AsyncIterator[bytes], destination_path: str) -> tuple[str, int]:
+    """
+    Writes an upload to `destination_path` as its chunks arrive, computing its SHA-256 on the way, so
+    memory stays constant whatever the upload size and the bytes are written only once. The destination
+    must not exist yet. Aborts with UploadTooLargeError as soon as MAX_UPLOAD_BYTES is exceeded.
+    Returns the hex digest and the size in bytes.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(destination_path, "xb") as buffer:
+        def write(chunk: bytes):
+            sha256.update(chunk)
+            buffer.write(chunk)
+
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLargeError(max_bytes=MAX_UPLOAD_BYTES)
+            await run_in_threadpool(write, chunk)
+    return sha256.hexdigest(), size
+
+def _count_pages(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+def _extract_text_layer(pdf_path: str) -> Iterator[str]:
+    """Yields the embedded text of every page, in page order, using pdfminer. Pages are laid out one at a time."""
+    for page_layout in extract_pages(pdf_path):
+        yield "".join(
+            element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+        )
+
+# ---------------------------------------------------------------------------
+# EXTRACTION PIPELINE
+# ---------------------------------------------------------------------------
+
+def _iter_text_layer(pdf_path: str, page_numbers: list[int], cached: dict) -> Iterator[tuple[int, str, list]]:
+    """
+    Yields `(page_number, text, new_entries)` for every page: from the page-text cache when it holds the
+    whole text layer, otherwise read lazily with pdfminer. Pages after a pdfminer failure get an empty
+    text, so they are OCR'd.
+    """
+    full = page_text_service.COLUMN_FULL
+    if all((page, full) in cached for page in page_numbers):
+        print("Found cached text layer.")
+        for page in page_numbers:
+            yield page, cached[(page, full)], []
+        return
+
+    print("No cached text layer found. Starting direct text extraction...")
+    texts = iter(())
     try:
-        pdf_content = await pdf_file.read()
-        pdf_hash = hashlib.sha256(pdf_content).hexdigest()
-        cache_key = f"ocr_text:{pdf_hash}"
-
-        # --- Text Extraction with Cache ---
-        text_content = cache.get(cache_key)
-        if text_content:
-            print(f"Found cached OCR text for PDF hash: {pdf_hash}")
+        texts = iter(_extract_text_layer(pdf_path))
+    except Exception as e:
+        print(f"Could not extract text directly, falling back to OCR for every page. Error: {e}")
+    for page in page_numbers:
+        try:
+            text = next(texts, None)
+        except Exception as e:
+            print(f"Could not extract text directly from page {page}, falling back to OCR for the rest. Error: {e}")
+            texts, text = iter(()), None
+        if text is None:
+            yield page, "", []
         else:
-            print("No cache found. Starting extraction process...")
-            with open(temp_pdf_path, "wb") as buffer:
-                buffer.write(pdf_content)
+            yield page, text, [(page_text_service.ENGINE_PDFMINER, full, text)]
 
+def _iter_page_texts(pdf_path: str, page_numbers: list[int], cached: dict) -> Iterator[tuple[int, str, str, list]]:
+    """
+    Yields `(page_number, engine, text, new_entries)` for every page, in page order. `new_entries` are the
+    `(engine, column, text)` entries extracted by this run, still to be saved to the page-text cache.
+    Only pages whose text layer is missing or shorter than OCR_MIN_PAGE_CHARS are OCR'd, and only if not
+    cached. They are rasterized one window at a time, as soon as the window is full or the run of scanned
+    pages ends, so the first pages are ready long before the last ones are extracted.
+    """
+    left, right = page_text_service.COLUMN_LEFT, page_text_service.COLUMN_RIGHT
+    window_size = executor = None
+    pending = []  # consecutive pages waiting for OCR, with their new text layer entries
+
+    def run_ocr():
+        try:
+            columns = ocr_window(pdf_path, [page for page, _ in pending], executor)
+        except Exception as e:
+            raise PdfProcessingError(detail=f"OCR processing failed: {e}")
+        for (page, layer_entries), (_, left_text, right_text) in zip(pending, columns):
+            yield page, page_text_service.ENGINE_OCR, "\n".join((left_text, right_text)), layer_entries + [
+                (page_text_service.ENGINE_OCR, left, left_text), (page_text_service.ENGINE_OCR, right, right_text)
+            ]
+        pending.clear()
+
+    try:
+        for page, layer_text, layer_entries in _iter_text_layer(pdf_path, page_numbers, cached):
+            if len(layer_text.strip()) >= OCR_MIN_PAGE_CHARS:
+                item = (page, page_text_service.ENGINE_PDFMINER, layer_text, layer_entries)
+            elif (page, left) in cached and (page, right) in cached:
+                item = (page, page_text_service.ENGINE_OCR, "\n".join((cached[(page, left)], cached[(page, right)])), layer_entries)
+            else:
+                if window_size is None:
+                    try:
+                        window_size = page_window_size(pdf_path)
+                    except Exception as e:
+                        raise PdfProcessingError(detail=f"OCR processing failed: {e}")
+                    print(f"Rasterizing pages that need OCR in windows of up to {window_size} pages...")
+                    executor = create_ocr_executor()
+                pending.append((page, layer_entries))
+                if len(pending) == window_size:
+                    yield from run_ocr()
+                continue
+            if pending:
+                yield from run_ocr()
+            yield item
+        if pending:
+            yield from run_ocr()
+    finally:
+        if executor:
+            executor.shutdown()
+
+_END = object()
+
+def _prefetch(items: Generator, maxsize: int) -> Iterator:
+    """
+    Runs the `items` generator in a background thread and yields its values through a queue of at most
+    `maxsize` entries, so the producer blocks whenever the consumer falls behind and memory stays bounded.
+    An exception raised by the producer is re-raised here; closing this generator stops the producer.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
             try:
-                text_content = extract_text(temp_pdf_path)
-                if not text_content.strip():
-                    print("Direct text extraction yielded empty content. Falling back to OCR.")
-                    text_content = ""
-                else:
-                    print("Text extracted directly from PDF.")
-            except Exception as e:
-                print(f"Could not extract text directly, falling back to OCR. Error: {e}")
-                text_content = ""
-
-            if not text_content.strip():
-                print("Performing two-column OCR on PDF pages...")
-                try:
-                    images = convert_from_path(temp_pdf_path, poppler_path=POPPLER_PATH, dpi=300)
-                    ocr_text_parts = []
-                    for i, image in enumerate(images):
-                        print(f"Processing page {i+1} with OCR...")
-                        width, height = image.size
-                        mid_width = width // 2
-                        
-                        left_image = image.crop((0, 0, mid_width, height))
-                        ocr_text_parts.append(pytesseract.image_to_string(left_image, lang='spa'))
-                        
-                        right_image = image.crop((mid_width, 0, width, height))
-                        ocr_text_parts.append(pytesseract.image_to_string(right_image, lang='spa'))
-
-                    text_content = "\n".join(ocr_text_parts)
-                    print("OCR processing finished. Caching result.")
-                    cache.set(cache_key, text_content, ex=3600) # Cache for 1 hour
-                except Exception as e:
-                    raise PdfProcessingError(detail=f"OCR processing failed: {e}")
-
-        if not text_content.strip():
-            raise PdfProcessingError(detail="No text could be extracted from the PDF.")
-
-        # --- Parsing and DB Insertion ---
-        hymns_data = hymn_parser.parse_hymns_from_text(text_content)
-        if hymns_data:
-            try:
-                hymn_service.create_or_update_hymns_from_parsed_data(db, hymns_data)
-            except Exception as e:
-                raise DatabaseError(detail=f"Failed to save extracted hymns to database: {e}")
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
-        return {"status": "success", "hymns_extracted": len(hymns_data)}
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            items.close()
+        put(_END)
 
+    producer = threading.Thread(target=produce, daemon=True, name="pdf-extraction")
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                if errors:
+                    raise errors[0]
+                return
+            yield item
     finally:
-        if os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
+        stop.set()
+        producer.join()
+
+def _save_page_texts(db: Session, pdf_hash: str, new_entries: list):
+    """Saves `(page_number, engine, column, text)` entries to the page-text cache, one statement per engine."""
+    for engine in (page_text_service.ENGINE_PDFMINER, page_text_service.ENGINE_OCR):
+        page_text_service.save_page_texts(db, pdf_hash, engine, [
+            (page, column, text) for page, entry_engine, column, text in new_entries if entry_engine == engine
+        ])
+
+def process_pdf_for_hymns(pdf_path: str, db: Session, progress: Optional[Callable[..., None]] = None,
+                          pdf_hash: Optional[str] = None) -> dict:
+    """
+    Extracts, parses and stores the hymns of a PDF file already saved on disk.
+    This is blocking work and is meant to run in a background job, not on the event loop.
+
+    Pages are extracted in a background thread and handed to the parser through a queue of at most
+    EXTRACTION_QUEUE_PAGES pages as soon as they are ready; finished hymns are saved in transactions of
+    EXTRACTION_IMPORT_BATCH hymns, so they become visible while later pages are still being OCR'd.
+    `progress` is called with `pages_total`, `pages_done` and `hymns_parsed` as they become known.
+    `pdf_hash` is the SHA-256 computed while spooling the upload; it is recomputed when omitted.
+    """
+    report = progress or (lambda **counters: None)
+
+    pdf_hash = pdf_hash or _file_sha256(pdf_path)
+    try:
+        pages_total = _count_pages(pdf_path)
+    except Exception as e:
+        raise PdfProcessingError(detail=f"Could not read the PDF file: {e}")
+    report(pages_total=pages_total)
+    page_numbers = list(range(1, pages_total + 1))
+    cached = page_text_service.get_page_texts(db, pdf_hash)
+
+    page_stats = []
+    unsaved_entries = []
+    has_text = False
+    hymns_parsed = 0
+    import_counts = {"added": 0, "changed": 0, "unchanged": 0}
+
+    def page_texts(pages):
+        nonlocal has_text
+        for page, engine, text, new_entries in pages:
+            unsaved_entries.extend((page, entry_engine, column, column_text) for entry_engine, column, column_text in new_entries)
+            chars = len(text.strip())
+            page_stats.append({"page": page, "engine": engine, "chars": chars})
+            has_text = has_text or chars > 0
+            # OCR'd pages are saved right away; cheap text layer pages every EXTRACTION_QUEUE_PAGES pages
+            ocr_done = any(entry[1] == page_text_service.ENGINE_OCR for entry in unsaved_entries)
+            if ocr_done or len(page_stats) % EXTRACTION_QUEUE_PAGES == 0 or len(page_stats) == pages_total:
+                _save_page_texts(db, pdf_hash, unsaved_entries)
+                unsaved_entries.clear()
+                report(pages_done=len(page_stats), hymns_parsed=hymns_parsed)
+            yield text
+
+    def import_hymns(hymns_data: list):
+        try:
+            counts = hymn_service.create_or_update_hymns_from_parsed_data(db, hymns_data, warm_cache=False)
+        except Exception as e:
+            raise DatabaseError(detail=f"Failed to save extracted hymns to database: {e}")
+        for name, count in counts.items():
+            import_counts[name] += count
+
+    batch = []
+    with contextlib.closing(_prefetch(_iter_page_texts(pdf_path, page_numbers, cached), EXTRACTION_QUEUE_PAGES)) as pages:
+        for hymn in hymn_parser.iter_hymns(hymn_parser.iter_page_lines(page_texts(pages))):
+            batch.append(hymn)
+            hymns_parsed += 1
+            if len(batch) == EXTRACTION_IMPORT_BATCH:
+                import_hymns(batch)
+                batch = []
+                report(hymns_parsed=hymns_parsed)
+    print("Text extraction finished.")
+
+    if not has_text:
+        raise PdfProcessingError(detail="No text could be extracted from the PDF.")
+    if batch:
+        import_hymns(batch)
+    report(hymns_parsed=hymns_parsed)
+    if import_counts["added"] or import_counts["changed"]:
+        warmup_service.start_warmup()
+    print(f"Hymn import finished: {hymns_parsed} hymns parsed, {import_counts['added']} added, "
+          f"{import_counts['changed']} changed, {import_counts['unchanged']} unchanged.")
+
+    engines = [page["engine"] for page in page_stats]
+    return {
+        "status": "success",
+        "hymns_extracted": hymns_parsed,
+        "hymns_imported": import_counts,
+        "pages_by_engine": {
+            page_text_service.ENGINE_PDFMINER: engines.count(page_text_service.ENGINE_PDFMINER),
+            page_text_service.ENGINE_OCR: engines.count(page_text_service.ENGINE_OCR),
+        },
+        "pages": page_stats,
+    }
@@ -1,55 +1,195 @@
-import sys
 import os
-from sqlalchemy.orm import Session
+import asyncio
+import tempfile
+import threading
+from typing import Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Query, Session, selectinload
 from docx import Document
-from docx.shared import Inches
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
 
-from models.tables import Hymn, HymnContent, ContentLine
-from core.exceptions import HimnarioGeneratorException, DatabaseError, HymnNotFoundError
+from models import schemas
+from models.tables import Hymn, HymnContent
+from services.cache import cache
+from services.document_cache import DOCX_LAYOUT_VERSION, document_cache, document_key
+from core.exceptions import HimnarioGeneratorException, HymnNotFoundError
 
-# Add the parent directory of the modules to the Python path
-# sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+# --- Configuration ---
+DOCX_MAX_CONCURRENT_JOBS = int(os.getenv("DOCX_MAX_CONCURRENT_JOBS", 2))
+DOCX_OUTPUT_DIR = os.getenv("DOCX_OUTPUT_DIR", tempfile.gettempdir())
 
-# Assuming HymnDocumentGenerator is now part of the backend or can be adapted
-# from modules.generator_hymnary.hymn_document_generator import HymnDocumentGenerator
+# python-docx is CPU-bound: a small pool keeps documents off the event loop and bounds how many are built at once
+_executor = ThreadPoolExecutor(max_workers=DOCX_MAX_CONCURRENT_JOBS, thread_name_prefix="docx-generator")
+# Hymns loaded at a time, each batch with its content and lines in two more queries
+HYMN_BATCH_SIZE = 100
+# Rendered hymns are stored under their content hash, so an edited hymn is simply rendered under a new key
+FRAGMENT_CACHE_PREFIX = "docx_fragment"
+FRAGMENT_TTL = 7 * 24 * 3600
 
-async def generate_hymnary_docx(db: Session, hymn_ids: list[int], file_name: str) -> str:
+_scratch = threading.local()
+
+def _filter_selection(query: Query, selection: schemas.HymnSelection) -> Query:
+    """Applies a hymn number range or category selection, in hymn number order."""
+    if selection.hymn_number_from is not None:
+        query = query.filter(Hymn.hymn_number >= selection.hymn_number_from)
+    if selection.hymn_number_to is not None:
+        query = query.filter(Hymn.hymn_number <= selection.hymn_number_to)
+    if selection.category_id is not None:
+        query = query.filter(Hymn.category_id == selection.category_id)
+    return query.order_by(Hymn.hymn_number)
+
+def _hymn_versions(db: Session, selection: schemas.HymnSelection) -> list[tuple]:
+    """`(id, hymn_number, content_hash)` of every hymn of the document, in document order."""
+    columns = db.query(Hymn.id, Hymn.hymn_number, Hymn.content_hash)
+    if selection.hymn_ids is None:
+        return [tuple(row) for row in _filter_selection(columns, selection)]
+    # Explicit lists keep the requested order and repeats; unknown ids are skipped
+    versions = {row.id: tuple(row) for row in columns.filter(Hymn.id.in_(selection.hymn_ids))}
+    return [versions[hymn_id] for hymn_id in selection.hymn_ids if hymn_id in versions]
+
+def iter_hymns_with_content(db: Session, hymn_ids: list[int]) -> Iterator[Hymn]:
+    """
+    Yields the given hymns with their content and lines, loaded in batches of HYMN_BATCH_SIZE hymns
+    (three queries per batch), so only one batch is held at a time.
+    """
+    loader = selectinload(Hymn.content).selectinload(HymnContent.lines)
+    for start in range(0, len(hymn_ids), HYMN_BATCH_SIZE):
+        yield from db.query(Hymn).options(loader).filter(Hymn.id.in_(hymn_ids[start:start + HYMN_BATCH_SIZE]))
+
+def add_hymn(document: Document, hymn: Hymn):
+    """Appends a hymn to a python-docx document: heading, stanza and chorus labels, lines and a page break."""
+    document.add_heading(f'{hymn.hymn_number}. {hymn.title}', level=2)
+
+    for content_item in sorted(hymn.content, key=lambda x: x.content_order):
+        if content_item.content_type == 'estrofa':
+            document.add_paragraph(f'Estrofa {content_item.stanza_number}')
+        elif content_item.content_type == 'coro':
+            document.add_paragraph('Coro')
+
+        for line in sorted(content_item.lines, key=lambda x: x.line_order):
+            document.add_paragraph(line.line_text)
+
+    document.add_page_break()
+
+def render_hymn_fragment(hymn: Hymn) -> bytes:
+    """The WordprocessingML paragraphs `add_hymn` produces for a hymn, serialized as XML."""
+    # A per-thread scratch document, emptied after every hymn, avoids loading the template each time
+    document = getattr(_scratch, "document", None)
+    if document is None:
+        document = _scratch.document = Document()
+    body = document.element.body
+    add_hymn(document, hymn)
+    paragraphs = [child for child in body if child.tag != qn("w:sectPr")]
+    for paragraph in paragraphs:
+        body.remove(paragraph)
+        etree.cleanup_namespaces(paragraph)
+    return b"".join(etree.tostring(paragraph) for paragraph in paragraphs)
+
+def _fragment_key(hymn_number: int, content_hash: str) -> str:
+    return f"{FRAGMENT_CACHE_PREFIX}:{DOCX_LAYOUT_VERSION}:{hymn_number}:{content_hash}"
+
+def _hymn_fragments(db: Session, versions: list[tuple]) -> dict[int, bytes]:
+    """
+    Rendered fragment of every hymn in `versions`: cached ones are read with one MGET, the rest are
+    loaded in batches, rendered and written back in one pipeline.
+    """
+    hymns = {hymn_id: (number, content_hash) for hymn_id, number, content_hash in versions}
+    # Hymns without a content hash (imported before fingerprints existed) are always rendered
+    cacheable = [hymn_id for hymn_id, (_, content_hash) in hymns.items() if content_hash is not None]
+    keys = cache.versioned_keys([(_fragment_key(*hymns[hymn_id]), ()) for hymn_id in cacheable]) if cacheable and cache.available else None
+    fragments = {}
+    if keys is not None:
+        fragments = {hymn_id: fragment for hymn_id, fragment in zip(cacheable, cache.get_many(keys)) if fragment is not None}
+
+    missing = [hymn_id for hymn_id in hymns if hymn_id not in fragments]
+    rendered = {}
+    for hymn in iter_hymns_with_content(db, missing):
+        rendered[hymn.id] = render_hymn_fragment(hymn)
+        # A hymn edited since its version was read is not stored under the older hash
+        if hymn.content_hash is not None and (hymn.hymn_number, hymn.content_hash) != hymns[hymn.id]:
+            del hymns[hymn.id]
+    if keys is not None:
+        key_of = dict(zip(cacheable, keys))
+        cache.set_many([(key_of[hymn_id], fragment) for hymn_id, fragment in rendered.items() if hymn_id in hymns and hymn_id in key_of],
+                       ex=FRAGMENT_TTL)
+    fragments.update(rendered)
+    return fragments
+
+def build_hymnary_docx(db: Session, selection: schemas.HymnSelection, output_path: str, versions: Optional[list[tuple]] = None):
+    """
+    Builds the hymnary document of the selected hymns and saves it to `output_path`.
+    The document is assembled from the pre-rendered fragment of each hymn, so only hymns that are new
+    or changed since they were last rendered are loaded and go through python-docx.
+    """
+    if versions is None:
+        versions = _hymn_versions(db, selection)
+    if not versions:
+        # Usar -1 como id inválido para indicar que no se encontró ningún himno
+        raise HymnNotFoundError(hymn_id=-1)
+    fragments = _hymn_fragments(db, versions)
+
+    document = Document()
+    document.add_heading('Himnario Generado', level=1)
+    # Parse every fragment at once and move the paragraphs in front of the section properties
+    hymns = parse_xml(b"<w:body %s>%s</w:body>" % (
+        nsdecls("w").encode(), b"".join(fragments[hymn_id] for hymn_id, _, _ in versions if hymn_id in fragments),
+    ))
+    section_properties = document.element.body.sectPr
+    for paragraph in list(hymns):
+        section_properties.addprevious(paragraph)
+    document.save(output_path)
+
+def write_hymnary_docx(db: Session, selection: schemas.HymnSelection, output_path: str) -> bool:
+    """
+    Writes the hymnary document to `output_path`, from the document cache when the same hymns were
+    requested before and none of them changed since; otherwise builds and caches it.
+    Returns True on a cache hit.
+    """
+    versions = _hymn_versions(db, selection)
+    if not versions:
+        raise HymnNotFoundError(hymn_id=-1)
+    key = document_key(versions) if document_cache.enabled else None
+    if key is not None and document_cache.fetch(key, output_path):
+        return True
+
+    build_hymnary_docx(db, selection, output_path, versions)
+    if key is not None:
+        document_cache.store(key, output_path)
+    return False
+
+async def generate_hymnary_docx(db: Session, selection: schemas.HymnSelection) -> str:
+    """
+    Generates the hymnary document in the generator pool, without blocking the event loop;
+    unchanged documents are served from the document cache.
+    Returns the path of a new temporary file owned by the caller, who must delete it once sent.
+    """
+    os.makedirs(DOCX_OUTPUT_DIR, exist_ok=True)
+    fd, output_path = tempfile.mkstemp(prefix="himnario-", suffix=".docx", dir=DOCX_OUTPUT_DIR)
+    os.close(fd)
+    future = _executor.submit(write_hymnary_docx, db, selection, output_path)
     try:
-        # Fetch hymns from the database
-        hymns = db.query(Hymn).filter(Hymn.id.in_(hymn_ids)).all()
-        if not hymns:
-            # Usar -1 como id inválido para indicar que no se encontró ningún himno
-            raise HymnNotFoundError(hymn_id=-1)
-
-        document = Document()
-        document.add_heading('Himnario Generado', level=1)
-
-        for hymn in hymns:
-            document.add_heading(f'{hymn.hymn_number}. {hymn.title}', level=2)
-            
-            # Assuming content and lines are loaded via joinedload in hymn_service.get_hymn
-            # If not, you might need to load them here or adjust the query.
-            for content_item in sorted(hymn.content, key=lambda x: x.content_order):
-                if content_item.content_type == 'estrofa':
-                    document.add_paragraph(f'Estrofa {content_item.stanza_number}')
-                elif content_item.content_type == 'coro':
-                    document.add_paragraph('Coro')
-                
-                for line in sorted(content_item.lines, key=lambda x: x.line_order):
-                    document.add_paragraph(line.line_text)
-
-            document.add_page_break()
-
-        # Ensure output directory exists
-        output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'modules', 'generator_hymnary', 'output')
-        os.makedirs(output_dir, exist_ok=True)
-
-        output_filepath = os.path.join(output_dir, file_name)
-        document.save(output_filepath)
-
-        return output_filepath
-
-    except HymnNotFoundError:
-        raise # Re-raise specific error
-    except Exception as e:
+        await asyncio.wrap_future(future)
+        return output_path
+    except BaseException as e:
+        # Also on cancellation (the client disconnected): the thread may still be using the request's
+        # session, which is closed once this returns, and writing the file
+        await _wait_for_thread(future)
+        os.remove(output_path)
+        if isinstance(e, HymnNotFoundError) or not isinstance(e, Exception):
+            raise # Re-raise specific error, or the cancellation
         raise HimnarioGeneratorException(detail=f"Failed to generate DOCX document: {e}")
+
+async def _wait_for_thread(future):
+    """Waits for work submitted to the generator pool to finish (or be cancelled), even if cancelled again meanwhile."""
+    waiter = asyncio.wrap_future(future)
+    while not waiter.done():
+        try:
+            await asyncio.wait([waiter])
+        except asyncio.CancelledError:
+            pass
+
+def shutdown():
+    """Lets the documents being built finish and refuses new ones."""
+    _executor.shutdown(wait=False, cancel_futures=True)
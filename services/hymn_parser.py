@@ -1,108 +1,118 @@
 import re
+from typing import Iterable, Iterator, NamedTuple, Optional
 
-def _process_hymn_content(lines, hymn_number):
-    if not lines:
-        return []
+HYMN_TITLE_REGEX = re.compile(r'^\s*(\d+)\.\s+([A-ZÁÉÍÓÚÑ\s-]{5,})', re.IGNORECASE)
+STANZA_NUMBER_REGEX = re.compile(r'^(\d+)\s*$')
 
-    has_explicit_stanza_nums = False
-    if hymn_number != 176:
-        for line in lines:
-            if re.match(r'^\s*\d+\s*$', line.strip()):
-                has_explicit_stanza_nums = True
-                break
+class HymnLayout(NamedTuple):
+    """How the stanzas of a hymn are laid out in the book."""
+    # Matches a line that starts a stanza; group 1 is the stanza number, an optional group 2 its first line
+    stanza_regex: re.Pattern = STANZA_NUMBER_REGEX
+    # Once a stanza number is seen, blank lines no longer separate stanzas
+    numbers_replace_blank_lines: bool = True
+    # Lines that look like a hymn title belong to this hymn instead of starting the next one
+    absorbs_titles: bool = False
 
-    content = []
-    current_stanza_lines = []
-    current_type = 'estrofa'
-    current_stanza_num = 1
+DEFAULT_LAYOUT = HymnLayout()
 
-    def save_current_stanza():
-        nonlocal current_stanza_num
-        if not current_stanza_lines:
-            return
-        
-        block = {"tipo": current_type}
-        if current_type == 'estrofa':
-            block["estrofa_num"] = current_stanza_num
-            block["texto"] = current_stanza_lines
-            current_stanza_num += 1
-        else:
-            block["texto"] = current_stanza_lines
-        
-        content.append(block)
-
-    for line in lines:
-        stripped_line = line.strip()
-        
-        if not stripped_line:
-            if not has_explicit_stanza_nums and current_stanza_lines:
-                save_current_stanza()
-                current_stanza_lines = []
-                current_type = 'estrofa'
-            continue
+# Hymns whose layout differs from the rest of the book, by hymn number
+HYMN_LAYOUTS = {
+    # Stanzas are numbered "1. First line", which also looks like a hymn title
+    176: HymnLayout(stanza_regex=re.compile(r'^(\d+)\.\s*(.*)'), numbers_replace_blank_lines=False, absorbs_titles=True),
+}
 
-        stanza_match = None
-        if hymn_number == 176:
-            stanza_match = re.match(r'^(\d+)\.\s*(.*)', stripped_line)
-        elif has_explicit_stanza_nums:
-            stanza_match = re.match(r'^(\d+)\s*$', stripped_line)
+# How each block of a hymn started
+_START, _BLANK, _NUMBER, _CHORUS = range(4)
 
-        if stanza_match:
-            if current_stanza_lines:
-                save_current_stanza()
-            
-            current_stanza_lines = []
-            current_type = 'estrofa'
-            current_stanza_num = int(stanza_match.group(1))
-            
-            if hymn_number == 176 and stanza_match.group(2):
-                current_stanza_lines.append(stanza_match.group(2).strip())
+class _HymnBuilder:
+    """Splits the lines of one hymn into stanzas and choruses as they arrive."""
+    __slots__ = ("hymn", "layout", "match_stanza", "blocks", "lines", "numbered")
 
-        elif stripped_line.upper().startswith('CORO'):
-            if current_stanza_lines:
-                save_current_stanza()
-            current_stanza_lines = []
-            current_type = 'coro'
-        else:
-            current_stanza_lines.append(stripped_line)
+    def __init__(self, number: int, title: str, layout: HymnLayout):
+        self.hymn = {'numero': number, 'titulo': title}
+        self.layout = layout
+        self.match_stanza = layout.stanza_regex.match
+        # [how it started, "estrofa" or "coro", stanza number it sets, lines]
+        self.blocks = [[_START, 'estrofa', None, []]]
+        self.lines = self.blocks[0][3]
+        self.numbered = False
 
-    if current_stanza_lines:
-        save_current_stanza()
+    def _open(self, start: int, block_type: str, stanza_number: Optional[int] = None):
+        self.lines = []
+        self.blocks.append([start, block_type, stanza_number, self.lines])
 
-    return content
+    def add(self, line: str):
+        """Adds a stripped, lowercased line."""
+        if not line:
+            # Closes the stanza for now; dropped in `finish` if stanza numbers turn up later
+            if self.lines:
+                self._open(_BLANK, 'estrofa')
+            return
 
-def parse_hymns_from_text(all_text: str):
-    print("Parsing extracted text to find hymns...")
-    all_lines = all_text.split('\n')
-    hymns = []
-    current_hymn_info = None
-    current_hymn_lines = []
-    
-    hymn_title_regex = re.compile(r'^\s*(\d+)\.\s+([A-ZÁÉÍÓÚÑ\s-]{5,})', re.IGNORECASE)
+        stanza_match = self.match_stanza(line)
+        if stanza_match:
+            self.numbered = True
+            self._open(_NUMBER, 'estrofa', int(stanza_match.group(1)))
+            first_line = stanza_match.group(2) if stanza_match.re.groups >= 2 else None
+            if first_line:
+                self.lines.append(first_line.strip())
+        elif line.startswith('coro'):  # lines arrive lowercased
+            self._open(_CHORUS, 'coro')
+        else:
+            self.lines.append(line)
 
-    for line in all_lines:
-        match = hymn_title_regex.search(line)
-        
-        if match:
-            if current_hymn_info and current_hymn_info['numero'] == 176:
-                current_hymn_lines.append(line.lower())
+    def finish(self) -> dict:
+        """Numbers the stanzas and returns the hymn in the format `parse_hymns_from_text` produces."""
+        merge_blank_breaks = self.numbered and self.layout.numbers_replace_blank_lines
+        content = []
+        stanza_number = 1
+        previous_lines = None
+        for start, block_type, number, lines in self.blocks:
+            if start == _BLANK and merge_blank_breaks:
+                previous_lines.extend(lines)
+                continue
+            previous_lines = lines
+            if number is not None:
+                stanza_number = number
+            if not lines:
                 continue
+            if block_type == 'estrofa':
+                content.append({"tipo": block_type, "estrofa_num": stanza_number, "texto": lines})
+                stanza_number += 1
+            else:
+                content.append({"tipo": block_type, "texto": lines})
+        self.hymn['contenido'] = content
+        return self.hymn
 
-            if current_hymn_info:
-                current_hymn_info['contenido'] = _process_hymn_content(current_hymn_lines, current_hymn_info['numero'])
-                hymns.append(current_hymn_info)
+def iter_page_lines(pages: Iterable[str]) -> Iterator[str]:
+    """The lines of consecutive page texts, as if they were joined with newlines."""
+    for page in pages:
+        yield from page.split('\n')
 
-            hymn_number = int(match.group(1))
-            hymn_title = match.group(2).strip().lower()
-            current_hymn_info = {'numero': hymn_number, 'titulo': hymn_title}
-            current_hymn_lines = []
-        
-        elif current_hymn_info:
-            current_hymn_lines.append(line.lower())
+def iter_hymns(lines: Iterable[str], layouts: dict[int, HymnLayout] = HYMN_LAYOUTS) -> Iterator[dict]:
+    """
+    Parses OCR text line by line in a single pass, yielding each hymn as soon as the next one starts.
+    Text before the first hymn title is ignored.
+    """
+    builder = add = None
+    match_title = HYMN_TITLE_REGEX.match
+    for line in lines:
+        stripped = line.strip()
+        # Only lines starting with a digit can be titles; skip the regex for the rest
+        title_match = match_title(line) if stripped[:1].isdigit() else None
+        if title_match and not (builder and builder.layout.absorbs_titles):
+            if builder:
+                yield builder.finish()
+            number = int(title_match.group(1))
+            builder = _HymnBuilder(number, title_match.group(2).strip().lower(), layouts.get(number, DEFAULT_LAYOUT))
+            add = builder.add
+        elif add:
+            add(stripped.lower())
+    if builder:
+        yield builder.finish()
 
-    if current_hymn_info:
-        current_hymn_info['contenido'] = _process_hymn_content(current_hymn_lines, current_hymn_info['numero'])
-        hymns.append(current_hymn_info)
-    
+def parse_hymns_from_text(all_text: str):
+    print("Parsing extracted text to find hymns...")
+    hymns = list(iter_hymns(all_text.split('\n')))
     print(f"Parsing finished. Found {len(hymns)} hymns.")
     return hymns
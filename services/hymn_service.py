@@ -1,48 +1,148 @@
-from sqlalchemy.orm import Session, joinedload
+import json
+import hashlib
+import threading
+from sqlalchemy import delete, insert, select
+from typing import Iterable, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
 from models import schemas, tables
-from services.cache import cache
+from database import dialect_insert
+from fastapi.concurrency import run_in_threadpool
+from services.cache import cache, async_cache
+from services.suggest_index import suggest_index
 from core.exceptions import HymnNotFoundError, DatabaseError
 
 HYMNS_CACHE_KEY = "all_hymns"
+SUGGEST_INDEX_KEY = "suggest_index"
 HYMN_DETAIL_CACHE_KEY_PREFIX = "hymn_detail_"
+# Cache tags: every listing page is tagged with HYMNS_TAG, each hymn detail with its hymn_tag
+HYMNS_TAG = "hymns"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 100
 
-def invalidate_hymn_cache(hymn_id: int = None):
+_suggest_rebuild_lock = threading.Lock()
+
+def hymn_tag(hymn_id: int) -> str:
+    return f"hymn:{hymn_id}"
+
+def invalidate_hymn_cache(hymn_ids: Iterable[int] = (), added_ids: Iterable[int] = ()):
     """
     Invalidate hymn-related caches.
-    If hymn_id is provided, invalidates the cache for that specific hymn.
-    Always invalidates the cache for the list of all hymns.
+    Always invalidates the cached pages of the hymn listing, and the details of the given hymns;
+    each is one generation bump, all sent in a single round trip. The given and the newly `added_ids`
+    hymns are logged first, so the suggest index of every worker reloads just those.
     """
-    cache.delete(HYMNS_CACHE_KEY)
-    if hymn_id:
-        cache.delete(f"{HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn_id}")
-    print(f"Cache invalidated for all hymns and hymn_id: {hymn_id}")
+    hymn_ids = list(hymn_ids)
+    cache.log_change(SUGGEST_INDEX_KEY, [*hymn_ids, *added_ids])
+    cache.bump(HYMNS_TAG, *(hymn_tag(hymn_id) for hymn_id in hymn_ids))
+    print(f"Cache invalidated for all hymns and hymn_ids: {hymn_ids}")
 
-def get_hymns(db: Session):
+def suggest_index_version() -> Optional[tuple[str, ...]]:
     """
-    Retrieves a list of all hymns from cache or database.
+    Version of the data behind the suggest index, shared by every worker: the generation of the whole
+    cache (reset with the database) and of HYMNS_TAG (any change to hymns or their categories).
+    None if Redis cannot be reached.
     """
-    cached_hymns_data = cache.get(HYMNS_CACHE_KEY)
-    if cached_hymns_data:
-        print("Returning hymns from cache.")
-        return [schemas.Hymn.parse_obj(h) for h in cached_hymns_data]
+    keys = cache.versioned_keys([(SUGGEST_INDEX_KEY, ()), (SUGGEST_INDEX_KEY, (HYMNS_TAG,))])
+    return tuple(keys) if keys is not None else None
+
+def rebuild_suggest_index(db: Session):
+    """Builds this worker's suggest index from the database, recording the version and change log position it reflects."""
+    # Read before the hymns: whatever changes meanwhile is in the change log and reloaded by the next sync
+    position = cache.change_log_position(SUGGEST_INDEX_KEY)
+    version = suggest_index_version() if position is not None else None
+    suggest_index.rebuild(db, version, position)
+
+def _rebuild_suggest_index_in_background(db: Session):
+    if not _suggest_rebuild_lock.acquire(blocking=False):
+        return  # Already rebuilding
+
+    def rebuild():
+        session = Session(bind=db.get_bind())
+        try:
+            rebuild_suggest_index(session)
+        except Exception as e:
+            print(f"Rebuilding the suggest index failed: {e}")
+        finally:
+            session.close()
+            _suggest_rebuild_lock.release()
+    threading.Thread(target=rebuild, daemon=True).start()
+
+def sync_suggest_index(db: Session) -> bool:
+    """
+    Catches this worker's suggest index up with the hymns changed by any worker, reloading only the hymns in
+    the change log. After a database reset, or if the log no longer reaches back far enough, the index is
+    rebuilt in the background while the current one keeps answering. Returns False if Redis cannot be reached.
+    """
+    version = suggest_index_version()
+    if version is None:
+        return False
+    if version == suggest_index.version or _suggest_rebuild_lock.locked():
+        return True
+    changes = None
+    if suggest_index.version is not None and suggest_index.version[0] == version[0]:
+        changes = cache.read_changes(SUGGEST_INDEX_KEY, suggest_index.position)
+        if changes is None:
+            return False
+    if changes is None or changes[1] is None:
+        if len(suggest_index):
+            _rebuild_suggest_index_in_background(db)
+        else:
+            rebuild_suggest_index(db)  # Nothing to answer with meanwhile
+        return True
+    position, hymn_ids = changes
+    suggest_index.apply_changes(db, [int(hymn_id) for hymn_id in hymn_ids], version, position)
+    return True
+
+def suggest_hymns(db: Session, query: str, limit: int = 10, category_id: Optional[int] = None) -> list[schemas.HymnSuggestion]:
+    """Typeahead suggestions from this worker's in-memory index, caught up first if any worker changed the hymns."""
+    sync_suggest_index(db)
+    return suggest_index.suggest(query, limit=limit, category_id=category_id)
+
+def _hymns_page_cache_key(after: Optional[int], limit: int, include_content: bool) -> str:
+    return f"{HYMNS_CACHE_KEY}:{after or 0}:{limit}:{int(include_content)}"
+
+def _load_hymns_page(db: Session, after: Optional[int], limit: int, include_content: bool) -> bytes:
+    """Queries one page of hymns, serialized as the JSON response body."""
+    print("Fetching hymns page from database.")
+    if include_content:
+        item_schema = schemas.Hymn
+        query = db.query(tables.Hymn).options(
+            selectinload(tables.Hymn.content).selectinload(tables.HymnContent.lines)
+        )
+    else:
+        item_schema = schemas.HymnSummary
+        query = db.query(tables.Hymn.id, tables.Hymn.hymn_number, tables.Hymn.title, tables.Hymn.category_id)
 
-    print("Fetching hymns from database.")
-    hymns = db.query(tables.Hymn).order_by(tables.Hymn.hymn_number).all()
-    
-    hymn_schemas = [schemas.Hymn.from_orm(h) for h in hymns]
-    cache.set(HYMNS_CACHE_KEY, [h.dict() for h in hymn_schemas], ex=3600)
-    return hymn_schemas
+    if after is not None:
+        query = query.filter(tables.Hymn.hymn_number > after)
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(tables.Hymn.hymn_number).limit(limit + 1).all()
 
-def get_hymn(db: Session, hymn_id: int):
+    page = schemas.HymnPage(
+        items=[item_schema.from_orm(row) for row in rows[:limit]],
+        next_cursor=rows[limit - 1].hymn_number if len(rows) > limit else None,
+    )
+    return page.json().encode()
+
+def get_hymns_json(db: Session, after: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE,
+                   include_content: bool = False) -> bytes:
     """
-    Retrieves a specific hymn by its ID, including its full content.
+    Retrieves one page of hymns ordered by hymn number as the final JSON response body, from cache or database.
+    Uses keyset pagination: `after` is the last hymn number of the previous page.
+    By default only the summary columns are queried; `include_content` eager-loads
+    stanzas and lines in two extra batched queries.
+    Cache hits are returned exactly as stored, and concurrent misses run the query only once.
     """
-    cache_key = f"{HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn_id}"
-    cached_hymn_data = cache.get(cache_key)
-    if cached_hymn_data:
-        print(f"Returning hymn {hymn_id} from cache.")
-        return schemas.Hymn.parse_obj(cached_hymn_data)
+    return cache.get_or_compute(
+        _hymns_page_cache_key(after, limit, include_content),
+        lambda: _load_hymns_page(db, after, limit, include_content),
+        ex=3600,
+        tags=(HYMNS_TAG,),
+    )
 
+def _load_hymn(db: Session, hymn_id: int) -> bytes:
+    """Queries a hymn with its content, serialized as the JSON response body."""
     print(f"Fetching hymn {hymn_id} from database.")
     hymn = (
         db.query(tables.Hymn)
@@ -53,57 +153,174 @@ def get_hymn(db: Session, hymn_id: int):
 
     if not hymn:
         raise HymnNotFoundError(hymn_id=hymn_id)
+    return schemas.Hymn.from_orm(hymn).json().encode()
 
-    hymn_schema = schemas.Hymn.from_orm(hymn)
-    cache.set(cache_key, hymn_schema.dict(), ex=3600)
-    return hymn_schema
-        
+def get_hymn_json(db: Session, hymn_id: int) -> bytes:
+    """
+    Retrieves a specific hymn by its ID, including its full content, as the final JSON response body.
+    Cache hits are returned as stored.
+    """
+    return cache.get_or_compute(
+        f"{HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn_id}", lambda: _load_hymn(db, hymn_id), ex=3600, tags=(hymn_tag(hymn_id),),
+    )
 
-def create_or_update_hymns_from_parsed_data(db: Session, hymns_data: list):
+async def get_hymn_json_async(db: Session, hymn_id: int) -> bytes:
     """
-    Creates or updates hymns in the database from parsed data.
-    This is more robust than the previous DELETE then INSERT logic.
+    `get_hymn_json` for async endpoints: cache hits are read without blocking the event loop
+    and misses are rebuilt in the thread pool.
+    """
+    cached_body = await async_cache.get_raw(f"{HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn_id}", tags=(hymn_tag(hymn_id),))
+    if cached_body:
+        return cached_body
+    return await run_in_threadpool(get_hymn_json, db, hymn_id)
+
+def _load_hymns(db: Session, hymn_ids: list[int]) -> dict[int, bytes]:
+    """Queries several hymns with their content in one query, each serialized as its JSON response body."""
+    print(f"Fetching hymns {hymn_ids} from database.")
+    hymns = (
+        db.query(tables.Hymn)
+        .options(joinedload(tables.Hymn.content).joinedload(tables.HymnContent.lines))
+        .filter(tables.Hymn.id.in_(hymn_ids))
+        .all()
+    )
+    return {hymn.id: schemas.Hymn.from_orm(hymn).json().encode() for hymn in hymns}
+
+def get_hymns_batch_json(db: Session, hymn_ids: list[int]) -> bytes:
+    """
+    Retrieves several hymns by ID, in the requested order, as a JSON array of the bodies `get_hymn_json` returns.
+    Cached hymns are read with one MGET; the misses are loaded with one query and written back in one pipeline.
+    Raises HymnNotFoundError for the first ID that does not exist.
+    """
+    unique_ids = list(dict.fromkeys(hymn_ids))
+    # Keys are versioned before querying, so hymns changed meanwhile are never stored as current
+    keys = cache.versioned_keys([(f"{HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn_id}", (hymn_tag(hymn_id),)) for hymn_id in unique_ids]) if cache.available else None
+    bodies = dict(zip(unique_ids, cache.get_many(keys))) if keys is not None else {}
+
+    missing = [hymn_id for hymn_id in unique_ids if bodies.get(hymn_id) is None]
+    if missing:
+        loaded = _load_hymns(db, missing)
+        bodies.update(loaded)
+        if keys is not None and loaded:
+            cache.set_many([(key, loaded[hymn_id]) for hymn_id, key in zip(unique_ids, keys) if hymn_id in loaded], ex=3600)
+        for hymn_id in missing:
+            if hymn_id not in loaded:
+                raise HymnNotFoundError(hymn_id=hymn_id)
+
+    return b"[" + b",".join(bodies[hymn_id] for hymn_id in hymn_ids) + b"]"
+
+def compute_content_hash(hymn_data: dict) -> str:
+    """
+    Returns a stable SHA-256 fingerprint of a parsed hymn's title and content.
+    """
+    canonical = json.dumps(
+        {"titulo": hymn_data['titulo'], "contenido": hymn_data['contenido']},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def create_or_update_hymns_from_parsed_data(db: Session, hymns_data: list, warm_cache: bool = True) -> dict:
+    """
+    Creates or updates hymns in the database from parsed data using set-based statements:
+    one query for the existing hymn numbers and fingerprints, one INSERT ... ON CONFLICT for the
+    hymns and batched executemany INSERTs for their content and lines.
+    Hymns whose content fingerprint did not change are neither rewritten nor invalidated.
+    Callers importing in several batches pass `warm_cache=False` and warm the cache once at the end.
+    Returns the number of hymns added, changed and unchanged.
     """
     try:
-        for hymn_data in hymns_data:
-            db_hymn = db.query(tables.Hymn).filter_by(hymn_number=hymn_data['numero']).first()
-
-            if db_hymn:
-                # Update existing hymn
-                db_hymn.title = hymn_data['titulo']
-                # Clear existing content to replace it
-                db_hymn.content.clear()
-                invalidate_hymn_cache(hymn_id=db_hymn.id)
-            else:
-                # Create new hymn
-                db_hymn = tables.Hymn(
-                    hymn_number=hymn_data['numero'],
-                    title=hymn_data['titulo']
-                )
-                db.add(db_hymn)
-
-            # Add new content
+        # The last occurrence wins when a hymn number appears twice in the same import
+        hymns_by_number = {hymn_data['numero']: hymn_data for hymn_data in hymns_data}
+        if not hymns_by_number:
+            return {"added": 0, "changed": 0, "unchanged": 0}
+
+        content_hashes = {number: compute_content_hash(data) for number, data in hymns_by_number.items()}
+        existing = {
+            hymn_number: (hymn_id, content_hash)
+            for hymn_id, hymn_number, content_hash in
+            db.query(tables.Hymn.id, tables.Hymn.hymn_number, tables.Hymn.content_hash)
+            .filter(tables.Hymn.hymn_number.in_(list(hymns_by_number)))
+            .all()
+        }
+
+        hymns_to_write = {
+            number: data for number, data in hymns_by_number.items()
+            if number not in existing or existing[number][1] != content_hashes[number]
+        }
+        changed_ids = [existing[number][0] for number in hymns_to_write if number in existing]
+        counts = {
+            "added": len(hymns_to_write) - len(changed_ids),
+            "changed": len(changed_ids),
+            "unchanged": len(hymns_by_number) - len(hymns_to_write),
+        }
+        if not hymns_to_write:
+            print(f"All {len(hymns_by_number)} hymns are unchanged; nothing to write.")
+            return counts
+
+        # Clear existing content to replace it
+        if changed_ids:
+            content_ids = select(tables.HymnContent.id).where(tables.HymnContent.hymn_id.in_(changed_ids))
+            db.execute(delete(tables.ContentLine).where(tables.ContentLine.hymn_content_id.in_(content_ids)))
+            db.execute(delete(tables.HymnContent).where(tables.HymnContent.hymn_id.in_(changed_ids)))
+
+        # Upsert hymns and map each hymn number to its id
+        hymn_insert = dialect_insert(db, tables.Hymn)
+        hymn_upsert = hymn_insert.on_conflict_do_update(
+            index_elements=[tables.Hymn.hymn_number],
+            set_={"title": hymn_insert.excluded.title, "content_hash": hymn_insert.excluded.content_hash},
+        ).returning(tables.Hymn.id, tables.Hymn.hymn_number)
+        hymn_ids = {
+            hymn_number: hymn_id
+            for hymn_id, hymn_number in db.execute(
+                hymn_upsert,
+                [
+                    {"hymn_number": number, "title": data['titulo'], "content_hash": content_hashes[number]}
+                    for number, data in hymns_to_write.items()
+                ],
+            )
+        }
+
+        # Insert stanzas and choruses, keeping the generated ids in parameter order
+        content_rows = []
+        content_lines = []
+        for number, hymn_data in hymns_to_write.items():
             for i, content_item in enumerate(hymn_data['contenido']):
-                db_content = tables.HymnContent(
-                    hymn=db_hymn,
-                    content_type=content_item['tipo'],
-                    stanza_number=content_item.get('estrofa_num'),
-                    content_order=i
-                )
-                db.add(db_content)
-
-                for j, line_text in enumerate(content_item['texto']):
-                    db_line = tables.ContentLine(
-                        hymn_content=db_content,
-                        line_text=line_text,
-                        line_order=j
-                    )
-                    db.add(db_line)
+                content_rows.append({
+                    "hymn_id": hymn_ids[number],
+                    "content_type": content_item['tipo'],
+                    "stanza_number": content_item.get('estrofa_num'),
+                    "content_order": i,
+                })
+                content_lines.append(content_item['texto'])
+
+        if content_rows:
+            content_insert = insert(tables.HymnContent).returning(tables.HymnContent.id, sort_by_parameter_order=True)
+            content_ids = db.execute(content_insert, content_rows).scalars().all()
+
+            line_rows = [
+                {"hymn_content_id": content_id, "line_text": line_text, "line_order": j}
+                for content_id, lines in zip(content_ids, content_lines)
+                for j, line_text in enumerate(lines)
+            ]
+            if line_rows:
+                db.execute(insert(tables.ContentLine), line_rows)
 
         db.commit()
-        print(f"Successfully created/updated data for {len(hymns_data)} hymns.")
-        invalidate_hymn_cache() # Invalidate the main list cache
+        print(f"Hymn import finished: {counts['added']} added, {counts['changed']} changed, {counts['unchanged']} unchanged.")
 
     except Exception as e:
         db.rollback()
-        raise DatabaseError(detail=f"Failed to create or update hymns: {e}")
\ No newline at end of file
+        raise DatabaseError(detail=f"Failed to create or update hymns: {e}")
+
+    # The hymns are committed: a failure from here on leaves caches behind but must not fail the import
+    try:
+        invalidate_hymn_cache(changed_ids, added_ids=[hymn_ids[number] for number in hymns_to_write if number not in existing])
+        if warm_cache:
+            # Imported here because warmup_service builds on this module
+            from services import warmup_service
+            warmup_service.start_warmup()
+        if not sync_suggest_index(db):
+            # Without Redis there is no change log to catch up from: reload the imported hymns directly
+            suggest_index.refresh(db, list(hymn_ids.values()))
+    except Exception as e:
+        print(f"Hymns were saved, but refreshing caches after the import failed: {e}")
+    return counts
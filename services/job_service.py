@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from database import SessionLocal
+from services import extraction_service
+from core.exceptions import JobCancelledError, JobNotFoundError, PdfProcessingError
+
+# --- Configuration ---
+JOBS_DIR = os.getenv("EXTRACTION_JOBS_DIR", "./extraction_jobs")
+JOBS_DB_PATH = os.path.join(JOBS_DIR, "jobs.sqlite3")
+MAX_CONCURRENT_JOBS = int(os.getenv("EXTRACTION_MAX_CONCURRENT_JOBS", 1))
+# Form field of the upload request that holds the PDF
+PDF_FIELD = "pdf_file"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="extraction-job")
+# Set by `shutdown`; running jobs check it on every progress report
+_stopping = threading.Event()
+# Job stores whose schema this process has already set up
+_ready_stores: set[str] = set()
+
+# ---------------------------------------------------------------------------
+# LOCAL JOB STORE
+# ---------------------------------------------------------------------------
+
+def _connect() -> sqlite3.Connection:
+    if JOBS_DB_PATH not in _ready_stores:
+        _create_store()
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _create_store():
+    """Creates the job store once per process; WAL mode is kept in the database file."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with contextlib.closing(sqlite3.connect(JOBS_DB_PATH, timeout=30)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                pdf_path TEXT NOT NULL,
+                pages_total INTEGER,
+                pages_done INTEGER NOT NULL DEFAULT 0,
+                hymns_parsed INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+    _ready_stores.add(JOBS_DB_PATH)
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def get_job(job_id: str) -> dict:
+    """
+    Retrieves the stored state of an extraction job.
+    """
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        raise JobNotFoundError(job_id=job_id)
+    return _row_to_job(row)
+
+def update_job(job_id: str, **fields):
+    """Persists the given fields of a job, e.g. status or progress counters."""
+    if "result" in fields and fields["result"] is not None:
+        fields["result"] = json.dumps(fields["result"])
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _connect() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+# ---------------------------------------------------------------------------
+# JOB EXECUTION
+# ---------------------------------------------------------------------------
+
+def _report_progress(job_id: str, **counters):
+    if _stopping.is_set():
+        raise JobCancelledError(job_id=job_id)
+    update_job(job_id, **counters)
+
+def _run_job(job_id: str, pdf_hash: str = None):
+    """Runs a queued extraction job in the executor thread and records its outcome."""
+    if _stopping.is_set():
+        return  # Still queued, for recover_jobs on the next start
+    job = get_job(job_id)
+    update_job(job_id, status=JOB_RUNNING, worker_pid=os.getpid(), error=None)
+    print(f"Starting extraction job {job_id} ({job['filename']}).")
+
+    db = SessionLocal()
+    finished = True
+    try:
+        result = extraction_service.process_pdf_for_hymns(
+            job["pdf_path"], db, progress=lambda **counters: _report_progress(job_id, **counters), pdf_hash=pdf_hash
+        )
+        update_job(job_id, status=JOB_COMPLETED, result=result)
+        print(f"Extraction job {job_id} completed.")
+    except JobCancelledError as e:
+        # Queued again with its PDF: recover_jobs resumes it on the next start, reusing the cached page texts
+        finished = False
+        update_job(job_id, status=JOB_QUEUED)
+        print(e.detail)
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        update_job(job_id, status=JOB_FAILED, error=detail)
+        print(f"Extraction job {job_id} failed: {detail}")
+    finally:
+        db.close()
+        if finished and os.path.exists(job["pdf_path"]):
+            os.remove(job["pdf_path"])
+
+class _PdfPartReader:
+    """
+    Callbacks for python-multipart that keep the data of the PDF_FIELD file part, and nothing else, in
+    `chunks`. The filename is checked as soon as the part's headers are in, before its data arrives.
+    """
+
+    def __init__(self):
+        self.filename: Optional[str] = None
+        self.chunks: list[bytes] = []
+        self._in_pdf = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    @property
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if options.get(b"name") != PDF_FIELD.encode() or b"filename" not in options or self.filename is not None:
+            return
+        self.filename = options[b"filename"].decode("utf-8", errors="replace")
+        if not self.filename.endswith(".pdf"):
+            raise PdfProcessingError(detail="Only PDF files are allowed")
+        self._in_pdf = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_pdf:
+            self.chunks.append(data[start:end])
+
+    def on_part_end(self):
+        self._in_pdf = False
+
+async def _stream_pdf_part(request: Request, reader: _PdfPartReader) -> AsyncIterator[bytes]:
+    """Yields the PDF part of a multipart/form-data request body as it is received."""
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    if b"boundary" not in params:
+        raise PdfProcessingError(detail=f"Expected a multipart/form-data upload with the PDF in the '{PDF_FIELD}' field")
+    parser = MultipartParser(params[b"boundary"], reader.callbacks)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if reader.chunks:
+                data, reader.chunks = b"".join(reader.chunks), []
+                yield data
+        parser.finalize()
+    except MultipartParseError as e:
+        raise PdfProcessingError(detail=f"Malformed multipart upload: {e}")
+    if reader.filename is None:
+        raise PdfProcessingError(detail=f"No PDF file was uploaded in the '{PDF_FIELD}' field")
+
+async def submit_extraction_job(request: Request) -> dict:
+    """
+    Streams the PDF uploaded in `request` into the job directory, registers a new job and queues it.
+    Returns the job right away; progress is reported through `get_job`.
+    """
+    job_id = uuid.uuid4().hex
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    pdf_path = os.path.join(JOBS_DIR, f"{job_id}.pdf")
+
+    reader = _PdfPartReader()
+    try:
+        # The request body goes straight to the job's file, hashed on the way: no spooled copy in between
+        pdf_hash, _ = await extraction_service.spool_upload(_stream_pdf_part(request, reader), pdf_path)
+    except Exception as e:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        if isinstance(e, PdfProcessingError):
+            raise
+        raise PdfProcessingError(detail=f"Could not store the uploaded PDF: {e}")
+
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, filename, pdf_path, worker_pid, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, JOB_QUEUED, reader.filename, pdf_path, os.getpid(), now, now),
+        )
+    _executor.submit(_run_job, job_id, pdf_hash)
+    return get_job(job_id)
+
+def _is_process_alive(pid: int) -> bool:
+    if not pid or pid == os.getpid():
+        # Our own pid here means the job belongs to a previous run of this process
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def recover_jobs():
+    """
+    Re-queues jobs left queued or running by a worker that is no longer alive.
+    Called once at startup so that a worker restart does not lose accepted uploads.
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT id, pdf_path, worker_pid FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+        ).fetchall()
+
+    for row in rows:
+        if _is_process_alive(row["worker_pid"]):
+            continue
+        # Claim the job atomically so only one restarted worker picks it up
+        with _connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, updated_at = ? WHERE id = ? AND worker_pid IS ?",
+                (JOB_QUEUED, os.getpid(), time.time(), row["id"], row["worker_pid"]),
+            ).rowcount
+        if not claimed:
+            continue
+        if os.path.exists(row["pdf_path"]):
+            print(f"Re-queuing interrupted extraction job {row['id']}.")
+            _executor.submit(_run_job, row["id"])
+        else:
+            update_job(row["id"], status=JOB_FAILED, error="Job was interrupted and its PDF is no longer available.")
+
+def shutdown():
+    """
+    Stops accepting jobs and stops the running ones at their next progress report, waiting for them to do so.
+    Unfinished jobs stay in the store with their PDF and are recovered on the next start.
+    """
+    _stopping.set()
+    _executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,20 @@
+"""
+Code run inside the OCR process pool. Workers import this module to unpickle their tasks, so it must
+import only Tesseract's wrapper: no database, no Redis cache.
+"""
+import os
+import pytesseract
+from PIL import Image
+
+# --- Configuration ---
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+OCR_LANG = os.getenv("OCR_LANG", "spa")
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+def init_ocr_worker():
+    """Keeps each Tesseract process single-threaded so the pool does not oversubscribe the CPUs."""
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def ocr_column(column_image: Image.Image) -> str:
+    """Runs Tesseract on a single column crop. Executed inside the OCR process pool."""
+    return pytesseract.image_to_string(column_image, lang=OCR_LANG)
@@ -0,0 +1,43 @@
+from sqlalchemy.orm import Session
+from models import tables
+from database import dialect_insert
+
+COLUMN_FULL = "full"
+COLUMN_LEFT = "left"
+COLUMN_RIGHT = "right"
+
+ENGINE_PDFMINER = "pdfminer"
+ENGINE_OCR = "ocr"
+
+def get_page_texts(db: Session, pdf_hash: str) -> dict:
+    """
+    Loads every cached page text of a PDF.
+    Returns a dict keyed by `(page_number, column)` with the extracted text as value.
+    """
+    rows = (
+        db.query(tables.PageText.page_number, tables.PageText.column, tables.PageText.text)
+        .filter(tables.PageText.pdf_hash == pdf_hash)
+        .all()
+    )
+    return {(page_number, column): text for page_number, column, text in rows}
+
+def save_page_texts(db: Session, pdf_hash: str, engine: str, entries: list[tuple[int, str, str]]):
+    """
+    Durably stores extracted `(page_number, column, text)` entries of a PDF and commits them,
+    so an interrupted extraction keeps every page finished so far.
+    """
+    if not entries:
+        return
+    rows = [
+        {"pdf_hash": pdf_hash, "page_number": page_number, "column": column, "engine": engine, "text": text}
+        for page_number, column, text in entries
+    ]
+    stmt = dialect_insert(db, tables.PageText).on_conflict_do_nothing(
+        index_elements=["pdf_hash", "page_number", "column"]
+    )
+    try:
+        db.execute(stmt, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
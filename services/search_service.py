@@ -0,0 +1,94 @@
+import html
+import unicodedata
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import Session
+from models import schemas, tables
+
+# The expression must stay identical to the one of the GIN index on content_lines for the index to be used.
+SEARCH_CONFIG = literal_column(f"'{tables.SEARCH_CONFIG}'::regconfig")
+LINE_TSVECTOR = func.to_tsvector(SEARCH_CONFIG, tables.ContentLine.line_text)
+# ts_headline marks matches with control characters, replaced by <mark> once the line text is HTML-escaped
+HIGHLIGHT_START, HIGHLIGHT_STOP = "\x02", "\x03"
+HIGHLIGHT_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, HighlightAll=true"
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text.lower()) if unicodedata.category(c) != "Mn")
+
+def _headline_to_html(headline: str) -> str:
+    """Escapes a ts_headline result and turns its match delimiters into <mark> tags."""
+    return html.escape(headline).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+def _search_postgresql(db: Session, query: str, limit: int) -> list[schemas.HymnSearchResult]:
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    matches = LINE_TSVECTOR.op("@@")(ts_query)
+
+    # Rank hymns by the sum of the ranks of their matching lines
+    rank = func.sum(func.ts_rank(LINE_TSVECTOR, ts_query)).label("rank")
+    ranked_hymns = db.execute(
+        select(tables.Hymn.id, tables.Hymn.hymn_number, tables.Hymn.title, tables.Hymn.category_id, rank)
+        .join(tables.HymnContent, tables.HymnContent.hymn_id == tables.Hymn.id)
+        .join(tables.ContentLine, tables.ContentLine.hymn_content_id == tables.HymnContent.id)
+        .where(matches)
+        .group_by(tables.Hymn.id)
+        .order_by(rank.desc(), tables.Hymn.hymn_number)
+        .limit(limit)
+    ).all()
+    if not ranked_hymns:
+        return []
+
+    # Highlight only the matching lines of the hymns being returned
+    highlighted = {}
+    for hymn_id, headline in db.execute(
+        select(tables.HymnContent.hymn_id, func.ts_headline(SEARCH_CONFIG, tables.ContentLine.line_text, ts_query, HIGHLIGHT_OPTIONS))
+        .join(tables.ContentLine, tables.ContentLine.hymn_content_id == tables.HymnContent.id)
+        .where(tables.HymnContent.hymn_id.in_([row.id for row in ranked_hymns]), matches)
+        .order_by(tables.HymnContent.content_order, tables.ContentLine.line_order)
+    ):
+        highlighted.setdefault(hymn_id, []).append(_headline_to_html(headline))
+
+    return [
+        schemas.HymnSearchResult(
+            id=row.id, hymn_number=row.hymn_number, title=row.title, category_id=row.category_id,
+            rank=row.rank, matches=highlighted.get(row.id, []),
+        )
+        for row in ranked_hymns
+    ]
+
+def _search_fallback(db: Session, query: str, limit: int) -> list[schemas.HymnSearchResult]:
+    """Substring search for databases without full-text support (e.g. SQLite in development)."""
+    terms = [_strip_accents(term) for term in query.split()]
+    lines = db.execute(
+        select(tables.Hymn.id, tables.Hymn.hymn_number, tables.Hymn.title, tables.Hymn.category_id, tables.ContentLine.line_text)
+        .join(tables.HymnContent, tables.HymnContent.hymn_id == tables.Hymn.id)
+        .join(tables.ContentLine, tables.ContentLine.hymn_content_id == tables.HymnContent.id)
+        .order_by(tables.Hymn.hymn_number, tables.HymnContent.content_order, tables.ContentLine.line_order)
+    ).all()
+
+    results = {}
+    for row in lines:
+        normalized = _strip_accents(row.line_text)
+        if not all(term in normalized for term in terms):
+            continue
+        result = results.setdefault(row.id, schemas.HymnSearchResult(
+            id=row.id, hymn_number=row.hymn_number, title=row.title, category_id=row.category_id, rank=0, matches=[],
+        ))
+        result.rank += 1
+        result.matches.append(" ".join(
+            f"<mark>{html.escape(word)}</mark>" if any(term in _strip_accents(word) for term in terms) else html.escape(word)
+            for word in row.line_text.split(" ")
+        ))
+    return sorted(results.values(), key=lambda result: (-result.rank, result.hymn_number))[:limit]
+
+def search_hymns(db: Session, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[schemas.HymnSearchResult]:
+    """
+    Finds hymns by a remembered lyric fragment.
+    On PostgreSQL the query runs against the accent-insensitive Spanish full-text GIN index of
+    `content_lines`; results are ranked per hymn and carry their matching lines, HTML-escaped, highlighted with <mark>.
+    """
+    if not query.strip():
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgresql(db, query, limit)
+    return _search_fallback(db, query, limit)
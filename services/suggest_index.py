@@ -0,0 +1,242 @@
+import bisect
+import heapq
+import threading
+import unicodedata
+from collections import Counter
+from typing import Iterable, Optional
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+from models import schemas, tables
+
+# Minimum share of trigrams a vocabulary word must have in common with a typed word to count as a typo of it
+FUZZY_SIMILARITY = 0.45
+MAX_PREFIX_EXPANSIONS = 500
+
+def normalize(text: str) -> str:
+    """Lowercases, strips accents and punctuation so "¡Cuán Grande!" becomes "cuan grande"."""
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return " ".join("".join(
+        c if c.isalnum() else " " for c in decomposed if unicodedata.category(c) != "Mn"
+    ).split())
+
+def trigrams(word: str, complete: bool = True) -> set[str]:
+    """Trigrams of a word padded like pg_trgm; an incomplete (still being typed) word gets no trailing pad."""
+    padded = f"  {word} " if complete else f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SuggestIndex:
+    """
+    In-memory index over hymn numbers, titles and first lines for typeahead.
+    Typed words are expanded to the indexed words they prefix or are a likely typo of,
+    then the hymn sets of every typed word are intersected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes rebuilds and catch-ups, which query the database outside of `_lock`
+        self._sync_lock = threading.Lock()
+        # Version of the data the index reflects and position in the change log of hymn edits, as recorded
+        # by `rebuild` and `apply_changes`
+        self.version: Optional[tuple[str, ...]] = None
+        self.position: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        self._entries: dict[int, dict] = {}
+        self._words: dict[str, set[int]] = {}        # word -> hymns with it in the title or first line
+        self._title_words: dict[str, set[int]] = {}  # word -> hymns with it in the title
+        self._vocabulary: list[str] = []             # sorted keys of _words, for prefix lookups
+        self._word_grams: dict[str, set[str]] = {}   # trigram -> words containing it, for typo lookups
+        self._numbers: list[tuple[str, int]] = []    # sorted (hymn number as text, hymn id)
+
+    def _index_word(self, word: str, hymn_id: int, in_title: bool):
+        if word not in self._words:
+            self._words[word] = set()
+            bisect.insort(self._vocabulary, word)
+            for gram in trigrams(word):
+                self._word_grams.setdefault(gram, set()).add(word)
+        self._words[word].add(hymn_id)
+        if in_title:
+            self._title_words.setdefault(word, set()).add(hymn_id)
+
+    def _unindex_word(self, word: str, hymn_id: int):
+        self._title_words.get(word, set()).discard(hymn_id)
+        if not self._title_words.get(word, True):
+            del self._title_words[word]
+        self._words[word].discard(hymn_id)
+        if not self._words[word]:
+            del self._words[word]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+            for gram in trigrams(word):
+                self._word_grams[gram].discard(word)
+                if not self._word_grams[gram]:
+                    del self._word_grams[gram]
+
+    def _add(self, hymn_id: int, hymn_number: int, title: str, first_line: Optional[str], category_id: Optional[int]):
+        self._remove(hymn_id)
+        title_key, line_key = normalize(title), normalize(first_line or "")
+        entry = {
+            "suggestion": schemas.HymnSuggestion(
+                id=hymn_id, hymn_number=hymn_number, title=title, first_line=first_line, category_id=category_id,
+            ),
+            "title_key": title_key,
+            "line_key": line_key,
+            "words": set(title_key.split()) | set(line_key.split()),
+        }
+        self._entries[hymn_id] = entry
+        title_words = set(title_key.split())
+        for word in entry["words"]:
+            self._index_word(word, hymn_id, word in title_words)
+        bisect.insort(self._numbers, (str(hymn_number), hymn_id))
+
+    def _remove(self, hymn_id: int):
+        entry = self._entries.pop(hymn_id, None)
+        if not entry:
+            return
+        for word in entry["words"]:
+            self._unindex_word(word, hymn_id)
+        self._numbers.remove((str(entry["suggestion"].hymn_number), hymn_id))
+
+    def load(self, rows: Iterable[tuple], replace: bool = False):
+        """
+        Adds or replaces `(id, hymn_number, title, first_line, category_id)` rows.
+        With `replace`, everything not in `rows` is dropped first.
+        """
+        with self._lock:
+            if replace:
+                self._reset()
+            for row in rows:
+                self._add(*row)
+
+    def _query_rows(self, db: Session, hymn_ids: Optional[list[int]] = None) -> list[tuple]:
+        # The first line is line 0 of content block 0, joined in the same query
+        query = (
+            select(tables.Hymn.id, tables.Hymn.hymn_number, tables.Hymn.title, tables.ContentLine.line_text, tables.Hymn.category_id)
+            .outerjoin(tables.HymnContent, and_(tables.HymnContent.hymn_id == tables.Hymn.id, tables.HymnContent.content_order == 0))
+            .outerjoin(tables.ContentLine, and_(tables.ContentLine.hymn_content_id == tables.HymnContent.id, tables.ContentLine.line_order == 0))
+        )
+        if hymn_ids is not None:
+            query = query.where(tables.Hymn.id.in_(hymn_ids))
+        return [tuple(row) for row in db.execute(query)]
+
+    def rebuild(self, db: Session, version: Optional[tuple[str, ...]] = None, position: Optional[int] = None):
+        """
+        Builds the whole index from the hymns and content_lines tables, recording the data `version` and
+        change log `position`. The new index is built aside, so suggestions keep coming from the old one.
+        """
+        with self._sync_lock:
+            rows = self._query_rows(db)
+            fresh = SuggestIndex()
+            fresh.load(rows)
+            with self._lock:
+                for name in ("_entries", "_words", "_title_words", "_vocabulary", "_word_grams", "_numbers"):
+                    setattr(self, name, getattr(fresh, name))
+                self.version, self.position = version, position
+        print(f"Suggest index built with {len(rows)} hymns.")
+
+    def apply_changes(self, db: Session, hymn_ids: Iterable[int], version: tuple[str, ...], position: int):
+        """Reloads the given hymns, dropping those no longer in the database, and records `version` and `position`."""
+        hymn_ids = list(hymn_ids)
+        with self._sync_lock:
+            if self.position is not None and position < self.position:
+                return  # Another thread caught up further meanwhile
+            rows = self._query_rows(db, hymn_ids) if hymn_ids else []
+            with self._lock:
+                for hymn_id in set(hymn_ids) - {row[0] for row in rows}:
+                    self._remove(hymn_id)
+                for row in rows:
+                    self._add(*row)
+                self.version, self.position = version, position
+
+    def refresh(self, db: Session, hymn_ids: list[int]):
+        """Reloads the given hymns after they were created or changed."""
+        if hymn_ids:
+            self.load(self._query_rows(db, hymn_ids))
+
+    def set_category(self, hymn_id: int, category_id: Optional[int]):
+        with self._lock:
+            entry = self._entries.get(hymn_id)
+            if entry:
+                entry["suggestion"] = entry["suggestion"].copy(update={"category_id": category_id})
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.version, self.position = None, None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expand(self, word: str, complete: bool) -> set[str]:
+        """Indexed words matching a typed word: itself, words it prefixes (while typing) and likely typos."""
+        matches = {word} if word in self._words else set()
+        if not complete:
+            start = bisect.bisect_left(self._vocabulary, word)
+            for candidate in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not candidate.startswith(word):
+                    break
+                matches.add(candidate)
+        if len(word) >= 3:
+            grams = trigrams(word, complete)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._word_grams.get(gram, ()))
+            for candidate, count in shared.items():
+                # While typing, compare against the candidate's start only
+                if count / (len(grams) if not complete else max(len(grams), len(candidate) + 1)) >= FUZZY_SIMILARITY:
+                    matches.add(candidate)
+        return matches
+
+    def suggest(self, query: str, limit: int = 10, category_id: Optional[int] = None) -> list[schemas.HymnSuggestion]:
+        """
+        Returns the best matches for a partial, possibly misspelled title, first line or hymn number.
+        Title prefixes rank first, then hymns whose title has every word, then first-line matches.
+        """
+        text = normalize(query)
+        if not text:
+            return []
+
+        with self._lock:
+            if text.isdigit():
+                # Number prefix: "12" matches 12, 120-129, 1200-...
+                start = bisect.bisect_left(self._numbers, (text, -1))
+                ids = []
+                for number_text, hymn_id in self._numbers[start:]:
+                    if not number_text.startswith(text):
+                        break
+                    ids.append(hymn_id)
+                candidates = sorted(ids, key=lambda hymn_id: self._entries[hymn_id]["suggestion"].hymn_number)
+                if category_id is not None:
+                    candidates = [hymn_id for hymn_id in candidates if self._entries[hymn_id]["suggestion"].category_id == category_id]
+            else:
+                words = text.split()
+                candidates, title_hits = None, None
+                for position, word in enumerate(words):
+                    # The last word is still being typed unless the query ends with a space
+                    expanded = self._expand(word, complete=position < len(words) - 1 or query[-1:].isspace())
+                    hits = set().union(*(self._words[w] for w in expanded))
+                    in_titles = set().union(*(self._title_words.get(w, ()) for w in expanded))
+                    candidates = hits if candidates is None else candidates & hits
+                    title_hits = in_titles if title_hits is None else title_hits & in_titles
+                    if not candidates:
+                        return []
+
+                def rank(hymn_id):
+                    entry = self._entries[hymn_id]
+                    if entry["title_key"].startswith(text):
+                        tier = 0
+                    elif hymn_id in title_hits:
+                        tier = 1
+                    elif text in entry["line_key"]:
+                        tier = 2
+                    else:
+                        tier = 3
+                    return tier, entry["suggestion"].hymn_number
+
+                if category_id is not None:
+                    candidates = [hymn_id for hymn_id in candidates if self._entries[hymn_id]["suggestion"].category_id == category_id]
+                candidates = heapq.nsmallest(limit, candidates, key=rank)
+
+            return [self._entries[hymn_id]["suggestion"] for hymn_id in candidates[:limit]]
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,153 @@
+import os
+import time
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from database import SessionLocal
+from models import schemas, tables
+from services import category_service, hymn_service
+from services.cache import Cache, cache
+
+# --- Configuration ---
+CACHE_WARMUP = os.getenv("CACHE_WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_BATCH_SIZE = 200  # Entries per pipelined write; interruption is checked between batches
+WARMUP_TTL = 3600
+WARMUP_LOCK_TIMEOUT = 60  # Seconds other workers skip warming the same data
+
+WARMUP_IDLE = "idle"
+WARMUP_RUNNING = "running"
+WARMUP_COMPLETED = "completed"
+WARMUP_INTERRUPTED = "interrupted"
+WARMUP_SKIPPED = "skipped"
+WARMUP_FAILED = "failed"
+
+_status = {"status": WARMUP_IDLE, "entries_total": 0, "entries_done": 0, "started_at": None, "duration_seconds": None, "error": None}
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+def get_status() -> dict:
+    return dict(_status)
+
+def _update_status(**fields):
+    _status.update(fields)
+
+def build_entries(db: Session, stop: threading.Event) -> Optional[list[tuple[str, tuple[str, ...], bytes]]]:
+    """
+    Serializes the hymn listing pages, every hymn detail and the category list as the response bodies
+    the endpoints return, as `(key, tags, body)`. Hymns come from a single eager-loaded query.
+    Returns None if `stop` is set meanwhile.
+    """
+    hymns = (
+        db.query(tables.Hymn)
+        .options(joinedload(tables.Hymn.content).joinedload(tables.HymnContent.lines))
+        .order_by(tables.Hymn.hymn_number)
+        .all()
+    )
+    entries = []
+    summaries = []
+    for hymn in hymns:
+        if stop.is_set():
+            return None
+        entries.append((
+            f"{hymn_service.HYMN_DETAIL_CACHE_KEY_PREFIX}{hymn.id}",
+            (hymn_service.hymn_tag(hymn.id),),
+            schemas.Hymn.from_orm(hymn).json().encode(),
+        ))
+        summaries.append(schemas.HymnSummary.from_orm(hymn))
+
+    # The pages a client walking the default listing requests, cursor by cursor
+    page_size = hymn_service.DEFAULT_PAGE_SIZE
+    for start in range(0, max(len(summaries), 1), page_size):
+        after = summaries[start - 1].hymn_number if start else None
+        items = summaries[start:start + page_size]
+        page = schemas.HymnPage(items=items, next_cursor=items[-1].hymn_number if start + page_size < len(summaries) else None)
+        entries.append((
+            hymn_service._hymns_page_cache_key(after, page_size, False), (hymn_service.HYMNS_TAG,), page.json().encode(),
+        ))
+
+    entries.append((category_service.CATEGORIES_CACHE_KEY, (category_service.CATEGORIES_TAG,), category_service._load_categories(db)))
+    return entries
+
+def warm_cache(db: Session, target: Cache, stop: threading.Event, progress: Callable[[int, int], None] = None) -> str:
+    """
+    Precomputes the hymn listing, every hymn detail and the categories and writes them, with the
+    `stale:` copies `get_or_compute` keeps, in pipelined batches.
+    Returns WARMUP_COMPLETED; WARMUP_SKIPPED if another worker is warming the same data; or
+    WARMUP_INTERRUPTED if `stop` was set, the cache was invalidated meanwhile or Redis became
+    unreachable, in which case every batch already written stays valid.
+    """
+    shared = [hymn_service.HYMNS_TAG, category_service.CATEGORIES_TAG]
+    # Every hymn change bumps HYMNS_TAG, so if these did not move during the query, nothing read is stale
+    generations = target.read_generations(shared)
+    if generations is None:
+        return WARMUP_INTERRUPTED
+    # One worker warms each version of the data; the lock is kept after success so workers starting later skip it too
+    lock_name = Cache.key_for_generations("cache_warmup", generations, tuple(shared))
+    token = target.acquire_lock(lock_name, WARMUP_LOCK_TIMEOUT)
+    if token is None:
+        return WARMUP_SKIPPED
+    result = WARMUP_INTERRUPTED
+    try:
+        result = _write_entries(db, target, stop, progress, shared, generations)
+        return result
+    finally:
+        if result != WARMUP_COMPLETED:
+            target.release_lock(lock_name, token)
+
+def _write_entries(db: Session, target: Cache, stop: threading.Event, progress: Optional[Callable[[int, int], None]],
+                   shared: list[str], generations: dict[str, int]) -> str:
+    entries = build_entries(db, stop)
+    if entries is None:
+        return WARMUP_INTERRUPTED
+
+    hymn_tags = [tags[0] for key, tags, body in entries if tags[0] not in shared]
+    current = target.read_generations(shared + hymn_tags)
+    if current is None or any(current[name] != generations[name] for name in generations):
+        print("Cache was invalidated during warm-up; skipping the writes.")
+        return WARMUP_INTERRUPTED
+    items = [(key, Cache.key_for_generations(key, current, tags), body) for key, tags, body in entries]
+
+    for done in range(0, len(items), WARMUP_BATCH_SIZE):
+        if stop.is_set() or not target.fill_many(items[done:done + WARMUP_BATCH_SIZE], ex=WARMUP_TTL):
+            return WARMUP_INTERRUPTED
+        if progress:
+            progress(min(done + WARMUP_BATCH_SIZE, len(items)), len(items))
+    return WARMUP_COMPLETED
+
+def _run_warmup(stop: threading.Event):
+    start = time.perf_counter()
+    _update_status(status=WARMUP_RUNNING, entries_total=0, entries_done=0, started_at=time.time(), duration_seconds=None, error=None)
+    db = SessionLocal()
+    try:
+        result = warm_cache(db, cache, stop, progress=lambda done, total: _update_status(entries_done=done, entries_total=total))
+        _update_status(status=result)
+    except Exception as e:
+        print(f"Cache warm-up failed: {e}")
+        _update_status(status=WARMUP_FAILED, error=str(e))
+    finally:
+        db.close()
+        _update_status(duration_seconds=time.perf_counter() - start)
+        print(f"Cache warm-up {_status['status']}: {_status['entries_done']} entries in {_status['duration_seconds']:.2f}s")
+
+def start_warmup():
+    """
+    Warms the cache in a background thread, interrupting a warm-up already running (its data may be outdated).
+    Does nothing when CACHE_WARMUP is off or Redis is unreachable.
+    """
+    global _stop, _thread
+    if not CACHE_WARMUP or not cache.available:
+        return
+    with _lock:
+        stop_warmup()
+        _stop = threading.Event()
+        _thread = threading.Thread(target=_run_warmup, args=(_stop,), daemon=True, name="cache-warmup")
+        _thread.start()
+
+def stop_warmup(timeout: float = 10):
+    """Interrupts a running warm-up and waits for it to finish its current batch."""
+    _stop.set()
+    if _thread is not None and _thread.is_alive():
+        _thread.join(timeout)
@@ -1,6 +1,9 @@
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 import sys
 import os
 
@@ -10,6 +13,9 @@ if backend_dir not in sys.path:
     sys.path.insert(0, backend_dir)
 
 from main import app
+from database import get_db
+from models.tables import Base
+
 
 @pytest.fixture(scope="module")
 def client():
@@ -17,7 +23,24 @@ def client():
         yield c
 
 
-@pytest.fixture(scope="module")
-def client():
-    with TestClient(app) as c:
-        yield c
+@pytest.fixture
+def db_session():
+    """An isolated in-memory SQLite session with all tables created."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def api_client(db_session):
+    """A TestClient whose requests use the SQLite `db_session`; the lifespan is not run."""
+    app.dependency_overrides[get_db] = lambda: db_session
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,24 @@
+from benchmarks import suite
+from services import admin_service, category_service, generator_service, hymn_service, warmup_service
+
+def test_suite_times_every_case_on_a_small_hymnal(tmp_path, monkeypatch):
+    # The suite points the services at a fake Redis; restore them afterwards
+    for module in (hymn_service, category_service, generator_service, warmup_service, admin_service):
+        monkeypatch.setattr(module, "cache", module.cache)
+    monkeypatch.setattr(hymn_service, "async_cache", hymn_service.async_cache)
+    monkeypatch.setattr(warmup_service, "CACHE_WARMUP", warmup_service.CACHE_WARMUP)
+
+    results = suite.run(5, 1, f"sqlite:///{tmp_path / 'bench.sqlite3'}")
+
+    assert results["database"] == "sqlite" and results["hymns"] == 5
+    assert set(results["cases"]) == {
+        "parser", "bulk_import.first", "bulk_import.reimport", "hymn_list.cold", "hymn_list.warm",
+        "hymn_detail.cold", "hymn_detail.warm", "categories.cold", "categories.warm", "docx.cold", "docx.warm",
+    }
+    assert all(case["median_ms"] >= case["min_ms"] > 0 for case in results["cases"].values())
+
+def test_only_cases_slower_than_the_threshold_are_regressions():
+    baseline = {"cases": {"parser": {"median_ms": 10.0}, "docx.warm": {"median_ms": 10.0}, "removed": {"median_ms": 1.0}}}
+    results = {"cases": {"parser": {"median_ms": 12.0}, "docx.warm": {"median_ms": 13.0}, "added": {"median_ms": 99.0}}}
+
+    assert [regression["case"] for regression in suite.compare(baseline, results, threshold=0.25)] == ["docx.warm"]
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import threading
+import time
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from services import admin_service, category_service, hymn_service
+from services.cache import AsyncCache, Cache
+from benchmarks.fakes import FakeAsyncRedis, FakeRedis, FakeRedisServer
+from benchmarks.synthetic import generate_hymns
+
+def _workers(count=2):
+    server = FakeRedisServer()
+    return server, [Cache(client=FakeRedis(server)) for _ in range(count)]
+
+def test_local_tier_serves_repeated_reads_without_redis():
+    server, (worker,) = _workers(1)
+    worker.set_raw("hymn_detail_1", '{"id": 1, "title": "Cuán grande es Él"}'.encode())
+
+    assert b"Cu\xc3\xa1n grande" in worker.get_raw("hymn_detail_1")
+    commands = server.commands
+    for _ in range(10):
+        assert worker.get_raw("hymn_detail_1").startswith(b'{"id": 1')
+
+    assert server.commands == commands
+    stats = worker.stats()
+    assert (stats["local_hits"], stats["redis_hits"], stats["misses"]) == (10, 1, 0)
+    assert stats["local_entries"] == 1 and stats["local_bytes"] > 0
+
+def test_invalidation_reaches_other_workers():
+    server, (writer, reader) = _workers()
+    writer.set_raw("hymn_detail_1", b'{"title": "old"}', tags=("hymn:1",))
+    writer.set_raw("all_hymns:0:50:0", b'{"items": []}', tags=("hymns",))
+    writer.set_raw("all_categories", b"[]", tags=("categories",))
+    reader.get_raw("hymn_detail_1", tags=("hymn:1",)), reader.get_raw("all_hymns:0:50:0", tags=("hymns",))
+
+    writer.bump("hymns", "hymn:1")
+
+    assert reader.get_raw("hymn_detail_1", tags=("hymn:1",)) is None
+    assert reader.get_raw("all_hymns:0:50:0", tags=("hymns",)) is None
+    assert reader.get_raw("all_categories", tags=("categories",)) == b"[]"
+
+def test_read_racing_with_an_invalidation_is_not_kept_locally():
+    server, (worker,) = _workers(1)
+    worker.set_raw("hymn_detail_1", b'{"title": "old"}')
+    key = worker.versioned_key("hymn_detail_1")
+    epoch = worker.local.epoch
+
+    worker.clear()
+    worker.local.set(key, b'{"title": "old"}', epoch)
+
+    assert worker.local.get(key) is None
+
+def test_local_tier_is_bounded_in_entries_and_bytes(monkeypatch):
+    monkeypatch.setattr("services.cache.CACHE_LOCAL_MAX_ENTRIES", 3)
+    server, (worker,) = _workers(1)
+    for i in range(5):
+        worker.set_raw(f"key_{i}", f'{{"i": {i}}}'.encode())
+        worker.get_raw(f"key_{i}")
+    assert len(worker.local) == 3
+    assert worker.local.get(worker.versioned_key("key_0")) is None
+    assert worker.local.get(worker.versioned_key("key_4")).raw == b'{"i": 4}'
+
+    worker.local.max_bytes = 30
+    worker.set_raw("big", b"x" * 100)
+    worker.get_raw("big")
+    assert worker.local.get(worker.versioned_key("big")) is None
+    assert worker.local.bytes <= 30
+
+def test_raw_values_are_returned_as_stored():
+    server, (writer, reader) = _workers()
+    body = '{"id":1,"title":"Cuán grande es Él"}'.encode()
+    writer.set_raw("hymn_detail_1", body)
+
+    assert reader.get_raw("hymn_detail_1") == body
+    assert reader.get_raw("hymn_detail_1") is reader.get_raw("hymn_detail_1")  # served by the local tier
+
+def test_bumping_a_generation_invalidates_tagged_keys_in_one_round_trip():
+    server, (writer, reader) = _workers()
+    writer.set_raw("all_hymns:0:50:0", b'{"items": [1]}', tags=("hymns",))
+    writer.set_raw("hymn_detail_1", b'{"id": 1}', tags=("hymn:1",))
+    writer.set_raw("hymn_detail_2", b'{"id": 2}', tags=("hymn:2",))
+    writer.set_raw("all_categories", b"[]", tags=("categories",))
+    for key, tags in (("all_hymns:0:50:0", ("hymns",)), ("hymn_detail_1", ("hymn:1",)), ("hymn_detail_2", ("hymn:2",))):
+        assert reader.get_raw(key, tags=tags) is not None
+
+    commands = server.commands
+    writer.bump("hymns", "hymn:1")
+
+    assert server.commands - commands == 2  # one pipeline and one pub/sub message
+    assert reader.get_raw("all_hymns:0:50:0", tags=("hymns",)) is None
+    assert reader.get_raw("hymn_detail_1", tags=("hymn:1",)) is None
+    assert reader.get_raw("hymn_detail_2", tags=("hymn:2",)) == b'{"id": 2}'
+
+    writer.clear()
+    assert reader.get_raw("hymn_detail_2", tags=("hymn:2",)) is None
+    assert reader.get_raw("all_categories", tags=("categories",)) is None
+
+def test_reset_db_invalidates_the_cached_hymns(api_client, db_session, monkeypatch):
+    fake_cache = Cache(client=FakeRedis())
+    for module in (hymn_service, admin_service):
+        monkeypatch.setattr(module, "cache", fake_cache)
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(3))
+    assert len(api_client.get("/hymns/").json()["items"]) == 3
+
+    api_client.post("/admin/reset-db")
+
+    assert api_client.get("/hymns/").json()["items"] == []
+
+def test_cache_stats_endpoint(api_client):
+    response = api_client.get("/admin/cache-stats")
+
+    assert response.status_code == 200
+    assert {"local_hit_ratio", "redis_hit_ratio", "overall_hit_ratio"} <= set(response.json())
+
+def _burst(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def call(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_misses_query_the_database_once(db_session, monkeypatch):
+    monkeypatch.setattr(hymn_service, "cache", Cache(client=FakeRedis()))
+    monkeypatch.setattr(category_service, "cache", hymn_service.cache)
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(30))
+    engine = db_session.get_bind()
+    session_factory = sessionmaker(bind=engine)
+    statements = []
+
+    def slow_query(conn, cursor, statement, *args):
+        statements.append(statement)
+        time.sleep(0.05)
+    event.listen(engine, "before_cursor_execute", slow_query)
+
+    pages = _burst(20, lambda i: hymn_service.get_hymns_json(session_factory(), limit=10))
+    categories = _burst(20, lambda i: category_service.get_categories(session_factory()))
+
+    assert len(statements) == 2  # one listing query and one category query for 40 requests
+    assert all(page == pages[0] for page in pages) and json.loads(pages[0])["next_cursor"] == 10
+    assert all(result == [] for result in categories)
+
+def test_invalidated_key_serves_stale_value_while_another_worker_rebuilds():
+    server, (rebuilding, reader) = _workers()
+    calls = []
+    reader.get_or_compute("all_categories", lambda: b"[1]", ex=60, tags=("categories",))
+    rebuilding.bump("categories")
+    server.data[f"lock:{reader.versioned_key('all_categories', ('categories',))}"] = (b"other-worker", None)
+
+    value = reader.get_or_compute("all_categories", lambda: calls.append(1) or b"[1, 2]", ex=60, tags=("categories",))
+
+    assert value == b"[1]" and calls == []
+    assert reader.stats()["stale_served"] == 1
+
+def test_only_one_worker_recomputes_a_missing_key():
+    server, workers = _workers(3)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return b"[]"
+
+    results = _burst(30, lambda i: workers[i % 3].get_or_compute("all_hymns:0:50:0", compute, ex=60))
+
+    assert calls == [1]
+    assert results == [b"[]"] * 30
+
+def test_hits_near_expiry_refresh_early(monkeypatch):
+    server, (worker,) = _workers(1)
+    worker.local = None  # XFetch applies to Redis hits
+    worker.get_or_compute("hymn_detail_1", lambda: b"old", ex=60)
+    worker._compute_seconds["hymn_detail_1"] = 1.0
+    server.data[worker.versioned_key("hymn_detail_1")] = (b"old", time.monotonic() + 2)
+
+    monkeypatch.setattr("services.cache.random.random", lambda: 0.0)
+    assert worker.get_or_compute("hymn_detail_1", lambda: b"new", ex=60) == b"old"
+
+    monkeypatch.setattr("services.cache.random.random", lambda: 0.999)
+    assert worker.get_or_compute("hymn_detail_1", lambda: b"new", ex=60) == b"new"
+    assert worker.stats()["early_refreshes"] == 1
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_redis_down_at_boot_is_skipped_and_reconnected_in_background(monkeypatch):
+    monkeypatch.setattr("services.cache.REDIS_RECONNECT_INTERVAL", 0.01)
+    server = FakeRedisServer()
+    running = Cache(client=FakeRedis(server))
+    running.set_raw("hymn_detail_1", b'{"title": "old"}', tags=("hymn:1",))
+    server.down = True
+    booting = Cache(client=FakeRedis(server))
+
+    assert not booting.available
+    assert booting.get_raw("hymn_detail_1", tags=("hymn:1",)) is None
+    assert booting.get_or_compute("all_categories", lambda: b"[]", ex=60) == b"[]"
+    booting.bump("hymn:1")  # cannot reach Redis yet
+
+    server.down = False
+    assert _wait_for(lambda: booting.available)
+    # The invalidation missed during the outage was replayed on reconnect
+    assert running.get_raw("hymn_detail_1", tags=("hymn:1",)) is None
+    booting.set_raw("hymn_detail_2", b'{"title": "new"}')
+    assert booting.get_raw("hymn_detail_2") == b'{"title": "new"}'
+
+def test_reconnect_keeps_retrying_after_unexpected_errors(monkeypatch):
+    monkeypatch.setattr("services.cache.REDIS_RECONNECT_INTERVAL", 0.01)
+    server = FakeRedisServer()
+    server.down = True
+    booting = Cache(client=FakeRedis(server))
+    failures = []
+
+    def replay_failing_once():
+        if not failures:
+            failures.append(1)
+            raise redis.exceptions.ResponseError("LOADING Redis is loading the dataset in memory")
+    monkeypatch.setattr(booting, "_replay_invalidations", replay_failing_once)
+
+    server.down = False
+    assert _wait_for(lambda: booting.available)
+    assert failures == [1] and not booting._reconnecting
+
+def test_failed_invalidations_are_retried_in_the_background(monkeypatch):
+    monkeypatch.setattr("services.cache.REDIS_RECONNECT_INTERVAL", 0.01)
+    server, (worker, other) = _workers(2)
+    other.set_raw("hymn_detail_1", b"old", tags=("hymn:1",))
+    apply_invalidation = worker._apply_invalidation
+    failures = []
+
+    def apply_failing_once(client, action, target):
+        if not failures:
+            failures.append(1)
+            raise redis.exceptions.ResponseError("OOM command not allowed when used memory > 'maxmemory'")
+        return apply_invalidation(client, action, target)
+    monkeypatch.setattr(worker, "_apply_invalidation", apply_failing_once)
+
+    worker.bump("hymn:1")  # answered with an error: the circuit stays closed, the bump is kept
+    assert worker.available and failures == [1]
+
+    assert _wait_for(lambda: not worker._reconnecting)
+    assert worker._pending_invalidations == []
+    assert other.get_raw("hymn_detail_1", tags=("hymn:1",)) is None
+
+def test_lock_release_leaves_another_workers_lock_alone():
+    server, (worker,) = _workers(1)
+    lock_key = f"lock:{worker.versioned_key('all_categories', ('categories',))}"
+
+    def compute():
+        # Our lock expired while computing and another worker took it
+        server.data[lock_key] = (b"other-worker", None)
+        return b"[]"
+
+    worker.get_or_compute("all_categories", compute, ex=60, tags=("categories",))
+
+    assert server.data[lock_key][0] == b"other-worker"
+    del server.data[lock_key]
+    worker.bump("categories")
+    worker.get_or_compute("all_categories", lambda: b"[]", ex=60, tags=("categories",))
+    assert not any(key.startswith("lock:") for key in server.data)  # our own lock is released
+
+def test_circuit_opens_after_repeated_failures(monkeypatch):
+    monkeypatch.setattr("services.cache.REDIS_RECONNECT_INTERVAL", 60)
+    server, (worker,) = _workers(1)
+    worker.set_raw("hymn_detail_1", b'{"title": "cached"}')
+    attempts = []
+    original_get = worker.client.get
+    monkeypatch.setattr(worker.client, "get", lambda key: attempts.append(key) or original_get(key))
+
+    server.down = True
+    for _ in range(10):
+        assert worker.get_raw("hymn_detail_2") is None
+
+    assert len(attempts) == 3  # the failure threshold, then Redis is skipped
+    assert not worker.available and worker.stats()["redis_connected"] is False
+    assert worker.get_raw("hymn_detail_1") is None  # the local tier is bypassed too
+
+def test_async_cache_shares_the_local_tier():
+    server, (worker,) = _workers(1)
+    async_worker = AsyncCache(worker, client=FakeAsyncRedis(server))
+    worker.set_raw("hymn_detail_1", b'{"id": 1}')
+
+    async def read_twice():
+        return await async_worker.get_raw("hymn_detail_1"), await async_worker.get_raw("hymn_detail_1")
+
+    assert asyncio.run(read_twice()) == (b'{"id": 1}', b'{"id": 1}')
+    assert (worker.stats()["redis_hits"], worker.stats()["local_hits"]) == (1, 1)
+    assert worker.get_raw("hymn_detail_1") == b'{"id": 1}'
@@ -0,0 +1,150 @@
+import io
+import asyncio
+import os
+import hashlib
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+
+from main import app
+from services import job_service, extraction_service
+
+@pytest.fixture
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_service, "JOBS_DIR", str(tmp_path))
+    monkeypatch.setattr(job_service, "JOBS_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(extraction_service, "verify_dependencies", lambda: None)
+    return tmp_path
+
+def _wait_for_job(job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_service.get_job(job_id)
+        if job["status"] in (job_service.JOB_COMPLETED, job_service.JOB_FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish in time")
+
+def test_upload_returns_job_id_and_reports_progress(jobs_dir, monkeypatch):
+    def fake_process(pdf_path, db, progress=None, pdf_hash=None):
+        assert pdf_hash == hashlib.sha256(b"%PDF-1.4").hexdigest()
+        assert os.path.exists(pdf_path)
+        progress(pages_total=2)
+        progress(pages_done=2)
+        progress(hymns_parsed=3)
+        return {"status": "success", "hymns_extracted": 3}
+
+    monkeypatch.setattr(extraction_service, "process_pdf_for_hymns", fake_process)
+    client = TestClient(app)
+
+    response = client.post("/extraction/hymns-from-pdf", files={"pdf_file": ("himnario.pdf", b"%PDF-1.4", "application/pdf")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = _wait_for_job(job_id)
+    assert job["status"] == job_service.JOB_COMPLETED
+
+    data = client.get(response.json()["status_url"]).json()
+    assert data["pages_total"] == 2
+    assert data["pages_done"] == 2
+    assert data["hymns_parsed"] == 3
+    assert data["result"] == {"status": "success", "hymns_extracted": 3}
+    assert not os.path.exists(job["pdf_path"])
+
+def test_failed_job_records_error(jobs_dir, monkeypatch):
+    def failing_process(pdf_path, db, progress=None, pdf_hash=None):
+        raise extraction_service.PdfProcessingError(detail="No text could be extracted from the PDF.")
+
+    monkeypatch.setattr(extraction_service, "process_pdf_for_hymns", failing_process)
+    client = TestClient(app)
+
+    response = client.post("/extraction/hymns-from-pdf", files={"pdf_file": ("himnario.pdf", b"%PDF-1.4", "application/pdf")})
+    job = _wait_for_job(response.json()["job_id"])
+    assert job["status"] == job_service.JOB_FAILED
+    assert job["error"] == "No text could be extracted from the PDF."
+
+def test_unknown_job_returns_404(jobs_dir):
+    response = TestClient(app).get("/extraction/jobs/does-not-exist")
+    assert response.status_code == 404
+    assert response.json()["message"] == "Extraction job not found"
+
+def test_recover_jobs_requeues_jobs_of_dead_workers(jobs_dir, monkeypatch):
+    processed = []
+    monkeypatch.setattr(extraction_service, "process_pdf_for_hymns",
+                        lambda pdf_path, db, progress=None, pdf_hash=None: processed.append(pdf_path) or {"status": "success"})
+
+    pdf_path = jobs_dir / "interrupted.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    now = time.time()
+    with job_service._connect() as conn:
+        # A pid that cannot belong to a live process on this machine
+        conn.execute(
+            "INSERT INTO jobs (id, status, filename, pdf_path, worker_pid, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("interrupted", job_service.JOB_RUNNING, "himnario.pdf", str(pdf_path), 2**22 + 1, now, now),
+        )
+
+    job_service.recover_jobs()
+
+    assert _wait_for_job("interrupted")["status"] == job_service.JOB_COMPLETED
+    assert processed == [str(pdf_path)]
+
+def test_shutdown_stops_running_jobs_and_keeps_them_for_recovery(jobs_dir, monkeypatch):
+    monkeypatch.setattr(job_service, "_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(job_service, "_stopping", threading.Event())
+    started = threading.Event()
+
+    def endless_process(pdf_path, db, progress=None, pdf_hash=None):
+        started.set()
+        while True:
+            progress(pages_done=1)
+            time.sleep(0.01)
+    monkeypatch.setattr(extraction_service, "process_pdf_for_hymns", endless_process)
+
+    response = TestClient(app).post("/extraction/hymns-from-pdf", files={"pdf_file": ("himnario.pdf", b"%PDF-1.4", "application/pdf")})
+    assert started.wait(5)
+    job_service.shutdown()
+
+    job = job_service.get_job(response.json()["job_id"])
+    assert job["status"] == job_service.JOB_QUEUED
+    assert os.path.exists(job["pdf_path"])
+
+def test_upload_over_the_size_limit_is_rejected(jobs_dir, monkeypatch):
+    monkeypatch.setattr(extraction_service, "MAX_UPLOAD_BYTES", 1024)
+    client = TestClient(app)
+
+    response = client.post("/extraction/hymns-from-pdf", files={"pdf_file": ("himnario.pdf", b"%PDF" + b"0" * 4096, "application/pdf")})
+
+    assert response.status_code == 413
+    assert not [name for name in os.listdir(jobs_dir) if name.endswith(".pdf")]
+
+def test_chunked_upload_over_the_size_limit_is_rejected(jobs_dir, monkeypatch):
+    monkeypatch.setattr(extraction_service, "MAX_UPLOAD_BYTES", 1024)
+    client = TestClient(app)
+    body = (b'--limit\r\nContent-Disposition: form-data; name="pdf_file"; filename="himnario.pdf"\r\n'
+            b'Content-Type: application/pdf\r\n\r\n%PDF' + b"0" * 4096 + b"\r\n--limit--\r\n")
+
+    # A generator body is sent chunked, without a Content-Length to check up front
+    response = client.post("/extraction/hymns-from-pdf", content=(body[i:i + 512] for i in range(0, len(body), 512)),
+                           headers={"Content-Type": "multipart/form-data; boundary=limit"})
+
+    assert response.status_code == 413
+    assert not [name for name in os.listdir(jobs_dir) if name.endswith(".pdf")]
+
+def test_spool_upload_streams_and_hashes(tmp_path):
+    content = os.urandom(3 * extraction_service.UPLOAD_CHUNK_SIZE + 17)
+    destination = tmp_path / "upload.pdf"
+
+    async def chunks():
+        source = io.BytesIO(content)
+        for chunk in iter(lambda: source.read(extraction_service.UPLOAD_CHUNK_SIZE), b""):
+            yield chunk
+
+    pdf_hash, size = asyncio.run(extraction_service.spool_upload(chunks(), str(destination)))
+
+    assert pdf_hash == hashlib.sha256(content).hexdigest()
+    assert size == len(content)
+    assert destination.read_bytes() == content
+    with pytest.raises(FileExistsError):
+        asyncio.run(extraction_service.spool_upload(chunks(), str(destination)))
@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Extracts a fake scanned PDF of a given page count through process_pdf_for_hymns, with the prefetch
+# thread running, and prints the peak RSS in KB and the page windows that were rasterized.
+# Poppler and Tesseract are replaced so that only the windowing and image lifetime are measured.
+PEAK_RSS_SCRIPT = textwrap.dedent("""
+    import json, resource, sys
+    from PIL import Image
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from models.tables import Base
+    from services import extraction_service
+
+    PAGE_SIZE = (1700, 2200)  # ~11 MB per RGB page
+    windows = []
+
+    def fake_convert_from_path(pdf_path, poppler_path=None, dpi=None, first_page=None, last_page=None):
+        windows.append((first_page, last_page))
+        return [Image.new("RGB", PAGE_SIZE, "white") for _ in range(first_page, last_page + 1)]
+
+    pages = int(sys.argv[1])
+    extraction_service.convert_from_path = fake_convert_from_path
+    extraction_service.pdfinfo_from_path = lambda pdf_path, poppler_path=None: {"Page size": "612 x 792 pts (letter)"}
+    extraction_service._ocr_column = lambda column_image: "linea"
+    extraction_service._count_pages = lambda pdf_path: pages
+    extraction_service._extract_text_layer = lambda pdf_path: [""] * pages
+    extraction_service.OCR_MAX_WORKERS = 1
+    extraction_service.OCR_DPI = 200
+    extraction_service.OCR_MAX_MEMORY_MB = 128  # windows of 3 pages
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    result = extraction_service.process_pdf_for_hymns("synthetic.pdf", sessionmaker(bind=engine)(), pdf_hash="synthetic")
+    assert result["pages_by_engine"]["ocr"] == pages
+    print(json.dumps({"window_size": extraction_service.page_window_size("synthetic.pdf"), "windows": windows}))
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+""")
+
+def _run(pages: int) -> tuple[int, dict]:
+    output = subprocess.run(
+        [sys.executable, "-c", PEAK_RSS_SCRIPT, str(pages)],
+        cwd=backend_dir, capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()
+    return int(output[-1]), json.loads(output[-2])
+
+def test_ocr_peak_rss_stays_flat_as_page_count_grows():
+    small, _ = _run(4)
+    large, rasterized = _run(40)
+    # Without windowing 36 extra pages would add ~400 MB; allow only allocator noise
+    assert large - small < 40 * 1024, f"peak RSS grew from {small} KB to {large} KB"
+    # The pages were rasterized in order, in windows of at most `window_size` pages
+    window_size = rasterized["window_size"]
+    assert 1 < window_size < 40
+    assert [page for first, last in rasterized["windows"] for page in range(first, last + 1)] == list(range(1, 41))
+    assert all(last - first + 1 <= window_size for first, last in rasterized["windows"])
+
+def test_ocr_workers_import_neither_the_database_nor_the_cache():
+    # Pool workers unpickle their tasks by importing the functions' module
+    script = textwrap.dedent("""
+        import pickle, sys
+        from services import extraction_service
+        task = pickle.dumps((extraction_service._init_ocr_worker, extraction_service._ocr_column))
+        for name in [name for name in sys.modules if name.startswith(("services", "database", "models"))]:
+            del sys.modules[name]
+        pickle.loads(task)
+        print(sorted(name for name in sys.modules if name.startswith(("services", "database", "models"))))
+    """)
+    output = subprocess.run([sys.executable, "-c", script], cwd=backend_dir, capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == "['services', 'services.ocr_worker']"
@@ -0,0 +1,120 @@
+import pytest
+from PIL import Image
+
+from models import tables
+from services import extraction_service, page_text_service
+
+PAGES = 4
+
+@pytest.fixture
+def scanned_pdf(tmp_path, monkeypatch):
+    """A fake 4-page scanned PDF: no text layer, every column OCR'd through a recorded fake."""
+    pdf_path = tmp_path / "himnario.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 scanned")
+    ocr_calls = []
+
+    def fake_convert_from_path(pdf_path, poppler_path=None, dpi=None, first_page=None, last_page=None):
+        # Encode the page number in the image height so the fake OCR knows which page it sees;
+        # the odd width makes the left column (50 px) distinguishable from the right one (51 px)
+        return [Image.new("L", (101, 10 + page)) for page in range(first_page, last_page + 1)]
+
+    def fake_ocr_column(column_image):
+        width, height = column_image.size
+        page = height - 10
+        ocr_calls.append(page)
+        if width == 50:
+            return f"{page}. HIMNO NUMERO {page}\nprimera linea de la pagina {page}"
+        return f"segunda linea de la pagina {page}"
+
+    monkeypatch.setattr(extraction_service, "_count_pages", lambda path: PAGES)
+    monkeypatch.setattr(extraction_service, "_extract_text_layer", lambda path: [""] * PAGES)
+    monkeypatch.setattr(extraction_service, "convert_from_path", fake_convert_from_path)
+    monkeypatch.setattr(extraction_service, "pdfinfo_from_path", lambda path, poppler_path=None: {"Page size": "612 x 792 pts"})
+    monkeypatch.setattr(extraction_service, "_ocr_column", fake_ocr_column)
+    monkeypatch.setattr(extraction_service, "OCR_MAX_WORKERS", 1)
+    monkeypatch.setattr(extraction_service, "OCR_MAX_MEMORY_MB", 1)  # one page per window
+    return str(pdf_path), ocr_calls
+
+def test_page_texts_are_cached_per_page_and_column(db_session, scanned_pdf):
+    pdf_path, ocr_calls = scanned_pdf
+
+    extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+
+    pdf_hash = extraction_service._file_sha256(pdf_path)
+    cached = page_text_service.get_page_texts(db_session, pdf_hash)
+    assert {(page, column) for page, column in cached} == {
+        (page, column)
+        for page in range(1, PAGES + 1)
+        for column in (page_text_service.COLUMN_FULL, page_text_service.COLUMN_LEFT, page_text_service.COLUMN_RIGHT)
+    }
+    assert len(ocr_calls) == PAGES * 2
+
+def test_interrupted_extraction_only_ocrs_missing_pages(db_session, scanned_pdf, monkeypatch):
+    pdf_path, ocr_calls = scanned_pdf
+    original_ocr_column = extraction_service._ocr_column
+
+    def crash_on_page_3(column_image):
+        text = original_ocr_column(column_image)
+        if ocr_calls[-1] == 3:
+            raise RuntimeError("tesseract crashed")
+        return text
+
+    monkeypatch.setattr(extraction_service, "_ocr_column", crash_on_page_3)
+    with pytest.raises(extraction_service.PdfProcessingError):
+        extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+    assert db_session.query(tables.PageText).filter_by(column=page_text_service.COLUMN_LEFT).count() == 2
+
+    ocr_calls.clear()
+    monkeypatch.setattr(extraction_service, "_ocr_column", original_ocr_column)
+    result = extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+
+    assert sorted(set(ocr_calls)) == [3, 4]
+    assert result["hymns_extracted"] == PAGES
+
+    ocr_calls.clear()
+    extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+    assert ocr_calls == []
+
+def test_only_pages_without_text_layer_are_ocrd(db_session, scanned_pdf, monkeypatch):
+    pdf_path, ocr_calls = scanned_pdf
+    text_layer = [f"{page}. HIMNO DIGITAL {page}\nlinea con capa de texto {page}" for page in range(1, PAGES + 1)]
+    text_layer[2] = "   "  # page 3 is a scanned insert
+    monkeypatch.setattr(extraction_service, "_extract_text_layer", lambda path: text_layer)
+
+    result = extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+
+    assert sorted(set(ocr_calls)) == [3]
+    assert result["pages_by_engine"] == {page_text_service.ENGINE_PDFMINER: 3, page_text_service.ENGINE_OCR: 1}
+    assert [page["engine"] for page in result["pages"]] == ["pdfminer", "pdfminer", "ocr", "pdfminer"]
+    assert result["hymns_extracted"] == PAGES
+
+def test_hymns_are_saved_in_batches_while_later_pages_are_extracted(db_session, scanned_pdf, monkeypatch):
+    pdf_path, _ = scanned_pdf
+    pages_total = 40
+    produced = []
+
+    def text_layer(path):
+        for page in range(1, pages_total + 1):
+            produced.append(page)
+            yield f"{page}. HIMNO DIGITAL {page}\nlinea con capa de texto {page}"
+
+    imports = []
+    import_hymns = extraction_service.hymn_service.create_or_update_hymns_from_parsed_data
+
+    def recording_import(db, hymns_data, **kwargs):
+        counts = import_hymns(db, hymns_data, **kwargs)
+        imports.append((len(produced), db.query(tables.Hymn).count()))
+        return counts
+
+    monkeypatch.setattr(extraction_service, "_count_pages", lambda path: pages_total)
+    monkeypatch.setattr(extraction_service, "_extract_text_layer", text_layer)
+    monkeypatch.setattr(extraction_service.hymn_service, "create_or_update_hymns_from_parsed_data", recording_import)
+    monkeypatch.setattr(extraction_service, "EXTRACTION_QUEUE_PAGES", 2)
+    monkeypatch.setattr(extraction_service, "EXTRACTION_IMPORT_BATCH", 2)
+
+    result = extraction_service.process_pdf_for_hymns(pdf_path, db_session)
+
+    assert result["hymns_imported"] == {"added": pages_total, "changed": 0, "unchanged": 0}
+    assert [committed for _, committed in imports] == list(range(2, pages_total + 1, 2))
+    # Hymns 1 and 2 were committed once page 3 was parsed; the full queue held the extraction back
+    assert imports[0][0] <= 3 + 2 + 1
@@ -0,0 +1,252 @@
+import io
+import asyncio
+import os
+import threading
+import pytest
+from docx import Document
+from lxml import etree
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from main import app
+from database import get_db
+from models import schemas
+from models.tables import Base, Hymn
+from services import category_service, generator_service, hymn_service
+from services.cache import Cache
+from services.document_cache import DocumentCache
+from benchmarks.fakes import FakeRedis
+from benchmarks.synthetic import generate_hymns
+
+@pytest.fixture
+def docx_client(tmp_path, monkeypatch):
+    """A TestClient with a file-backed SQLite database, so concurrent requests each get their own session."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'hymns.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    hymn_service.create_or_update_hymns_from_parsed_data(db, generate_hymns(8))
+    db.close()
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    output_dir = tmp_path / "output"
+    monkeypatch.setattr(generator_service, "DOCX_OUTPUT_DIR", str(output_dir))
+    monkeypatch.setattr(generator_service, "document_cache", DocumentCache(str(tmp_path / "cache"), 10 * 1024 * 1024))
+    app.dependency_overrides[get_db] = get_test_db
+    try:
+        yield TestClient(app), session_factory, output_dir
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+def test_concurrent_requests_with_the_same_file_name_get_their_own_document(docx_client, monkeypatch):
+    client, session_factory, output_dir = docx_client
+    db = session_factory()
+    hymns = db.query(Hymn.id, Hymn.title).order_by(Hymn.hymn_number).all()
+    db.close()
+    threads_used = set()
+    build = generator_service.build_hymnary_docx
+
+    def recording_build(*args):
+        threads_used.add(threading.current_thread().name)
+        build(*args)
+    monkeypatch.setattr(generator_service, "build_hymnary_docx", recording_build)
+
+    barrier = threading.Barrier(len(hymns))
+    responses = [None] * len(hymns)
+
+    def request(i):
+        barrier.wait()
+        responses[i] = client.post("/generator/docx", json={"hymn_ids": [hymns[i].id], "file_name": "himnario.docx"})
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(len(hymns))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for (hymn_id, title), response in zip(hymns, responses):
+        assert response.status_code == 200
+        assert 'filename="himnario.docx"' in response.headers["content-disposition"]
+        headings = [p.text for p in Document(io.BytesIO(response.content)).paragraphs if p.style.name == "Heading 2"]
+        assert headings == [f"{hymns.index((hymn_id, title)) + 1}. {title}"]
+    assert all(name.startswith("docx-generator") for name in threads_used)
+    assert list(output_dir.iterdir()) == []  # every temporary file was deleted once sent
+
+def test_unknown_hymns_leave_no_temporary_file(docx_client):
+    client, _, output_dir = docx_client
+
+    response = client.post("/generator/docx", json={"hymn_ids": [999999], "file_name": "himnario.docx"})
+
+    assert response.status_code == 404
+    assert list(output_dir.iterdir()) == []
+
+def test_repeated_documents_are_served_from_the_cache_until_a_hymn_changes(docx_client, monkeypatch):
+    client, session_factory, _ = docx_client
+    db = session_factory()
+    hymn_ids = [hymn_id for (hymn_id,) in db.query(Hymn.id).order_by(Hymn.hymn_number).limit(3)]
+    builds = []
+    build = generator_service.build_hymnary_docx
+    monkeypatch.setattr(generator_service, "build_hymnary_docx", lambda *args: builds.append(1) or build(*args))
+    payload = {"hymn_ids": hymn_ids, "file_name": "himnario.docx"}
+
+    first = client.post("/generator/docx", json=payload)
+    second = client.post("/generator/docx", json=payload)
+    other = client.post("/generator/docx", json={**payload, "hymn_ids": hymn_ids[:2]})
+    assert builds == [1, 1]
+    assert second.content == first.content and other.content != first.content
+
+    edited = generate_hymns(3)[1]
+    edited["contenido"][0]["texto"][0] = "Una línea corregida"
+    hymn_service.create_or_update_hymns_from_parsed_data(db, [edited])
+    db.close()
+    third = client.post("/generator/docx", json=payload)
+
+    assert builds == [1, 1, 1]
+    assert "Una línea corregida" in [p.text for p in Document(io.BytesIO(third.content)).paragraphs]
+
+def test_document_cache_evicts_least_recently_used(tmp_path):
+    cache = DocumentCache(str(tmp_path / "cache"), max_bytes=2500)
+    for key in ("a", "b", "c"):
+        source = tmp_path / key
+        source.write_bytes(b"x" * 1000)
+        cache.store(key, str(source))
+        if key == "b":
+            assert cache.fetch("a", str(tmp_path / "hit"))  # "a" becomes the most recently used
+
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["a.docx", "c.docx"]
+    assert not cache.fetch("b", str(tmp_path / "miss"))
+
+def _count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def _hymn_headings(path):
+    return [p.text.split(".")[0] for p in Document(path).paragraphs if p.style.name == "Heading 2"]
+
+def test_explicit_lists_keep_order_and_repeats_in_three_queries(db_session, tmp_path):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(5))
+    ids = {number: hymn_id for hymn_id, number in db_session.query(Hymn.id, Hymn.hymn_number)}
+    statements = _count_queries(db_session)
+
+    selection = schemas.HymnSelection(hymn_ids=[ids[4], ids[2], ids[4], 999999, ids[1]])
+    generator_service.build_hymnary_docx(db_session, selection, str(tmp_path / "list.docx"))
+
+    assert len(statements) == 4  # the selected hymns' versions, then the hymns, their content and their lines
+    assert _hymn_headings(tmp_path / "list.docx") == ["4", "2", "4", "1"]
+
+def test_whole_book_is_loaded_in_batches(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(generator_service, "HYMN_BATCH_SIZE", 10)
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(25))
+    statements = _count_queries(db_session)
+
+    generator_service.build_hymnary_docx(db_session, schemas.HymnSelection(hymn_number_from=1), str(tmp_path / "book.docx"))
+
+    assert len(statements) == 1 + 3 * 3  # the versions, then hymns, content and lines for each batch of 10
+    assert _hymn_headings(tmp_path / "book.docx") == [str(number) for number in range(1, 26)]
+
+def test_ranges_and_categories_are_in_hymn_number_order(db_session, tmp_path):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(10))
+    category_id = category_service.create_category(db_session, schemas.CategoryCreate(name="Navidad")).id
+    for hymn_id, number in db_session.query(Hymn.id, Hymn.hymn_number):
+        if number in (9, 3, 6):
+            category_service.assign_category_to_hymn(db_session, hymn_id, category_id)
+    statements = _count_queries(db_session)
+
+    generator_service.build_hymnary_docx(db_session, schemas.HymnSelection(hymn_number_from=4, hymn_number_to=7), str(tmp_path / "range.docx"))
+    generator_service.build_hymnary_docx(db_session, schemas.HymnSelection(category_id=category_id), str(tmp_path / "category.docx"))
+
+    assert len(statements) == 8
+    assert _hymn_headings(tmp_path / "range.docx") == ["4", "5", "6", "7"]
+    assert _hymn_headings(tmp_path / "category.docx") == ["3", "6", "9"]
+
+def test_a_selection_needs_exactly_one_mode(api_client):
+    response = api_client.post("/generator/docx", json={"hymn_ids": [1], "category_id": 1, "file_name": "himnario.docx"})
+
+    assert response.status_code == 422
+
+def test_documents_are_assembled_from_cached_fragments_of_unchanged_hymns(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(generator_service, "cache", Cache(client=FakeRedis()))
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(5))
+    selection = schemas.HymnSelection(hymn_number_from=1)
+    generator_service.build_hymnary_docx(db_session, selection, str(tmp_path / "first.docx"))
+    rendered = []
+    render = generator_service.render_hymn_fragment
+    monkeypatch.setattr(generator_service, "render_hymn_fragment", lambda hymn: rendered.append(hymn.hymn_number) or render(hymn))
+
+    statements = _count_queries(db_session)
+    generator_service.build_hymnary_docx(db_session, selection, str(tmp_path / "second.docx"))
+    assert len(statements) == 1 and rendered == []  # only the versions query
+
+    edited = generate_hymns(5)[2]
+    edited["contenido"][0]["texto"][0] = "Una línea corregida"
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, [edited])
+    statements.clear()
+    generator_service.build_hymnary_docx(db_session, selection, str(tmp_path / "third.docx"))
+
+    assert rendered == [3] and len(statements) == 1 + 3
+    assert "Una línea corregida" in [p.text for p in Document(tmp_path / "third.docx").paragraphs]
+
+def test_assembled_documents_match_the_python_docx_builder(db_session, tmp_path):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(4))
+    generator_service.build_hymnary_docx(db_session, schemas.HymnSelection(hymn_number_from=1), str(tmp_path / "assembled.docx"))
+
+    document = Document()
+    document.add_heading('Himnario Generado', level=1)
+    for hymn in db_session.query(Hymn).order_by(Hymn.hymn_number):
+        generator_service.add_hymn(document, hymn)
+
+    assembled = Document(tmp_path / "assembled.docx").element.body
+    assert etree.tostring(assembled, method="c14n") == etree.tostring(document.element.body, method="c14n")
+
+def test_a_failed_cache_write_does_not_fail_the_document(tmp_path, monkeypatch):
+    blocked = tmp_path / "not-a-directory"
+    blocked.write_bytes(b"")
+    source = tmp_path / "himnario.docx"
+    source.write_bytes(b"x" * 1000)
+
+    DocumentCache(str(blocked), max_bytes=2500).store("a", str(source))  # logged, not raised
+
+    evicting = DocumentCache(str(tmp_path / "cache"), max_bytes=1500)
+    evicting.store("a", str(source))
+    real_remove = os.remove
+
+    def evicted_by_another_worker(path):
+        real_remove(path)
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, "remove", evicted_by_another_worker)
+    evicting.store("b", str(source))
+    monkeypatch.undo()
+
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["b.docx"]
+
+def test_cancelled_generation_waits_for_the_thread_and_removes_its_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator_service, "DOCX_OUTPUT_DIR", str(tmp_path))
+    started, release, finished = threading.Event(), threading.Event(), []
+
+    def slow_write(db, selection, output_path):
+        started.set()
+        release.wait(5)
+        finished.append(output_path)
+    monkeypatch.setattr(generator_service, "write_hymnary_docx", slow_write)
+
+    async def disconnect():
+        task = asyncio.ensure_future(generator_service.generate_hymnary_docx(None, None))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert not task.done()  # still waiting for the thread, which holds the session
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(disconnect())
+
+    assert len(finished) == 1 and list(tmp_path.iterdir()) == []
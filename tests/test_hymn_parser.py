@@ -0,0 +1,70 @@
+import re
+from services import hymn_parser
+from benchmarks.synthetic import generate_hymnal_text, generate_hymns
+
+BLANK_SEPARATED = """ÍNDICE
+1. CUÁN GRANDE ES ÉL
+Señor mi Dios
+al contemplar
+
+CORO
+Mi corazón
+entona la canción
+
+Cuando recorro
+los bosques
+"""
+
+NUMBERED = """2. SANTO SANTO SANTO
+1
+Santo, santo, santo
+
+Señor omnipotente
+CORO
+Santo, santo
+3
+Los santos te adoran
+"""
+
+def test_blank_lines_separate_stanzas_until_stanza_numbers_appear():
+    first, second = hymn_parser.parse_hymns_from_text(BLANK_SEPARATED + NUMBERED)
+
+    assert first == {"numero": 1, "titulo": "cuán grande es él", "contenido": [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["señor mi dios", "al contemplar"]},
+        {"tipo": "coro", "texto": ["mi corazón", "entona la canción"]},
+        {"tipo": "estrofa", "estrofa_num": 2, "texto": ["cuando recorro", "los bosques"]},
+    ]}
+    # With numbered stanzas, the blank line no longer splits the first one
+    assert second["contenido"] == [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["santo, santo, santo", "señor omnipotente"]},
+        {"tipo": "coro", "texto": ["santo, santo"]},
+        {"tipo": "estrofa", "estrofa_num": 3, "texto": ["los santos te adoran"]},
+    ]
+
+def test_layout_rules_are_data():
+    text = "175. HIMNO ANTERIOR\nuna línea\n176. HIMNO ESPECIAL\n1. Primera estrofa\nsigue\n\n2. Segunda estrofa\n"
+    layouts = {175: hymn_parser.HymnLayout(stanza_regex=re.compile(r'^(\d+)\.\s*(.*)'), absorbs_titles=True)}
+
+    special = hymn_parser.parse_hymns_from_text(text)[1]
+    assert special["contenido"] == [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["primera estrofa", "sigue"]},
+        {"tipo": "estrofa", "estrofa_num": 2, "texto": ["segunda estrofa"]},
+    ]
+    # Giving hymn 175 the same layout makes it absorb 176's title as its first stanza
+    (hymn,) = hymn_parser.iter_hymns(text.split("\n"), layouts)
+    assert hymn["numero"] == 175 and hymn["contenido"][1] == {"tipo": "estrofa", "estrofa_num": 176, "texto": ["himno especial"]}
+
+def test_hymns_are_yielded_as_soon_as_the_next_one_starts():
+    pages = iter(["1. PRIMER HIMNO\nlínea", "2. SEGUNDO HIMNO\nlínea", "3. TERCER HIMNO"])
+    hymns = hymn_parser.iter_hymns(hymn_parser.iter_page_lines(pages))
+
+    assert next(hymns)["numero"] == 1
+    assert next(pages) == "3. TERCER HIMNO"  # only two pages were read for the first hymn
+
+def test_generated_hymnal_text_parses_into_the_generated_hymns():
+    parsed = hymn_parser.parse_hymns_from_text(generate_hymnal_text(6))
+    expected = generate_hymns(6)
+
+    assert [hymn["numero"] for hymn in parsed] == [1, 2, 3, 4, 5, 6]
+    assert [[(block["tipo"], block.get("estrofa_num")) for block in hymn["contenido"]] for hymn in parsed] == \
+           [[(block["tipo"], block.get("estrofa_num")) for block in hymn["contenido"]] for hymn in expected]
@@ -0,0 +1,185 @@
+import json
+from sqlalchemy import event
+from models import tables
+from services import hymn_service
+from benchmarks.synthetic import generate_hymns
+
+def _hymn_text(db, hymn_number):
+    hymn = db.query(tables.Hymn).filter_by(hymn_number=hymn_number).one()
+    return hymn.title, [
+        (content.content_type, content.stanza_number, [line.line_text for line in sorted(content.lines, key=lambda l: l.line_order)])
+        for content in sorted(hymn.content, key=lambda c: c.content_order)
+    ]
+
+def test_bulk_import_creates_hymns_content_and_lines(db_session):
+    hymns = generate_hymns(20)
+
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, hymns)
+
+    assert db_session.query(tables.Hymn).count() == 20
+    title, content = _hymn_text(db_session, 7)
+    assert title == hymns[6]["titulo"]
+    assert content == [
+        (block["tipo"], block.get("estrofa_num"), block["texto"]) for block in hymns[6]["contenido"]
+    ]
+
+def test_reimport_replaces_content_of_existing_hymns(db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(5))
+    hymn_id = db_session.query(tables.Hymn.id).filter_by(hymn_number=3).scalar()
+
+    updated = {"numero": 3, "titulo": "cuán grande es él", "contenido": [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["señor mi dios", "al contemplar los cielos"]},
+        {"tipo": "coro", "texto": ["mi corazón entona la canción"]},
+    ]}
+    new = {"numero": 6, "titulo": "nuevo himno", "contenido": [{"tipo": "estrofa", "estrofa_num": 1, "texto": ["linea"]}]}
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, [updated, new])
+    db_session.expire_all()
+
+    assert db_session.query(tables.Hymn).count() == 6
+    assert db_session.query(tables.Hymn.id).filter_by(hymn_number=3).scalar() == hymn_id
+    assert _hymn_text(db_session, 3) == ("cuán grande es él", [
+        ("estrofa", 1, ["señor mi dios", "al contemplar los cielos"]),
+        ("coro", None, ["mi corazón entona la canción"]),
+    ])
+    # Content of the replaced hymn does not linger as orphans
+    assert db_session.query(tables.HymnContent).filter_by(hymn_id=hymn_id).count() == 2
+
+def test_duplicate_hymn_numbers_in_one_import_keep_the_last(db_session):
+    first, second = generate_hymns(1, seed=1)[0], generate_hymns(1, seed=2)[0]
+
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, [first, second])
+
+    assert db_session.query(tables.Hymn).count() == 1
+    assert _hymn_text(db_session, 1)[0] == second["titulo"]
+
+def test_reimport_only_rewrites_and_invalidates_changed_hymns(db_session, monkeypatch):
+    hymns = generate_hymns(10)
+    assert hymn_service.create_or_update_hymns_from_parsed_data(db_session, hymns) == {"added": 10, "changed": 0, "unchanged": 0}
+
+    invalidated = []
+    monkeypatch.setattr(hymn_service, "invalidate_hymn_cache", lambda hymn_ids=(), added_ids=(): invalidated.append(list(hymn_ids)))
+    unchanged_content_ids = {
+        content_id for (content_id,) in db_session.query(tables.HymnContent.id).join(tables.Hymn).filter(tables.Hymn.hymn_number != 4)
+    }
+
+    edited = [dict(hymn) for hymn in hymns] + generate_hymns(11)[10:]
+    edited[3] = {**edited[3], "titulo": "título corregido"}
+    counts = hymn_service.create_or_update_hymns_from_parsed_data(db_session, edited)
+
+    assert counts == {"added": 1, "changed": 1, "unchanged": 9}
+    hymn_4_id = db_session.query(tables.Hymn.id).filter_by(hymn_number=4).scalar()
+    assert invalidated == [[hymn_4_id]]
+    assert unchanged_content_ids <= {content_id for (content_id,) in db_session.query(tables.HymnContent.id)}
+
+    invalidated.clear()
+    assert hymn_service.create_or_update_hymns_from_parsed_data(db_session, edited) == {"added": 0, "changed": 0, "unchanged": 11}
+    assert invalidated == []
+
+def _count_queries(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def test_hymn_listing_is_keyset_paginated_summaries(db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(25))
+    statements = _count_queries(db_session)
+
+    first = json.loads(hymn_service.get_hymns_json(db_session, limit=10))
+    second = json.loads(hymn_service.get_hymns_json(db_session, after=first["next_cursor"], limit=10))
+    last = json.loads(hymn_service.get_hymns_json(db_session, after=second["next_cursor"], limit=10))
+
+    assert [hymn["hymn_number"] for hymn in first["items"]] == list(range(1, 11))
+    assert [hymn["hymn_number"] for hymn in second["items"]] == list(range(11, 21))
+    assert [hymn["hymn_number"] for hymn in last["items"]] == list(range(21, 26))
+    assert (first["next_cursor"], second["next_cursor"], last["next_cursor"]) == (10, 20, None)
+    assert "content" not in first["items"][0]
+    # One column-only query per page, nothing lazy-loaded
+    assert len(statements) == 3
+    assert all("hymn_content" not in statement for statement in statements)
+
+def test_hymn_listing_can_include_content(db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(5))
+    db_session.expire_all()
+    statements = _count_queries(db_session)
+
+    page = json.loads(hymn_service.get_hymns_json(db_session, limit=5, include_content=True))
+
+    assert len(page["items"][0]["content"]) == 5
+    assert len(statements) == 3  # hymns, content and lines, each in one query
+
+def test_hymn_listing_endpoint(api_client, db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(3))
+
+    response = api_client.get("/hymns/", params={"limit": 2})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["next_cursor"] == 2
+    assert set(data["items"][0]) == {"id", "hymn_number", "title", "category_id"}
+    assert api_client.get("/hymns/", params={"after": 2}).json()["items"][0]["hymn_number"] == 3
+
+def test_cached_hymn_responses_are_served_as_stored_bytes(api_client, db_session, monkeypatch):
+    from services.cache import Cache
+    from benchmarks.fakes import FakeRedis
+    monkeypatch.setattr(hymn_service, "cache", Cache(client=FakeRedis()))
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(3))
+    hymn_id = db_session.query(tables.Hymn.id).filter_by(hymn_number=2).scalar()
+
+    first = api_client.get(f"/hymns/{hymn_id}")
+    listing = api_client.get("/hymns/", params={"include_content": True})
+    statements = _count_queries(db_session)
+    second = api_client.get(f"/hymns/{hymn_id}")
+
+    assert statements == []
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+    assert api_client.get("/hymns/", params={"include_content": True}).content == listing.content
+    assert json.loads(hymn_service.get_hymn_json(db_session, hymn_id)) == second.json()
+    assert statements == []
+
+def test_batch_endpoint_reads_cache_once_and_loads_misses_in_one_query(api_client, db_session, monkeypatch):
+    from services.cache import Cache
+    from benchmarks.fakes import FakeRedis, FakeRedisServer
+    server = FakeRedisServer()
+    monkeypatch.setattr(hymn_service, "cache", Cache(client=FakeRedis(server)))
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(10))
+    ids = {number: hymn_id for hymn_id, number in db_session.query(tables.Hymn.id, tables.Hymn.hymn_number)}
+    cached = hymn_service.get_hymn_json(db_session, ids[3])
+    hymn_service.cache.read_generations([hymn_service.hymn_tag(hymn_id) for hymn_id in ids.values()])
+
+    # A worker with an empty local tier: one MGET for the generations, one for the hymns, one pipelined backfill
+    monkeypatch.setattr(hymn_service, "cache", Cache(client=FakeRedis(server)))
+    statements = _count_queries(db_session)
+    commands = server.commands
+    requested = [ids[5], ids[3], ids[5], ids[1]]
+    response = api_client.get("/hymns/batch", params={"ids": ",".join(map(str, requested))})
+
+    assert response.status_code == 200
+    assert [hymn["id"] for hymn in response.json()] == requested
+    assert response.json()[1] == json.loads(cached)
+    assert len(statements) == 1
+    assert server.commands - commands == 3
+
+    statements.clear()
+    again = api_client.get("/hymns/batch", params={"ids": ",".join(map(str, requested))})
+    assert again.content == response.content
+    assert statements == []
+    assert hymn_service.get_hymn_json(db_session, ids[1]) == hymn_service.get_hymns_batch_json(db_session, [ids[1]])[1:-1]
+
+def test_batch_endpoint_rejects_unknown_and_malformed_ids(api_client, db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(2))
+    hymn_id = db_session.query(tables.Hymn.id).first()[0]
+
+    assert api_client.get("/hymns/batch", params={"ids": f"{hymn_id},999999"}).status_code == 404
+    assert api_client.get("/hymns/batch", params={"ids": "1,two"}).status_code == 422
+    assert api_client.get("/hymns/batch", params={"ids": ",".join(["1"] * 101)}).status_code == 422
+
+def test_committed_import_succeeds_even_if_refreshing_caches_fails(db_session, monkeypatch):
+    def broken_refresh(db, hymn_ids):
+        raise RuntimeError("index unavailable")
+    monkeypatch.setattr(hymn_service.suggest_index, "refresh", broken_refresh)
+
+    counts = hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(2))
+
+    assert counts == {"added": 2, "changed": 0, "unchanged": 0}
+    assert db_session.query(tables.Hymn).count() == 2
@@ -1,6 +1,6 @@
 import pytest
 from httpx import AsyncClient
-from backend.main import app
+from main import app
 
 @pytest.mark.asyncio
 async def test_read_root():
@@ -0,0 +1,46 @@
+from sqlalchemy.dialects import postgresql
+
+from services import hymn_service, search_service
+
+HYMNS = [
+    {"numero": 1, "titulo": "cuán grande es él", "contenido": [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["Señor mi Dios, al contemplar los cielos", "el firmamento y las estrellas mil"]},
+        {"tipo": "coro", "texto": ["Mi corazón entona la canción", "cuán grande es él"]},
+    ]},
+    {"numero": 2, "titulo": "santo santo santo", "contenido": [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["Santo, santo, santo, Señor omnipotente", "siempre el labio mío loores te dará"]},
+    ]},
+]
+
+def test_search_expression_matches_the_gin_index():
+    compiled = search_service.LINE_TSVECTOR.compile(dialect=postgresql.dialect())
+    assert str(compiled) == "to_tsvector('spanish_unaccent'::regconfig, content_lines.line_text)"
+
+def test_search_is_accent_insensitive_and_highlights_lines(db_session):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, HYMNS)
+
+    results = search_service.search_hymns(db_session, "corazon cancion")
+
+    assert [result.hymn_number for result in results] == [1]
+    assert results[0].matches == ["Mi <mark>corazón</mark> entona la <mark>canción</mark>"]
+
+def test_search_ranks_hymns_by_matching_lines(db_session, api_client):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, HYMNS)
+
+    response = api_client.get("/hymns/search", params={"q": "señor"})
+
+    assert response.status_code == 200
+    assert [result["hymn_number"] for result in response.json()] == [1, 2]
+    assert api_client.get("/hymns/search", params={"q": "aleluya"}).json() == []
+
+def test_highlighted_lines_are_html_escaped(db_session):
+    hymns = [{"numero": 3, "titulo": "himno inseguro", "contenido": [
+        {"tipo": "estrofa", "estrofa_num": 1, "texto": ["<script>alert(1)</script> gloria & honor"]},
+    ]}]
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, hymns)
+
+    (result,) = search_service.search_hymns(db_session, "gloria")
+
+    assert result.matches == ["&lt;script&gt;alert(1)&lt;/script&gt; <mark>gloria</mark> &amp; honor"]
+    headline = f"<b> y {search_service.HIGHLIGHT_START}gloria{search_service.HIGHLIGHT_STOP}"
+    assert search_service._headline_to_html(headline) == "&lt;b&gt; y <mark>gloria</mark>"
@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+from services import hymn_service
+from services.suggest_index import SuggestIndex, suggest_index
+from services.cache import Cache
+from benchmarks.fakes import FakeRedis
+from benchmarks.synthetic import generate_hymns
+
+ROWS = [
+    (1, 12, "Cuán grande es Él", "Señor mi Dios, al contemplar los cielos", None),
+    (2, 120, "Santo, santo, santo", "¡Santo, santo, santo! Señor omnipotente", 1),
+    (3, 7, "Grande es tu fidelidad", "Oh Dios eterno, tu misericordia", 2),
+    (4, 300, "Castillo fuerte es nuestro Dios", "Castillo fuerte es nuestro Dios", None),
+]
+
+def _titles(results):
+    return [result.title for result in results]
+
+def test_suggest_ignores_accents_and_typos():
+    index = SuggestIndex()
+    index.load(ROWS)
+
+    assert _titles(index.suggest("cuan grande"))[0] == "Cuán grande es Él"
+    assert _titles(index.suggest("cuan grnde"))[0] == "Cuán grande es Él"
+    assert _titles(index.suggest("castilo fuerte"))[0] == "Castillo fuerte es nuestro Dios"
+    # First lines are indexed too
+    assert _titles(index.suggest("al contemplar"))[0] == "Cuán grande es Él"
+    assert index.suggest("zzzz") == []
+
+def test_suggest_by_number_prefix_and_category():
+    index = SuggestIndex()
+    index.load(ROWS)
+
+    assert [result.hymn_number for result in index.suggest("12")] == [12, 120]
+    assert _titles(index.suggest("santo", category_id=1)) == ["Santo, santo, santo"]
+    assert index.suggest("santo", category_id=2) == []
+
+def test_suggest_index_updates_incrementally():
+    index = SuggestIndex()
+    index.load(ROWS)
+
+    index.load([(1, 12, "Sublime gracia", "Sublime gracia del Señor", None)])
+    index.set_category(1, 3)
+
+    assert "Cuán grande es Él" not in _titles(index.suggest("cuan grande"))
+    assert index.suggest("sublime")[0].category_id == 3
+    assert [result.hymn_number for result in index.suggest("12")] == [12, 120]
+
+def test_suggest_endpoint_follows_imports(api_client, db_session):
+    suggest_index.rebuild(db_session)
+    hymns = generate_hymns(3)
+    hymns[1] = {**hymns[1], "titulo": "Cuán grande es Él"}
+
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, hymns)
+    response = api_client.get("/hymns/suggest", params={"q": "cuan grande"})
+
+    assert response.status_code == 200
+    assert response.json()[0]["hymn_number"] == 2
+    assert response.json()[0]["first_line"] == hymns[1]["contenido"][0]["texto"][0]
+    suggest_index.clear()
+
+def test_suggest_endpoint_reloads_only_hymns_changed_by_another_worker(api_client, db_session, monkeypatch):
+    monkeypatch.setattr(hymn_service, "cache", Cache(client=FakeRedis()))
+    worker = SuggestIndex()
+    monkeypatch.setattr(hymn_service, "suggest_index", worker)
+    assert api_client.get("/hymns/suggest", params={"q": "cuan grande"}).json() == []
+
+    # Another worker imports the hymns: this worker's index is not touched, only the shared change log and generation
+    monkeypatch.setattr(hymn_service, "suggest_index", SuggestIndex())
+    hymns = generate_hymns(3)
+    hymns[1] = {**hymns[1], "titulo": "Cuán grande es Él"}
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, hymns)
+    monkeypatch.setattr(hymn_service, "suggest_index", worker)
+    monkeypatch.setattr(worker, "rebuild", lambda *args: pytest.fail("caught up by rebuilding everything"))
+
+    response = api_client.get("/hymns/suggest", params={"q": "cuan grande"})
+    assert response.json()[0]["hymn_number"] == 2
+    assert len(worker) == 3
+    assert worker.version == hymn_service.suggest_index_version()
+
+def test_suggest_index_rebuilds_in_the_background_after_a_reset(db_session, monkeypatch):
+    cache = Cache(client=FakeRedis())
+    monkeypatch.setattr(hymn_service, "cache", cache)
+    worker = SuggestIndex()
+    monkeypatch.setattr(hymn_service, "suggest_index", worker)
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(3), warm_cache=False)
+    hymn_service.rebuild_suggest_index(db_session)
+
+    building, release = threading.Event(), threading.Event()
+    query_rows = worker._query_rows
+    def slow_query_rows(db, hymn_ids=None):
+        building.set()
+        release.wait(5)
+        return query_rows(db, hymn_ids)
+    monkeypatch.setattr(worker, "_query_rows", slow_query_rows)
+    cache.clear()
+
+    assert hymn_service.sync_suggest_index(db_session)
+    assert building.wait(5)
+    # The old index keeps answering while the new one is built
+    assert [result.hymn_number for result in worker.suggest("1")] == [1]
+    release.set()
+    for _ in range(100):
+        if worker.version == hymn_service.suggest_index_version():
+            break
+        time.sleep(0.05)
+    assert worker.version == hymn_service.suggest_index_version()
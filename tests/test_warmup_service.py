@@ -0,0 +1,91 @@
+import json
+import threading
+from sqlalchemy import event
+from services import category_service, hymn_service, warmup_service
+from services.cache import Cache
+from benchmarks.fakes import FakeRedis, FakeRedisServer
+from benchmarks.synthetic import generate_hymns
+
+def _seed(db_session, count=120):
+    hymn_service.create_or_update_hymns_from_parsed_data(db_session, generate_hymns(count))
+
+def _count_queries(db_session):
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def test_warm_cache_serves_every_endpoint_without_queries(db_session, monkeypatch):
+    _seed(db_session)
+    server = FakeRedisServer()
+    target = Cache(client=FakeRedis(server))
+    progress = []
+
+    statements = _count_queries(db_session)
+    result = warmup_service.warm_cache(db_session, target, threading.Event(), lambda done, total: progress.append((done, total)))
+
+    assert result == warmup_service.WARMUP_COMPLETED
+    assert len(statements) == 2  # hymns with their content in one query, plus the categories
+    assert progress[-1][0] == progress[-1][1] == 120 + 3 + 1  # details, listing pages, categories
+
+    # A fresh worker sharing the same Redis answers from the warmed entries
+    reader = Cache(client=FakeRedis(server))
+    monkeypatch.setattr(hymn_service, "cache", reader)
+    monkeypatch.setattr(category_service, "cache", reader)
+    statements.clear()
+    first = json.loads(hymn_service.get_hymns_json(db_session))
+    second = json.loads(hymn_service.get_hymns_json(db_session, after=first["next_cursor"]))
+    hymn = json.loads(hymn_service.get_hymn_json(db_session, first["items"][0]["id"]))
+    categories = category_service.get_categories(db_session)
+
+    assert statements == []
+    assert [item["hymn_number"] for item in first["items"]] == list(range(1, 51))
+    assert second["items"][0]["hymn_number"] == 51 and hymn["hymn_number"] == 1
+    assert categories == []
+
+def test_only_one_worker_warms_the_same_data(db_session):
+    _seed(db_session, 10)
+    server = FakeRedisServer()
+    first, second = Cache(client=FakeRedis(server)), Cache(client=FakeRedis(server))
+
+    assert warmup_service.warm_cache(db_session, first, threading.Event()) == warmup_service.WARMUP_COMPLETED
+    assert warmup_service.warm_cache(db_session, second, threading.Event()) == warmup_service.WARMUP_SKIPPED
+    # Readers get the stale copies while an entry is being rebuilt after an invalidation
+    assert any(key.startswith(f"stale:{hymn_service.HYMN_DETAIL_CACHE_KEY_PREFIX}") for key in server.data)
+
+    # New data is warmed again
+    second.bump(hymn_service.HYMNS_TAG)
+    assert warmup_service.warm_cache(db_session, second, threading.Event()) == warmup_service.WARMUP_COMPLETED
+
+def test_interrupted_warm_up_writes_nothing(db_session):
+    _seed(db_session, 10)
+    server = FakeRedisServer()
+    stop = threading.Event()
+    stop.set()
+
+    result = warmup_service.warm_cache(db_session, Cache(client=FakeRedis(server)), stop)
+
+    assert result == warmup_service.WARMUP_INTERRUPTED
+    assert not any(key.startswith(hymn_service.HYMN_DETAIL_CACHE_KEY_PREFIX) for key in server.data)
+    # The lock is released, so another worker can warm the cache
+    assert warmup_service.warm_cache(db_session, Cache(client=FakeRedis(server)), threading.Event()) == warmup_service.WARMUP_COMPLETED
+
+def test_warm_up_skips_writes_when_invalidated_meanwhile(db_session, monkeypatch):
+    _seed(db_session, 10)
+    server = FakeRedisServer()
+    target = Cache(client=FakeRedis(server))
+    build_entries = warmup_service.build_entries
+
+    def build_then_import(db, stop):
+        entries = build_entries(db, stop)
+        target.bump(hymn_service.HYMNS_TAG)  # an import committed while the hymns were being read
+        return entries
+    monkeypatch.setattr(warmup_service, "build_entries", build_then_import)
+
+    assert warmup_service.warm_cache(db_session, target, threading.Event()) == warmup_service.WARMUP_INTERRUPTED
+    assert not any(key.startswith(hymn_service.HYMN_DETAIL_CACHE_KEY_PREFIX) for key in server.data)
+
+def test_cache_warmup_status_endpoint(api_client):
+    response = api_client.get("/admin/cache-warmup")
+
+    assert response.status_code == 200
+    assert {"status", "entries_total", "entries_done", "duration_seconds"} <= set(response.json())